@@ -0,0 +1,26 @@
+import argparse
+import os
+import sys
+
+# Add the repository root to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from benchmark_parser import make_large_program, time_parser
+from benchmark_token_memory import retained_memory
+from src.lexer import RegexLexer, TokenStream
+from src.syntaxAST import Syntax
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Measure the memory held by an AST and the time to build it.')
+    parser.add_argument('--file', default='tests/syntax_inputs/correct_large.gr', help='The source file to scale up')
+    parser.add_argument('--scale', type=int, default=1000, help='How many copies of the file to parse as one program')
+    args = parser.parse_args()
+
+    tokens = TokenStream.from_tokens(RegexLexer(source=make_large_program(args.file, args.scale)).tokenize())
+    seconds = time_parser(tokens)
+    ast, memory = retained_memory(lambda: Syntax(tokens).parse())
+    count = sum(1 for _ in ast.walk())
+    print(f"{count} nodes from {len(tokens)} tokens")
+    print(f"    build: {seconds:8.3f}s  {count / seconds / 1000:8.1f}k nodes/s")
+    print(f"   memory: {memory:8.2f} MB  {count / memory / 1000:8.1f}k nodes/MB  {memory * 1024 * 1024 / count:6.1f} bytes/node")
@@ -0,0 +1,37 @@
+import argparse
+import logging
+import os
+import sys
+import tempfile
+import time
+
+# Add the repository root to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from benchmark_parser import make_large_program
+from src.compiler import DebugDump, compile_file
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Compare compiling with and without the JSON Lines debug dumps.')
+    parser.add_argument('--file', default='tests/syntax_inputs/correct_large.gr', help='The source file to scale up')
+    parser.add_argument('--scale', type=int, default=30, help='How many copies of the file to compile as one program')
+    parser.add_argument('--sample', type=int, default=100, help='Sampling of the sampled dump')
+    parser.add_argument('--limit', type=int, default=1000, help='Limit of the sampled dump')
+    args = parser.parse_args()
+
+    # The symbol table logs each declaration and each repeated one, which would take most of the time
+    logging.disable(logging.WARNING)
+    with tempfile.TemporaryDirectory() as directory:
+        file = os.path.join(directory, 'program.gr')
+        with open(file, 'w', encoding='utf-8') as f:
+            f.write(make_large_program(args.file, args.scale))
+        base = os.path.join(directory, 'program')
+        for name, debug in [('no debug', False), ('full dump', DebugDump(base)),
+                            ('sampled dump', DebugDump(base, args.sample, args.limit))]:
+            start = time.perf_counter()
+            compile_file(file, debug, 'regex')
+            seconds = time.perf_counter() - start
+            size = sum(os.path.getsize(f'{base}.{phase}.jsonl') for phase in ['tokens', 'ast', 'symbols', 'quads']
+                       if os.path.exists(f'{base}.{phase}.jsonl'))
+            print(f"{name:>12}: {seconds:8.3f}s {size / (1024 * 1024):8.2f} MB of dumps")
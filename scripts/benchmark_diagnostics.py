@@ -0,0 +1,71 @@
+import argparse
+import logging
+import os
+import sys
+import time
+from types import MethodType
+
+# Add the repository root to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from benchmark_lazy_parser import best_time
+from benchmark_parser import make_large_program
+from src.lexer import RegexLexer
+from src.symboltable import build_symbol_table
+from src.syntaxAST import Syntax
+
+logger = logging.getLogger("Symbol Table Logger")
+
+
+def plain_lookup(symbol_table, name):
+    """SymbolTable.lookup without any diagnostics."""
+    scope = symbol_table.current_scope
+    while scope:
+        if name in scope.entities:
+            return scope.entities[name]
+        scope = scope.parent
+    return None
+
+
+def eager_lookup(symbol_table, name):
+    """SymbolTable.lookup with the f-string debug messages that it used to format at every call."""
+    scope = symbol_table.current_scope
+    while scope:
+        if name in scope.entities:
+            logger.debug(f"Found '{name}' in scope '{scope.name}'")
+            return scope.entities[name]
+        scope = scope.parent
+    logger.debug(f"Entity '{name}' not found")
+    return None
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Measure the cost of the symbol table diagnostics when they are disabled.')
+    parser.add_argument('--file', default='tests/syntax_inputs/correct_large.gr', help='The source file to scale up')
+    parser.add_argument('--scale', type=int, default=300, help='How many copies of the file to compile as one program')
+    parser.add_argument('--lookups', type=int, default=200, help='How many times to look up every name')
+    args = parser.parse_args()
+
+    ast = Syntax(RegexLexer(source=make_large_program(args.file, args.scale)).tokenize()).parse()
+    # Warnings stay enabled, as in a normal compile, but there is one for every repeated declaration
+    logging.disable(logging.WARNING)
+    symbol_table = build_symbol_table(ast)
+    # Look up every name from the innermost scope, so that the lookups also walk the parent scopes
+    scope = max(symbol_table.all_scopes, key=lambda scope: scope.level)
+    symbol_table.scopes = []
+    while scope:
+        symbol_table.scopes.insert(0, scope)
+        scope = scope.parent
+    symbol_table.current_scope_level = len(symbol_table.scopes) - 1
+    names = [name for scope in symbol_table.scopes for name in scope.entities] + ['missing'] * 100
+    names *= args.lookups
+
+    build = best_time(lambda: build_symbol_table(ast))
+    # Each lookup is called as a method of the table, like SymbolTable.lookup
+    plain, lazy, eager = [best_time(lambda: [lookup(name) for name in names])
+                          for lookup in [MethodType(plain_lookup, symbol_table), symbol_table.lookup,
+                                         MethodType(eager_lookup, symbol_table)]]
+    print(f"{len(names)} lookups, build_symbol_table: {build:.3f}s")
+    print(f"  no diagnostics: {plain:8.3f}s")
+    print(f"lazy diagnostics: {lazy:8.3f}s  ({100 * (lazy / plain - 1):+.1f}%)")
+    print(f"  eager f-string: {eager:8.3f}s  ({100 * (eager / plain - 1):+.1f}%)")
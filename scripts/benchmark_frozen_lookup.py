@@ -0,0 +1,60 @@
+import argparse
+import logging
+import os
+import sys
+
+# Add the repository root to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from benchmark_lazy_parser import best_time
+from benchmark_parser import make_large_program
+from src.lexer import RegexLexer
+from src.symboltable import build_symbol_table
+from src.syntaxAST import Syntax
+
+
+def chain_lookup(scope, name):
+    """SymbolTable.lookup from the given scope, walking its parent scopes."""
+    while scope:
+        if name in scope.entities:
+            return scope.entities[name]
+        scope = scope.parent
+    return None
+
+
+def nested_program(depth):
+    """A program with a chain of `depth` nested procedures, each declaring its own variable."""
+    source = ["πρόγραμμα τ δήλωση α"]
+    for level in range(depth):
+        source.append(f"διαδικασία π{level}() διαπροσωπεία δήλωση μ{level}")
+    for level in reversed(range(depth)):
+        source.append(f"αρχή_διαδικασίας α := μ{level} τέλος_διαδικασίας")
+    source.append("αρχή_προγράμματος α := 1 τέλος_προγράμματος")
+    return '\n'.join(source)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Measure the lookups of the frozen symbol table against walking the scope chain.')
+    parser.add_argument('--file', default='tests/syntax_inputs/correct_large.gr', help='The source file to scale up')
+    parser.add_argument('--scale', type=int, default=300, help='How many copies of the file to compile as one program')
+    parser.add_argument('--depth', type=int, default=50, help='How deep to nest the procedures of the second program')
+    args = parser.parse_args()
+
+    # Warnings stay enabled, as in a normal compile, but there is one for every repeated declaration
+    logging.disable(logging.WARNING)
+    for title, source in [('scaled program', make_large_program(args.file, args.scale)),
+                          (f'{args.depth} nested procedures', nested_program(args.depth))]:
+        symbol_table = build_symbol_table(Syntax(RegexLexer(source=source).tokenize()).parse())
+        frozen = symbol_table.freeze()
+        names = sorted({name for scope in symbol_table.all_scopes for name in scope.entities}) + ['missing']
+        # Every name is looked up from every scope
+        points = [(scope_id, scope, name) for scope_id, scope in enumerate(symbol_table.all_scopes) for name in names]
+        if len(points) > 2_000_000:
+            points = points[::len(points) // 2_000_000]
+
+        freeze = best_time(symbol_table.freeze)
+        chain = best_time(lambda: [chain_lookup(scope, name) for _, scope, name in points])
+        bisect = best_time(lambda: [frozen.lookup(name, scope_id) for scope_id, _, name in points])
+        print(f"{title}: {len(symbol_table.all_scopes)} scopes, {len(points)} lookups, freeze: {freeze:.3f}s")
+        print(f"  scope chain: {chain:8.3f}s")
+        print(f"       bisect: {bisect:8.3f}s  ({100 * (bisect / chain - 1):+.1f}%)")
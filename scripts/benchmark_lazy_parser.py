@@ -0,0 +1,47 @@
+import argparse
+import os
+import sys
+import time
+
+# Add the repository root to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from scripts.benchmark_parser import make_large_program
+from src.lexer import RegexLexer
+from src.syntaxAST import Syntax
+
+
+def signatures(subprograms):
+    """Yield the name and parameter names of each subprogram, including nested ones, in source order."""
+    for subprogram in subprograms.children:
+        name, parameters, block = subprogram.children
+        yield name.value, [parameter.value for var_list in parameters.children for parameter in var_list.children]
+        yield from signatures(block.children[3])
+
+
+def best_time(function, repeat=3):
+    """Call the function `repeat` times and return the best time in seconds."""
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        seconds = time.perf_counter() - start
+        best = seconds if best is None else min(best, seconds)
+    return best
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Compare lexing, full parsing and lazy parsing for signatures.')
+    parser.add_argument('--file', default='tests/syntax_inputs/correct_large.gr', help='The source file to scale up')
+    parser.add_argument('--scale', type=int, default=1000, help='How many copies of the file to parse as one program')
+    args = parser.parse_args()
+
+    source = make_large_program(args.file, args.scale)
+    tokens = RegexLexer(source=source).tokenize()
+    lex = best_time(lambda: RegexLexer(source=source).tokenize())
+    full = best_time(lambda: list(signatures(Syntax(tokens).parse().children[1].children[1])))
+    lazy = best_time(lambda: list(signatures(Syntax(tokens, lazy=True).parse().children[1].children[1])))
+    print(f"{len(tokens)} tokens")
+    print(f"       lex: {lex:8.3f}s")
+    print(f"full parse: {full:8.3f}s")
+    print(f"lazy parse: {lazy:8.3f}s")
@@ -0,0 +1,80 @@
+import argparse
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+# Add the repository root to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.compiler import LEXERS
+from src.lexer import ParallelLexer, np
+
+
+def make_scaled_source(source_file, scale):
+    """Write `scale` copies of the source file into a temporary .gr file and return its path."""
+    with open(source_file, 'r', encoding='utf-8') as f:
+        content = f.read()
+    scaled = tempfile.NamedTemporaryFile('w', encoding='utf-8', suffix='.gr', delete=False)
+    with scaled:
+        for _ in range(scale):
+            scaled.write(content)
+            scaled.write('\n')
+    return scaled.name
+
+
+def time_lexer(engine, file):
+    """Tokenize the file with the given engine and return (seconds, token count)."""
+    start = time.perf_counter()
+    tokens = LEXERS[engine](file).tokenize()
+    return time.perf_counter() - start, len(tokens)
+
+
+def time_parallel_lexer(file, workers):
+    """Tokenize the file with ParallelLexer and the given number of workers and return the seconds."""
+    start = time.perf_counter()
+    ParallelLexer(file, workers=workers).tokenize()
+    return time.perf_counter() - start
+
+
+def peak_memory(engine, file):
+    """Tokenize the file with the given engine and return the peak of traced allocations in MB."""
+    tracemalloc.start()
+    try:
+        tokens = LEXERS[engine](file).tokenize()
+        return tracemalloc.get_traced_memory()[1] / (1024 * 1024)
+    finally:
+        tracemalloc.stop()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Compare the throughput of the lexer engines.')
+    parser.add_argument('--file', default='tests/syntax_inputs/correct_large.gr', help='The source file to scale up')
+    parser.add_argument('--scale', type=int, default=1000, help='How many copies of the file to lex')
+    parser.add_argument('--memory', action='store_true', help='Also report the peak of traced allocations')
+    parser.add_argument('--engines', nargs='+', choices=LEXERS, default=list(LEXERS), help='The engines to compare')
+    parser.add_argument('--workers', nargs='+', type=int, default=[],
+                        help='Also time the parallel engine with these numbers of workers, e.g. 1 2 4 8')
+    args = parser.parse_args()
+
+    if 'numpy' in args.engines and np is None:
+        print("NumPy is not installed, the numpy engine runs the scalar regex scan")
+    file = make_scaled_source(args.file, args.scale)
+    try:
+        size = os.path.getsize(file) / (1024 * 1024)
+        baseline = None
+        for engine in args.engines:
+            seconds, count = time_lexer(engine, file)
+            baseline = baseline or seconds
+            print(f"{engine:>8}: {seconds:8.3f}s  {size / seconds:8.2f} MB/s  {count} tokens  "
+                  f"x{baseline / seconds:.1f}")
+            if args.memory:
+                print(f"{'':>8}  peak allocations {peak_memory(engine, file):8.2f} MB")
+        serial = None
+        for workers in args.workers:
+            seconds = time_parallel_lexer(file, workers)
+            serial = serial or seconds
+            print(f"{workers:>3} workers: {seconds:8.3f}s  {size / seconds:8.2f} MB/s  x{serial / seconds:.1f}")
+    finally:
+        os.remove(file)
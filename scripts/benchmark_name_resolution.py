@@ -0,0 +1,40 @@
+import argparse
+import logging
+import os
+import sys
+
+# Add the repository root to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from benchmark_lazy_parser import best_time
+from benchmark_parser import make_large_program
+from src.final import generate_risc_v_code
+from src.intermediate import generate_intermediate_code
+from src.lexer import RegexLexer
+from src.symboltable import build_symbol_table, resolve_names
+from src.syntaxAST import Syntax
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Measure the name resolution and the code generation that uses it.')
+    parser.add_argument('--file', default='tests/syntax_inputs/correct_large.gr', help='The source file to scale up')
+    parser.add_argument('--scale', type=int, default=300, help='How many copies of the file to compile as one program')
+    args = parser.parse_args()
+
+    ast = Syntax(RegexLexer(source=make_large_program(args.file, args.scale)).tokenize()).parse()
+    # Warnings stay enabled, as in a normal compile, but there is one for every repeated declaration
+    logging.disable(logging.WARNING)
+    symbol_table = build_symbol_table(ast)
+    quads = generate_intermediate_code(ast, symbol_table).quads
+    resolution = resolve_names(ast, symbol_table)
+
+    build = best_time(lambda: build_symbol_table(ast))
+    resolve = best_time(lambda: resolve_names(ast, symbol_table))
+    # Without a resolution every name is looked up in the table at its global scope, and guessed when it is not there
+    guessed = best_time(lambda: generate_risc_v_code(quads, symbol_table))
+    resolved = best_time(lambda: generate_risc_v_code(quads, symbol_table, resolution))
+    print(f"{len(resolution.uses)} uses in {len(resolution.blocks)} blocks, {len(quads)} quads")
+    print(f"build_symbol_table: {build:8.3f}s")
+    print(f"     resolve_names: {resolve:8.3f}s")
+    print(f"  codegen, guessed: {guessed:8.3f}s")
+    print(f" codegen, resolved: {resolved:8.3f}s  ({100 * (resolved / guessed - 1):+.1f}%)")
@@ -0,0 +1,55 @@
+import argparse
+import gc
+import logging
+import os
+import sys
+import time
+import tracemalloc
+
+# Add the repository root to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from benchmark_parser import make_large_program
+from src.intermediate import generate_intermediate_code, translate
+from src.lexer import RegexLexer
+from src.symboltable import build_symbol_table
+from src.syntaxAST import Syntax
+
+
+def multi_pass(tokens):
+    """Parse the tokens, then build the symbol table and generate the code from the AST."""
+    ast = Syntax(tokens).parse()
+    symbol_table = build_symbol_table(ast)
+    return generate_intermediate_code(ast, symbol_table), symbol_table
+
+
+def measure(compile_tokens, tokens):
+    """Return the result, the time in seconds and the peak memory in MB of compiling the tokens."""
+    gc.collect()
+    tracemalloc.start()
+    try:
+        start = time.perf_counter()
+        result = compile_tokens(tokens)
+        seconds = time.perf_counter() - start
+        return result, seconds, tracemalloc.get_traced_memory()[1] / (1024 * 1024)
+    finally:
+        tracemalloc.stop()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Compare the multi-pass pipeline with the one-pass translation.')
+    parser.add_argument('--file', default='tests/syntax_inputs/correct_large.gr', help='The source file to scale up')
+    parser.add_argument('--scale', type=int, default=100, help='How many copies of the file to compile as one program')
+    args = parser.parse_args()
+
+    # The symbol table logs each declaration and each repeated one, which would take most of the time
+    logging.disable(logging.WARNING)
+    tokens = RegexLexer(source=make_large_program(args.file, args.scale)).tokenize()
+    (code_gen, _), multi_seconds, multi_memory = measure(multi_pass, tokens)
+    quads = code_gen.quads
+    del code_gen
+    (code_gen, _, _), one_seconds, one_memory = measure(translate, tokens)
+    assert code_gen.quads == quads, "The one-pass quads differ"
+    print(f"{len(tokens)} tokens, {len(quads)} quads (times and peak memory measured under tracemalloc)")
+    print(f"multi-pass: {multi_seconds:8.3f}s {multi_memory:8.2f} MB")
+    print(f"  one-pass: {one_seconds:8.3f}s {one_memory:8.2f} MB")
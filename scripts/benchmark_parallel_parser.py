@@ -0,0 +1,34 @@
+import argparse
+import os
+import sys
+import time
+
+# Add the repository root to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from scripts.benchmark_parser import make_large_program
+from src.lexer import RegexLexer
+from src.syntaxAST import Syntax, ParallelSyntax
+
+
+def timed_parse(syntax):
+    """Parse with the syntax analyzer and return the AST and the time it took in seconds."""
+    start = time.perf_counter()
+    ast = syntax.parse()
+    return ast, time.perf_counter() - start
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Measure how parsing the subprograms scales with worker processes.')
+    parser.add_argument('--file', default='tests/syntax_inputs/correct_large.gr', help='The source file to scale up')
+    parser.add_argument('--scale', type=int, default=2000, help='How many copies of the subprograms to parse')
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4, 8, 16], help='The worker counts to try')
+    args = parser.parse_args()
+
+    tokens = RegexLexer(source=make_large_program(args.file, args.scale, body_scale=1)).tokenize()
+    expected, serial = timed_parse(Syntax(tokens))
+    print(f"{len(tokens)} tokens, serial: {serial:.3f}s")
+    for workers in args.workers:
+        ast, seconds = timed_parse(ParallelSyntax(tokens, workers=workers))
+        assert ast.to_dict() == expected.to_dict()
+        print(f"{workers:>3} workers: {seconds:8.3f}s  speedup {serial / seconds:5.2f}")
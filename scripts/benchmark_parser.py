@@ -0,0 +1,53 @@
+import argparse
+import os
+import re
+import sys
+import time
+
+# Add the repository root to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.lexer import RegexLexer, TokenStream
+from src.syntaxAST import Syntax
+
+
+def make_large_program(source_file, scale, body_scale=None):
+    """
+    Return the source of one program with `scale` copies of the subprograms and of the main block
+    of the source file, or `body_scale` copies of the main block if it is given. The copied
+    subprograms are renamed so that every name is declared once.
+    """
+    with open(source_file, 'r', encoding='utf-8') as f:
+        content = f.read()
+    head, rest = content.split('αρχή_προγράμματος', 1)
+    body = rest.rsplit('τέλος_προγράμματος', 1)[0].strip()
+    declarations, _, subprograms = re.split(r'^(?=(συνάρτηση|διαδικασία))', head, maxsplit=1, flags=re.M)
+    copies = [subprograms]
+    for copy in range(1, scale):
+        # Rename the declaration of each subprogram, keeping the calls on the original ones
+        copies.append(re.sub(r'^((?:συνάρτηση|διαδικασία) \w+)', rf'\g<1>_{copy}', subprograms, flags=re.M))
+    return (declarations + ''.join(copies) + 'αρχή_προγράμματος\n  '
+            + ';\n  '.join([body] * (scale if body_scale is None else body_scale)) + '\nτέλος_προγράμματος\n')
+
+
+def time_parser(tokens, repeat=3):
+    """Parse the tokens `repeat` times and return the best time in seconds."""
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        Syntax(tokens).parse()
+        seconds = time.perf_counter() - start
+        best = seconds if best is None else min(best, seconds)
+    return best
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Measure the throughput of the parser.')
+    parser.add_argument('--file', default='tests/syntax_inputs/correct_large.gr', help='The source file to scale up')
+    parser.add_argument('--scale', type=int, default=1000, help='How many copies of the file to parse as one program')
+    args = parser.parse_args()
+
+    tokens = RegexLexer(source=make_large_program(args.file, args.scale)).tokenize()
+    for name, parsed in [('list', tokens), ('columnar', TokenStream.from_tokens(tokens))]:
+        seconds = time_parser(parsed)
+        print(f"{name:>8}: {seconds:8.3f}s  {len(tokens) / seconds / 1000:8.1f}k tokens/s  {len(tokens)} tokens")
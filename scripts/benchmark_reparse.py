@@ -0,0 +1,44 @@
+import argparse
+import os
+import sys
+import time
+
+# Add the repository root to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from scripts.benchmark_parser import make_large_program
+from src.lexer import IncrementalLexer
+from src.syntaxAST import Syntax, IncrementalSyntax
+
+
+def timed(function, *args):
+    """Call the function and return its result and the time it took in seconds."""
+    start = time.perf_counter()
+    result = function(*args)
+    return result, time.perf_counter() - start
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Measure reparsing a large program after one-line edits.')
+    parser.add_argument('--file', default='tests/syntax_inputs/correct_large.gr', help='The source file to scale up')
+    parser.add_argument('--scale', type=int, default=400, help='How many copies of the file to parse as one program')
+    args = parser.parse_args()
+
+    source = make_large_program(args.file, args.scale)
+    lexer = IncrementalLexer(source=source)
+    tokens = lexer.tokenize()
+    _, seconds = timed(Syntax(tokens).parse)
+    print(f"{source.count(chr(10))} lines, {len(tokens)} tokens, full parse: {seconds * 1000:.1f}ms")
+
+    syntax = IncrementalSyntax(tokens)
+    syntax.parse()
+    # Change an expression in the middle of the file, then add a line there and remove it again
+    middle = source.index(':= ', len(source) // 2) + 3
+    for description, start, end, text in [('change a line', middle, middle, '1 + '),
+                                          ('add a line', middle - 3, middle - 3, ' := 0;\n  x'),
+                                          ('remove it', middle - 3, middle - 3 + len(' := 0;\n  x'), '')]:
+        _, lex_seconds = timed(lexer.edit, start, end, text)
+        tokens, list_seconds = timed(lexer.token_list)
+        _, parse_seconds = timed(syntax.reparse, tokens)
+        print(f"{description:>14}: relex {lex_seconds * 1000:6.1f}ms  token list {list_seconds * 1000:6.1f}ms"
+              f"  reparse {parse_seconds * 1000:6.1f}ms  ({syntax.reused} subtrees reused)")
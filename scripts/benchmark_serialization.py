@@ -0,0 +1,40 @@
+import argparse
+import io
+import os
+import sys
+import time
+
+# Add the repository root to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from scripts.benchmark_parser import make_large_program
+from src.lexer import RegexLexer
+from src.serialization import dump_ast, load_ast
+from src.syntaxAST import Syntax
+
+
+def timed(function, *args):
+    """Call the function and return its result and the time it took in seconds."""
+    start = time.perf_counter()
+    result = function(*args)
+    return result, time.perf_counter() - start
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Compare lexing and parsing a program with loading its saved AST.')
+    parser.add_argument('--file', default='tests/syntax_inputs/correct_large.gr', help='The source file to scale up')
+    parser.add_argument('--scale', type=int, default=1000, help='How many copies of the file to parse as one program')
+    args = parser.parse_args()
+
+    source = make_large_program(args.file, args.scale)
+    tokens, lex_seconds = timed(RegexLexer(source=source).tokenize)
+    ast, parse_seconds = timed(Syntax(tokens).parse)
+    buffer = io.BytesIO()
+    _, dump_seconds = timed(dump_ast, ast, buffer)
+    buffer.seek(0)
+    loaded, load_seconds = timed(load_ast, buffer)
+    assert loaded.to_dict() == ast.to_dict()
+    print(f"source: {len(source.encode('utf-8')) / 1e6:6.2f}MB  saved AST: {len(buffer.getvalue()) / 1e6:6.2f}MB")
+    print(f"lex + parse: {lex_seconds + parse_seconds:8.3f}s")
+    print(f"       dump: {dump_seconds:8.3f}s")
+    print(f"       load: {load_seconds:8.3f}s  ({(lex_seconds + parse_seconds) / load_seconds:.1f}x faster)")
@@ -0,0 +1,28 @@
+import argparse
+import os
+import sys
+
+# Add the repository root to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from benchmark_parser import make_large_program
+from benchmark_token_memory import retained_memory
+from src.lexer import RegexLexer
+from src.syntaxAST import Syntax
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Compare the memory held by an AST with and without shared nodes.')
+    parser.add_argument('--file', default='tests/syntax_inputs/correct_large.gr', help='The source file to scale up')
+    parser.add_argument('--scale', type=int, default=1000, help='How many copies of the file to parse as one program')
+    args = parser.parse_args()
+
+    tokens = RegexLexer(source=make_large_program(args.file, args.scale)).tokenize()
+    ast, memory = retained_memory(lambda: Syntax(tokens).parse())
+    count = sum(1 for _ in ast.walk())
+    del ast
+    shared, shared_memory = retained_memory(lambda: Syntax(tokens, share_nodes=True).parse())
+    distinct = len({id(node) for node in shared.walk()})
+    print(f"{count} nodes from {len(tokens)} tokens, {distinct} distinct nodes when shared")
+    print(f"   unshared: {memory:8.2f} MB")
+    print(f"     shared: {shared_memory:8.2f} MB  ({100 * (1 - shared_memory / memory):.0f}% less)")
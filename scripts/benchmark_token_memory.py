@@ -0,0 +1,45 @@
+import argparse
+import gc
+import os
+import sys
+import tracemalloc
+
+# Add the repository root to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from benchmark_lexer import make_scaled_source
+from src.compiler import LEXERS
+from src.lexer import TokenStream
+
+
+def retained_memory(build):
+    """Return the result of build() and the memory it still holds in MB once it has returned."""
+    gc.collect()
+    tracemalloc.start()
+    try:
+        result = build()
+        gc.collect()
+        return result, tracemalloc.get_traced_memory()[0] / (1024 * 1024)
+    finally:
+        tracemalloc.stop()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Compare the memory held by a token list and a TokenStream.')
+    parser.add_argument('--file', default='tests/syntax_inputs/correct_large.gr', help='The source file to scale up')
+    parser.add_argument('--scale', type=int, default=3700, help='How many copies of the file to lex')
+    parser.add_argument('--lexer', choices=LEXERS, default='regex', help='The lexer engine to use')
+    args = parser.parse_args()
+
+    file = make_scaled_source(args.file, args.scale)
+    try:
+        tokens, list_memory = retained_memory(lambda: LEXERS[args.lexer](file).tokenize())
+        count = len(tokens)
+        del tokens
+        stream, stream_memory = retained_memory(lambda: TokenStream.from_tokens(LEXERS[args.lexer](file).iter_tokens()))
+        print(f"{count} tokens")
+        print(f"      list: {list_memory:8.2f} MB  {list_memory * 1024 * 1024 / count:6.1f} bytes/token")
+        print(f"    stream: {stream_memory:8.2f} MB  {stream_memory * 1024 * 1024 / count:6.1f} bytes/token")
+        print(f" reduction: x{list_memory / stream_memory:.1f}")
+    finally:
+        os.remove(file)
@@ -1,3 +1,15 @@
+def strip_imports(lines):
+    """Yield the lines that are not part of an import statement, including the continuation lines of parenthesized imports."""
+    in_import = False
+    for line in lines:
+        if in_import:
+            in_import = ')' not in line
+        elif line.startswith('import ') or line.startswith('from '):
+            in_import = '(' in line and ')' not in line
+        else:
+            yield line
+
+
 def combine_files(output_file, *input_files):
     combined_content = ""
     for file in input_files:
@@ -5,10 +17,7 @@ def combine_files(output_file, *input_files):
             content = f.read()
             if not file.endswith('header.py'):
                 # Remove local import statements
-                content = '\n'.join(
-                    line for line in content.split('\n')
-                    if not line.startswith('import ') and not line.startswith('from ')
-                )
+                content = '\n'.join(strip_imports(content.split('\n')))
             combined_content += content + "\n\n"
 
     with open(output_file, 'w') as f:
@@ -16,4 +25,4 @@ def combine_files(output_file, *input_files):
 
 
 combine_files('combined_compiler.py',
-              "scripts/header.py", 'src/lexer.py', 'src/syntaxAST.py', 'src/symboltable.py', 'src/intermediate.py', "src/final.py", 'src/compiler.py')
+              "scripts/header.py", 'src/diagnostics.py', 'src/lexer.py', 'src/syntaxAST.py', 'src/symboltable.py', 'src/serialization.py', 'src/intermediate.py', "src/final.py", 'src/compiler.py')
@@ -5,3 +5,20 @@
 ####################################
 
 import argparse
+import gc
+import io
+import json
+import logging
+import mmap
+import re
+import struct
+import sys
+from array import array
+from bisect import bisect_left, bisect_right
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from itertools import accumulate, compress, count, islice, repeat
+from os import PathLike, cpu_count, path
+from types import GeneratorType
+from weakref import WeakValueDictionary
@@ -1,29 +1,181 @@
 import argparse
-from src.lexer import Lexer
-from src.intermediate import generate_intermediate_code
+import json
+import sys
+from contextlib import contextmanager
+from itertools import islice
+from src.lexer import Lexer, RegexLexer, MmapLexer, ParallelLexer, NumpyLexer, TokenStream, split_trivia
+from src.diagnostics import configure_diagnostics
+from src.intermediate import generate_intermediate_code, translate
 from src.final import generate_risc_v_code
-from src.syntaxAST import Syntax
-from src.symboltable import build_symbol_table
+from src.syntaxAST import Syntax, StreamingSyntax, ParallelSyntax
+from src.symboltable import build_symbol_table, resolve_names
+from src.serialization import dump_ast, load_ast, dump_symbol_table
 from os import path
 
+# Lexer engines that can be selected with --lexer
+LEXERS = {
+    'char': Lexer,
+    'regex': RegexLexer,
+    'mmap': MmapLexer,
+    'parallel': ParallelLexer,
+    'numpy': NumpyLexer,
+}
 
-def perform_lexical_analysis(file, debug):
-    # Initialize the lexer with the provided source code file
-    lexer = Lexer(file)
+# One encoder for all the records, since json.dumps with options makes a new one at each call
+JSON_ENCODER = json.JSONEncoder(ensure_ascii=False)
+
+
+class DebugDump:
+    """
+    Debug output of the compiler phases as JSON Lines: one token, node, symbol or quad per line, written
+    while the items are produced instead of printing each structure as a whole.
+
+    Each phase is written to its own `<base>.<phase>.jsonl` file, or to stdout without a base. Only every
+    `sample`th item of a phase is written, and at most `limit` of them, so that the items past the limit
+    are not even visited.
+    """
+
+    def __init__(self, base=None, sample=1, limit=None):
+        self.base = base
+        self.sample = sample
+        self.limit = limit
+
+    @classmethod
+    def of(cls, debug):
+        """Return the DebugDump of a `debug` argument, which can also be True for the dump to stdout."""
+        return debug if isinstance(debug, cls) else cls()
+
+    @contextmanager
+    def open(self, phase):
+        if self.base is None:
+            yield sys.stdout
+        else:
+            with open(f'{self.base}.{phase}.jsonl', 'w', encoding='utf-8') as f:
+                yield f
+
+    def write(self, phase, items, record):
+        """Write the record(index, item) of each selected item."""
+        stop = None if self.limit is None else self.limit * self.sample
+        encode = JSON_ENCODER.encode
+        with self.open(phase) as f:
+            for index, item in islice(enumerate(items), 0, stop, self.sample):
+                f.write(encode(record(index, item)) + '\n')
+
+    def passing(self, phase, items, record):
+        """Yield the items, writing the records of the selected ones as they pass."""
+        stop = None if self.limit is None else self.limit * self.sample
+        encode = JSON_ENCODER.encode
+        with self.open(phase) as f:
+            for index, item in enumerate(items):
+                if index % self.sample == 0 and (stop is None or index < stop):
+                    f.write(encode(record(index, item)) + '\n')
+                yield item
+
+    def tokens(self, tokens):
+        self.write('tokens', tokens, token_record)
+
+    def stream_tokens(self, tokens):
+        """Return the token iterator, dumping the tokens while the parser consumes them."""
+        return self.passing('tokens', tokens, token_record)
+
+    def ast(self, ast):
+        self.write('ast', ast.walk(), node_record)
+
+    def symbol_table(self, symbol_table):
+        entities = ((scope, entity) for scope in symbol_table.all_scopes for entity in scope.entities.values())
+        self.write('symbols', entities, symbol_record)
+
+    def quads(self, quads):
+        self.write('quads', quads, quad_record)
+
+    def resolution(self, resolution):
+        names = ((block, name, resolved) for block, names in resolution.blocks.items()
+                 for name, resolved in names.items())
+        self.write('names', names, name_record)
+
+
+def token_record(index, token):
+    token_type, value, line = token
+    return {'index': index, 'type': token_type, 'value': value, 'line': line}
+
+
+def node_record(index, node):
+    # The nodes are in pre-order, so the child counts give the shape of the tree
+    return {'index': index, 'type': node.type, 'value': node.value, 'line': node.line,
+            'children': len(node.children)}
+
+
+def symbol_record(index, scope_entity):
+    scope, entity = scope_entity
+    return {'index': index, 'scope': scope.name, 'level': scope.level, 'name': entity.name,
+            'type': entity.entity_type, 'offset': entity.offset, 'parameters': entity.parameters}
+
+
+def quad_record(index, quad):
+    label, op, x, y, z = quad
+    return {'index': index, 'label': label, 'op': op, 'x': x, 'y': y, 'z': z}
+
+
+def name_record(index, block_name_resolved):
+    block, name, resolution = block_name_resolved
+    return {'index': index, 'block': block, 'name': name, 'depth': resolution.depth,
+            'scope_id': resolution.scope_id, 'offset': resolution.offset, 'kind': resolution.kind}
+
+
+def perform_lexical_analysis(file, debug, lexer='char', stream=False, columnar=False, trivia=None):
+    # Initialize the selected lexer with the provided source code file
+    lexer = LEXERS[lexer](file)
+    if stream:
+        # Tokens are produced lazily while the parser consumes them
+        if debug:
+            return DebugDump.of(debug).stream_tokens(lexer.iter_tokens())
+        return lexer.iter_tokens()
+    if trivia is not None:
+        # The comments are collected in `trivia` while lexing, so that the parser is given the tokens
+        # without them and does not split them again
+        tokens = lexer.iter_tokens()
+        if debug:
+            # The dump keeps the comments at their place among the tokens
+            tokens = DebugDump.of(debug).stream_tokens(tokens)
+        tokens = split_trivia(tokens, trivia)
+        return TokenStream.from_tokens(tokens) if columnar else list(tokens)
     # Tokenize the source code
-    tokens = lexer.tokenize()
+    if columnar:
+        tokens = TokenStream.from_tokens(lexer.iter_tokens())
+    else:
+        tokens = lexer.tokenize()
     if debug:
-        print(tokens)
+        DebugDump.of(debug).tokens(tokens)
     return tokens
 
 
-def perform_syntax_analysis(tokens, debug):
+def perform_syntax_analysis(tokens, debug, stream=False, recover=False, workers=None, trivia=None):
+    if workers is not None:
+        if stream:
+            raise ValueError("Streamed tokens cannot be parsed by worker processes")
+        if workers < 1:
+            raise ValueError(f"The number of parse workers must be at least 1, got {workers}")
     # Initialize the parser with the generated tokens
-    syntax = Syntax(tokens)
+    if stream:
+        syntax = StreamingSyntax(tokens, recover=recover)
+    elif workers is not None:
+        # The top-level subprograms are parsed in a process pool
+        syntax = ParallelSyntax(tokens, trivia, recover=recover, workers=workers)
+    else:
+        syntax = Syntax(tokens, trivia, recover=recover)
     # Parse the tokens to perform syntax analysis
-    ast = syntax.parse()
+    try:
+        ast = syntax.parse()
+    finally:
+        if stream and hasattr(tokens, 'close'):
+            # The parser stops reading at EOF, so the streamed tokens are closed here, with their dump or
+            # the memory map of their source
+            tokens.close()
+    if syntax.errors:
+        # Only reached when recovering, with every error of the program
+        raise SyntaxError('\n'.join(syntax.errors))
     if debug:
-        print(ast.to_dict())
+        DebugDump.of(debug).ast(ast)
     return tokens, ast
 
 
@@ -31,7 +183,7 @@ def get_intermediate_code(ast, int_file, symbol_table, debug):
     code_gen = generate_intermediate_code(ast, symbol_table)
     quads = code_gen.get_quads()
     if debug:
-        print(quads)
+        DebugDump.of(debug).quads(code_gen.quads)
     with open(int_file, 'w') as f:
         f.write(quads)
     return code_gen.quads
@@ -39,13 +191,35 @@ def get_intermediate_code(ast, int_file, symbol_table, debug):
 def get_symbol_table(ast, sym_file, debug):
     symbol_table = build_symbol_table(ast)
     if debug:
-        print(symbol_table)
+        DebugDump.of(debug).symbol_table(symbol_table)
     with open(sym_file, 'w') as f:
         f.write(str(symbol_table))
     return symbol_table
 
-def get_riscv_code(quads, riscv_file, symbol_table, debug):
-    risc_v_code = generate_risc_v_code(quads, symbol_table)
+def get_name_resolution(ast, symbol_table, debug):
+    # Resolve every use of a name once, for the code generation
+    resolution = resolve_names(ast, symbol_table)
+    if debug:
+        DebugDump.of(debug).resolution(resolution)
+    return resolution
+
+def get_one_pass_code(tokens, sym_file, int_file, debug, trivia=None):
+    # Generate the symbol table, the name resolution and the intermediate code while parsing, without an AST
+    code_gen, symbol_table, resolution = translate(tokens, trivia)
+    if debug:
+        DebugDump.of(debug).symbol_table(symbol_table)
+        DebugDump.of(debug).resolution(resolution)
+    with open(sym_file, 'w') as f:
+        f.write(str(symbol_table))
+    quads = code_gen.get_quads()
+    if debug:
+        DebugDump.of(debug).quads(code_gen.quads)
+    with open(int_file, 'w') as f:
+        f.write(quads)
+    return code_gen.quads, symbol_table, resolution
+
+def get_riscv_code(quads, riscv_file, symbol_table, resolution, debug):
+    risc_v_code = generate_risc_v_code(quads, symbol_table, resolution)
     # Output the code to a file
     with open(riscv_file, 'w', encoding='utf-8') as f:
         f.write(risc_v_code)
@@ -55,18 +229,46 @@ def get_file_extension(file_path):
     return file_extension
 
 
-def compile_file(file, debug):
+def save_binary(ast, symbol_table, ast_file, symtab_file):
+    # Save the AST and the symbol table in the binary format, to be loaded back without parsing
+    with open(ast_file, 'wb') as f:
+        dump_ast(ast, f)
+    with open(symtab_file, 'wb') as f:
+        dump_symbol_table(symbol_table, f)
+
+
+def compile_file(file, debug, lexer='char', stream=False, columnar=False, recover=False, workers=None,
+                 binary=False, one_pass=False):
     file_extension = get_file_extension(file)
-    # Perform lexical analysis on the provided source code file
-    tokens = perform_lexical_analysis(file, debug)
-    # Perform syntax analysis on the generated tokens
-    tokens, ast = perform_syntax_analysis(tokens, debug)
+    if one_pass and file_extension != '.ast':
+        # Translate the tokens straight into the symbol table and the intermediate code
+        trivia = {}
+        tokens = perform_lexical_analysis(file, debug, lexer, columnar=columnar, trivia=trivia)
+        quads, symbol_table, resolution = get_one_pass_code(tokens, file.replace(file_extension, '.sym'),
+                                                            file.replace(file_extension, '.int'), debug, trivia)
+        get_riscv_code(quads, file.replace(file_extension, '.asm'), symbol_table, resolution, debug)
+        return quads
+    if file_extension == '.ast':
+        # Load a syntax tree saved with --save-binary instead of lexing and parsing again
+        with open(file, 'rb') as f:
+            ast = load_ast(f)
+    else:
+        # Perform lexical analysis on the provided source code file, with the comments moved to the trivia
+        # (the streaming parser moves them itself)
+        trivia = None if stream else {}
+        tokens = perform_lexical_analysis(file, debug, lexer, stream, columnar, trivia)
+        # Perform syntax analysis on the generated tokens
+        tokens, ast = perform_syntax_analysis(tokens, debug, stream, recover, workers, trivia)
     # Generate symbol table from the parsed AST
-    symbol_table = get_symbol_table(ast.to_dict(), file.replace(file_extension, '.sym'), debug)
+    symbol_table = get_symbol_table(ast, file.replace(file_extension, '.sym'), debug)
+    # Resolve the names used in the AST in the scopes of the symbol table
+    resolution = get_name_resolution(ast, symbol_table, debug)
+    if binary:
+        save_binary(ast, symbol_table, file.replace(file_extension, '.ast'), file.replace(file_extension, '.symtab'))
     # Generate intermediate code from the parsed AST and symbol table
-    quads = get_intermediate_code(ast.to_dict(), file.replace(file_extension, '.int'), symbol_table, debug)
+    quads = get_intermediate_code(ast, file.replace(file_extension, '.int'), symbol_table, debug)
     # Generate RISC-V assembly code from the intermediate code and symbol table
-    get_riscv_code(quads, file.replace(file_extension, '.asm'), symbol_table, debug)
+    get_riscv_code(quads, file.replace(file_extension, '.asm'), symbol_table, resolution, debug)
     return quads
 
 if __name__ == '__main__':
@@ -74,8 +276,35 @@ if __name__ == '__main__':
     parser = argparse.ArgumentParser(description='Process a source code file.')
     # Add a positional argument for the source code file to process
     parser.add_argument('file', type=str, help='The source code file to process')
-    parser.add_argument('-d', '--debug', action='store_true', help='Enable debug output')
+    parser.add_argument('-d', '--debug', action='store_true',
+                        help='Write the tokens, AST, symbols, names and quads to <file>.<phase>.jsonl, one per line')
+    parser.add_argument('--debug-sample', type=int, default=1, help='With -d, write only every Nth item of each phase')
+    parser.add_argument('--debug-limit', type=int, help='With -d, write at most this many items of each phase')
+    parser.add_argument('--lexer', choices=LEXERS, default='char', help='The lexer engine to use')
+    tokens_mode = parser.add_mutually_exclusive_group()
+    tokens_mode.add_argument('--stream', action='store_true', help='Parse the tokens while they are being lexed')
+    tokens_mode.add_argument('--columnar', action='store_true', help='Keep the tokens in a columnar TokenStream')
+    parser.add_argument('--recover', action='store_true', help='Report every syntax error instead of only the first')
+    parser.add_argument('--parse-workers', type=int, help='Parse the subprograms with this many worker processes')
+    parser.add_argument('--save-binary', action='store_true',
+                        help='Also save the AST (.ast) and symbol table (.symtab) in binary; .ast files compile without parsing')
+    parser.add_argument('--one-pass', action='store_true',
+                        help='Generate the intermediate code while parsing, without building the AST')
     # Parse the command-line arguments
     args = parser.parse_args()
+    if args.one_pass and (args.stream or args.recover or args.parse_workers is not None or args.save_binary):
+        parser.error('--one-pass cannot be combined with --stream, --recover, --parse-workers or --save-binary')
+    if args.stream and args.parse_workers is not None:
+        parser.error('--stream cannot be combined with --parse-workers')
+    if args.parse_workers is not None and args.parse_workers < 1:
+        parser.error('--parse-workers must be at least 1')
+    if args.debug_sample < 1:
+        parser.error('--debug-sample must be at least 1')
+    if args.debug_limit is not None and args.debug_limit < 0:
+        parser.error('--debug-limit must not be negative')
+    # The phases log their diagnostics with the configuration of the entry point
+    configure_diagnostics()
+    debug = args.debug and DebugDump(path.splitext(args.file)[0], args.debug_sample, args.debug_limit)
     # Compile the provided source code file
-    compile_file(args.file, args.debug)
+    compile_file(args.file, debug, args.lexer, args.stream, args.columnar, args.recover,
+                 args.parse_workers, args.save_binary, args.one_pass)
@@ -0,0 +1,69 @@
+#########################################################################
+# Diagnostics                                                           #
+# This part of the code is the logging layer of the compiler phases.    #
+# Messages are only formatted when they are emitted, and the checks of  #
+# the hot paths read a cached flag instead of asking logging.           #
+#########################################################################
+
+import logging
+
+LOG_FORMAT = '%(levelname)s: %(message)s'
+
+
+class Diagnostics:
+    """
+    The diagnostics of a compiler phase, over the logger of the given name.
+
+    The messages are %-style format strings with their arguments, which logging formats only for the
+    records it emits. Whether debug messages are enabled is cached in `debug_enabled`, so that the hot
+    paths, which are the ones with debug messages, can skip even the call with `if diagnostics.debug_enabled:`.
+    The flag is read again by refresh, which the phases call when they start, and which
+    configure_diagnostics calls after setting up logging.
+    """
+
+    def __init__(self, name):
+        self.logger = logging.getLogger(name)
+        self.refresh()
+
+    def refresh(self):
+        """Cache whether debug messages are enabled, after the logging configuration may have changed."""
+        self.debug_enabled = self.logger.isEnabledFor(logging.DEBUG)
+
+    def debug(self, message, *args):
+        if self.debug_enabled:
+            self.logger.debug(message, *args)
+
+    def info(self, message, *args):
+        self.logger.info(message, *args)
+
+    def warning(self, message, *args):
+        self.logger.warning(message, *args)
+
+    def error(self, message, *args):
+        self.logger.error(message, *args)
+
+
+# The diagnostics of each phase by logger name
+DIAGNOSTICS = {}
+
+
+def get_diagnostics(name):
+    """Return the Diagnostics of the logger with the given name, the same one for each name."""
+    diagnostics = DIAGNOSTICS.get(name)
+    if diagnostics is None:
+        diagnostics = DIAGNOSTICS[name] = Diagnostics(name)
+    return diagnostics
+
+
+def configure_diagnostics(level=logging.INFO):
+    """
+    Configure the root logger for the command line and refresh the cached flags of every phase.
+    The modules of the phases leave the logging configuration to the entry point that calls this.
+    """
+    logging.basicConfig(level=level, format=LOG_FORMAT)
+    for diagnostics in DIAGNOSTICS.values():
+        diagnostics.refresh()
+
+#########################################################################
+# End of Diagnostics                                                    #
+#########################################################################
@@ -4,8 +4,15 @@
 # quadruples code, following the approach from the lecture slides.      #
 #########################################################################
 
+from src.diagnostics import get_diagnostics
+from src.symboltable import Resolution
+
+# Diagnostics of the code generation, configured by the entry point (see configure_diagnostics)
+codegen_diagnostics = get_diagnostics("Code Generator Logger")
+
+
 class RISCVCodeGenerator:
-    def __init__(self, symbol_table=None):
+    def __init__(self, symbol_table=None, resolution=None):
         self.code = []
         self.temp_map = {}  # Maps temporary variables to registers
         self.var_map = {}  # Maps program variables to memory locations
@@ -17,12 +24,20 @@ class RISCVCodeGenerator:
         self.string_literals = {}  # For storing string literals if needed
         self.string_counter = 0
         self.symbol_table = symbol_table
+        self.resolution = resolution  # NameResolution of the names used in each block
+        self.names = {}  # Resolutions of the names of the current block
+        self.block_names = []  # Resolutions of the names of the enclosing blocks
         self.framelength = 64  # Standard frame length for simplicity
 
     def emit(self, instruction):
         """Add an instruction to the generated code."""
         self.code.append(instruction)
 
+    def warn(self, message, *args):
+        """Report a warning in the diagnostics, and as a comment in the generated code."""
+        codegen_diagnostics.warning(message, *args)
+        self.code.append("# Warning: " + message % args)
+
     def emit_label(self, label):
         """Emit a label."""
         self.code.append(f"{label}:")
@@ -50,6 +65,34 @@ class RISCVCodeGenerator:
         self.next_data_addr += 4  # Assume 4 bytes per variable (32-bit)
         return self.var_map[var]
 
+    def resolve(self, var):
+        """
+        Get the Resolution of a program variable in the current block, or None if it is not declared.
+        Without a NameResolution, every variable is taken as local, at an offset given by get_var_offset.
+        """
+        if self.resolution is None:
+            return Resolution(0, 0, self.get_var_offset(var), 'local')
+        return self.names.get(var)
+
+    def variable_address(self, resolution, r):
+        """
+        Return the memory operand of a resolved variable, emitting the code that computes its
+        address into register r first when it is not at a fixed offset of sp or gp.
+        """
+        kind = resolution.kind
+        if kind == 'local' or kind == 'parameter':
+            return f"-{resolution.offset}(sp)"
+        if kind == 'global':
+            return f"-{resolution.offset}(gp)"
+        if kind == 'nonlocal' or kind == 'nonlocal_parameter':
+            self.gnlvcode(resolution, r)
+            return f"({r})"
+        if kind == 'function':
+            # The value of a function is stored at the address of its return value
+            self.emit(f"lw {r},-8(sp)")
+            return f"({r})"
+        return None
+
     def allocate_register(self, var):
         """Allocate a register for a variable or temporary."""
         if var in self.temp_map:
@@ -68,20 +111,19 @@ class RISCVCodeGenerator:
             return self.get_var_offset(var)
 
     # Implementation of gnlvcode as described in slides
-    def gnlvcode(self, var):
-        """Generate code to get the address of a non-local variable."""
-        # Start from current scope
-        self.emit(f"lw t0,-4(sp)")
-        
-        # Follow access links (simplified - assumes one level up)
-        # In a full implementation, this would traverse multiple levels
-        # based on the nesting level difference
-        
+    def gnlvcode(self, resolution, r="t0"):
+        """Generate code to get the address of a non-local variable, from its Resolution, into register r."""
+        # Start from the access link of the current frame, the frame of the parent
+        self.emit(f"lw {r},-4(sp)")
+
+        # Follow the access links up to the frame of the scope of the variable
+        for _ in range(resolution.depth - 1):
+            self.emit(f"lw {r},-4({r})")
+
         # Calculate address of the variable
-        offset = self.get_var_offset(var)
-        self.emit(f"addi t0,t0,-{offset}(sp)")
-        
-        # Now t0 contains the address of the variable
+        self.emit(f"addi {r},{r},-{resolution.offset}")
+
+        # Now r contains the address of the variable
 
     # Implementation of loadvr as described in slides
     def loadvr(self, v, r):
@@ -95,12 +137,15 @@ class RISCVCodeGenerator:
             if src_reg:
                 self.emit(f"mv {r},{src_reg}")
             else:
-                self.emit(f"# Warning: Temporary {v} not allocated")
+                self.warn("Temporary %s not allocated", v)
         else:
-            # v is a program variable
-            # Simplified - assumes local variable
-            offset = self.get_var_offset(v)
-            self.emit(f"lw {r},-{offset}(sp)")
+            # v is a program variable, found where its use was resolved
+            resolution = self.resolve(v)
+            address = resolution and self.variable_address(resolution, r)
+            if address:
+                self.emit(f"lw {r},{address}")
+            else:
+                self.warn("Variable %s not declared", v)
 
     # Implementation of storerv as described in slides
     def storerv(self, r, v):
@@ -111,12 +156,15 @@ class RISCVCodeGenerator:
             if dest_reg:
                 self.emit(f"mv {dest_reg},{r}")
             else:
-                self.emit(f"# Warning: Temporary {v} not allocated")
+                self.warn("Temporary %s not allocated", v)
         else:
-            # v is a program variable
-            # Simplified - assumes local variable
-            offset = self.get_var_offset(v)
-            self.emit(f"sw {r},-{offset}(sp)")
+            # v is a program variable, found where its use was resolved
+            resolution = self.resolve(v)
+            address = resolution and self.variable_address(resolution, "t3")
+            if address:
+                self.emit(f"sw {r},{address}")
+            else:
+                self.warn("Variable %s not declared", v)
 
     def generate_data_section(self):
         """Generate the data section for variables."""
@@ -151,6 +199,12 @@ class RISCVCodeGenerator:
 
             # Process based on operation
             if op == "begin_block":
+                # The names of the block, until its end_block
+                self.block_names.append(self.names)
+                if self.resolution is not None:
+                    if arg2 == "_":
+                        raise ValueError(f"The block '{arg1}' has no scope id to find its names in")
+                    self.names = self.resolution.blocks.get(arg2, {})
                 if arg1 == "τεστ":  # Main program
                     self.emit("Lmain:")
                     self.emit(f"addi sp,sp,{self.framelength}")
@@ -164,6 +218,7 @@ class RISCVCodeGenerator:
                     self.emit(f"addi fp,sp,{self.framelength}")
 
             elif op == "end_block":
+                self.names = self.block_names.pop()
                 if arg1 == "τεστ":  # Main program
                     self.emit("li a7,10")
                     self.emit("ecall")
@@ -277,13 +332,16 @@ class RISCVCodeGenerator:
                     self.emit(f"sw {t1_reg},-{12+4*i}(fp)")
                 elif arg2 == "ref":  # Call by reference
                     # Get the address of the variable
-                    if self.is_local_var(arg1):
-                        # Local variable
-                        offset = self.get_var_offset(arg1)
-                        self.emit(f"addi t0,sp,-{offset}")
+                    resolution = self.resolve(arg1)
+                    if resolution is None:
+                        self.warn("Variable %s not declared", arg1)
+                    elif resolution.kind == "nonlocal" or resolution.kind == "nonlocal_parameter":
+                        # Non-local variable or parameter - use gnlvcode
+                        self.gnlvcode(resolution)
                     else:
-                        # Non-local variable - use gnlvcode
-                        self.gnlvcode(arg1)
+                        # Local variable or parameter, or global variable
+                        base = "gp" if resolution.kind == "global" else "sp"
+                        self.emit(f"addi t0,{base},-{resolution.offset}")
                     # Pass the address
                     self.emit(f"sw t0,-{12+4*i}(fp)")
                 elif arg2 == "ret":  # Return value parameter
@@ -297,15 +355,17 @@ class RISCVCodeGenerator:
                 self.emit(f"")
                 self.emit(f"addi fp,sp,{self.framelength}")
                 
-                # Set up the access link (dynamic link)
-                if self.is_same_level_call(arg1):
-                    # Same level call
+                # Set up the access link, to the frame of the parent of the callee
+                depth = self.callee_depth(arg1)
+                if depth == 0:
+                    # The callee is declared in the caller, which is its parent
+                    self.emit("sw sp,-4(fp)")
+                else:
+                    # The parent of the callee is `depth` access links up from the caller
                     self.emit("lw t0,-4(sp)")
+                    for _ in range(depth - 1):
+                        self.emit("lw t0,-4(t0)")
                     self.emit("sw t0,-4(fp)")
-                else:
-                    # Different level call - callee is at a different nesting level
-                    # Here we assume the callee is a direct child - would need more complex logic otherwise
-                    self.emit("sw sp,-4(fp)")
                 
                 # Actual call
                 self.emit(f"addi sp,sp,{self.framelength}")
@@ -349,17 +409,16 @@ class RISCVCodeGenerator:
                 self.emit(f"li a7,10")
                 self.emit(f"ecall")
 
-    def is_local_var(self, var):
-        """Simplified check if variable is local (would use symbol table in full implementation)."""
-        # In a real implementation, this would check the symbol table
-        # For now, we'll assume most variables are local
-        return not var.startswith('global_')
-
-    def is_same_level_call(self, func_name):
-        """Simplified check if call is to the same nesting level."""
-        # In a real implementation, this would check nesting levels in the symbol table
-        # For simplicity, we'll assume same level calls
-        return True  
+    def callee_depth(self, func_name):
+        """How many scopes out from the caller the callee is declared, 1 for the calls at the same level."""
+        if self.resolution is None:
+            # Without a NameResolution, the calls are taken as calls at the same level
+            return 1
+        resolution = self.names.get(func_name)
+        if resolution is None:
+            self.warn("Subprogram %s not declared", func_name)
+            return 1
+        return resolution.depth
 
     def get_complete_code(self):
         """Return the complete generated RISC-V assembly code."""
@@ -367,17 +426,18 @@ class RISCVCodeGenerator:
         return '\n'.join(self.code)
 
 
-def generate_risc_v_code(quads, symbol_table=None):
+def generate_risc_v_code(quads, symbol_table=None, resolution=None):
     """
     Generate RISC-V assembly code from intermediate code quadruples.
 
     Args:
         :param quads: List of quadruples (tuples) generated by IntermediateCodeGenerator
         :param symbol_table: The symbol table of the program
+        :param resolution: The NameResolution of the program, from resolve_names or translate
 
     Returns:
         String containing RISC-V assembly code
     """
-    rv_generator = RISCVCodeGenerator(symbol_table)
+    rv_generator = RISCVCodeGenerator(symbol_table, resolution)
     rv_generator.generate_code_from_quads(quads)
     return rv_generator.get_complete_code()
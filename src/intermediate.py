@@ -4,6 +4,11 @@
 # and syntax analysis.                                                  #
 #########################################################################
 
+from src.lexer import TokenType, TokenKind
+from src.syntaxAST import ASTNode, NodeVisitor, Syntax, SEQUENCE_FOLLOW
+from src.symboltable import SymbolTable, NameResolution
+
+
 class IntermediateCodeGenerator:
     """
     Class to generate intermediate code in the form of quadruples.
@@ -45,7 +50,14 @@ class IntermediateCodeGenerator:
 
     def backpatch(self, quad_list, z):
         """Complete the quadruples in the list with the label z."""
+        quads = self.quads
         for quad_label in quad_list:
+            # The labels go up by quad_increment from the first quad, so the quad is usually found by its position
+            i = (quad_label - quads[0][0]) // self.quad_increment if quads else -1
+            if 0 <= i < len(quads) and quads[i][0] == quad_label:
+                quad = quads[i]
+                quads[i] = (quad[0], quad[1], quad[2], quad[3], z)
+                continue
             for i, quad in enumerate(self.quads):
                 if quad[0] == quad_label:
                     # Replace the fourth element (destination) with z
@@ -76,6 +88,10 @@ class ExpressionProcessor:
     """
     Class to process expressions and generate intermediate code.
     It processes expressions, terms, and conditions based on the AST structure.
+
+    The process methods are generators that yield the generators of their subexpressions and
+    are sent back their results, so they are run by the NodeVisitor of the statements without
+    recursion.
     """
 
     def __init__(self, code_gen):
@@ -83,48 +99,45 @@ class ExpressionProcessor:
 
     def process_expression(self, expr_node):
         """Process an expression node based on the AST structure."""
-        if expr_node['type'] == 'EXPRESSION':
+        if expr_node.type == 'EXPRESSION':
             # Process children nodes
-            #Example of object: {'type': 'PROGRAM', 'children': [{'type': 'IDENTIFIER', 'value': 'τεστ', 'line': 1},...]}
-            if 'children' in expr_node and expr_node['children']:
-                for child in expr_node['children']:
-                    if child['type'] == 'BINARY_OPERATION':
-                        return self.process_binary_operation(child)
-                    elif child['type'] == 'TERM':
-                        return self.process_term(child)
-                    elif child['type'] == 'OPTIONAL_SIGN':
-                        sign = self.process_sign(child)
-                        term = self.process_term(expr_node['children'][1])
-                        if sign == '-':
-                            temp = self.code_gen.new_temp()
-                            self.code_gen.gen_quad('-', '0', term, temp)
-                            return temp
-                        return term
+            for child in expr_node.children:
+                if child.type == 'BINARY_OPERATION':
+                    return (yield self.process_binary_operation(child))
+                elif child.type == 'TERM':
+                    return (yield self.process_term(child))
+                elif child.type == 'OPTIONAL_SIGN':
+                    sign = self.process_sign(child)
+                    term = (yield self.process_term(expr_node.children[1]))
+                    if sign == '-':
+                        temp = self.code_gen.new_temp()
+                        self.code_gen.gen_quad('-', '0', term, temp)
+                        return temp
+                    return term
 
         # Default case (unexpected structure)
         return None
 
     def process_sign(self, sign_node):
         """Process a sign node."""
-        if 'children' in sign_node and sign_node['children']:
-            for child in sign_node['children']:
-                if child['type'] == 'ADD_OPERATOR':
-                    return child['value']
+        for child in sign_node.children:
+            if child.type == 'ADD_OPERATOR':
+                return child.value
         return '+'  # Default to positive if no sign found
 
     def process_binary_operation(self, op_node):
         """Process a binary operation node."""
-        if 'value' not in op_node:
+        if op_node.value is None:
             return None
 
-        op = op_node['value']
+        op = op_node.value
         left = None
         right = None
 
         # Extract the operands
-        if 'children' in op_node and len(op_node['children']) >= 2:
-            left = self.process_term(op_node['children'][0])
-            right = self.process_term(op_node['children'][1])
+        if len(op_node.children) >= 2:
+            left = (yield self.process_term(op_node.children[0]))
+            right = (yield self.process_term(op_node.children[1]))
 
         # Generate intermediate code for the operation
         if left and right:
@@ -136,99 +149,96 @@ class ExpressionProcessor:
 
     def process_term(self, term_node):
         """Process a term node."""
-        if term_node['type'] == 'TERM':
-            if 'children' in term_node and term_node['children']:
-                child = term_node['children'][0]
-
-                if child['type'] == 'NUMBER':
-                    return child['value']
-
-                elif child['type'] == 'IDENTIFIER':
-                    if 'children' in child and child['children']:
-                        identifier_node = child['children'][0]
-
-                        # Check if there's a function call (ID_TAIL)
-                        if len(child['children']) > 1 and child['children'][1]['type'] == 'ID_TAIL':
-                            func_name = identifier_node['value']
-                            params = []
-
-                            # Extract parameters
-                            id_tail = child['children'][1]
-                            if 'children' in id_tail and id_tail['children']:
-                                actual_params = id_tail['children'][0]
-                                if 'children' in actual_params and actual_params['children']:
-                                    param_list = actual_params['children'][0]
-                                    if 'children' in param_list:
-                                        for param in param_list['children']:
-                                            if param['type'] == 'VALUE_PARAMETER':
-                                                param_expr = self.process_expression(param['children'][0])
-                                                params.append(param_expr)
-
-                            # Generate function call code
-                            for param in params:
-                                self.code_gen.gen_quad("par", param, "cv", "_")
-
-                            result_place = self.code_gen.new_temp()
-                            self.code_gen.gen_quad("par", result_place, "ret", "_")
-                            self.code_gen.gen_quad("call", func_name, "_", "_")
-                            return result_place
-
-                        return identifier_node['value']
-
-                elif child['type'] == 'BINARY_OPERATION':
-                    return self.process_binary_operation(child)
-
-                elif child['type'] == 'PARENTHESIZED_EXPRESSION':
-                    if 'children' in child and child['children']:
-                        return self.process_expression(child['children'][0])
+        if term_node.type == 'TERM' and term_node.children:
+            child = term_node.children[0]
+
+            if child.type == 'NUMBER':
+                return child.value
+
+            elif child.type == 'IDENTIFIER':
+                if child.children:
+                    identifier_node = child.children[0]
+
+                    # Check if there's a function call (ID_TAIL)
+                    if len(child.children) > 1 and child.children[1].type == 'ID_TAIL':
+                        func_name = identifier_node.value
+                        params = []
+
+                        # Extract parameters
+                        id_tail = child.children[1]
+                        if id_tail.children:
+                            actual_params = id_tail.children[0]
+                            if actual_params.children:
+                                param_list = actual_params.children[0]
+                                for param in param_list.children:
+                                    if param.type == 'VALUE_PARAMETER':
+                                        param_expr = (yield self.process_expression(param.children[0]))
+                                        params.append(param_expr)
+
+                        # Generate function call code
+                        for param in params:
+                            self.code_gen.gen_quad("par", param, "cv", "_")
+
+                        result_place = self.code_gen.new_temp()
+                        self.code_gen.gen_quad("par", result_place, "ret", "_")
+                        self.code_gen.gen_quad("call", func_name, "_", "_")
+                        return result_place
+
+                    return identifier_node.value
+
+            elif child.type == 'BINARY_OPERATION':
+                return (yield self.process_binary_operation(child))
+
+            elif child.type == 'PARENTHESIZED_EXPRESSION':
+                if child.children:
+                    return (yield self.process_expression(child.children[0]))
 
         return None
 
     def process_condition(self, condition_node):
         """Process a condition node and returns true and false lists."""
-        if condition_node['type'] == 'CONDITION':
-            if 'children' in condition_node and condition_node['children']:
-                # For simplicity, focusing on the first child (could be complex in reality)
-                child = condition_node['children'][0]
-
-                if child['type'] == 'BOOL_TERM':
-                    return self.process_bool_term(child)
-                elif child['type'] == 'OR_OPERATOR':
-                    left_true, left_false = self.process_condition(child['children'][0])
-                    right_true, right_false = self.process_condition(child['children'][1])
-                    self.code_gen.backpatch(left_false, self.code_gen.next_quad_label())
-                    return self.code_gen.merge(left_true, right_true), right_false
+        if condition_node.type == 'CONDITION' and condition_node.children:
+            # For simplicity, focusing on the first child (could be complex in reality)
+            child = condition_node.children[0]
+
+            if child.type == 'BOOL_TERM':
+                return (yield self.process_bool_term(child))
+            elif child.type == 'OR_OPERATOR':
+                left_true, left_false = (yield self.process_condition(child.children[0]))
+                right_true, right_false = (yield self.process_condition(child.children[1]))
+                self.code_gen.backpatch(left_false, self.code_gen.next_quad_label())
+                return self.code_gen.merge(left_true, right_true), right_false
 
         # Default case
         return self.code_gen.empty_list(), self.code_gen.empty_list()
 
     def process_bool_term(self, bool_term_node):
         """Process a boolean term node."""
-        if 'children' in bool_term_node and bool_term_node['children']:
-            child = bool_term_node['children'][0]
+        if bool_term_node.children:
+            child = bool_term_node.children[0]
 
-            if child['type'] == 'COMPARISON':
-                return self.process_comparison(child)
-            elif child['type'] == 'AND_OPERATOR':
-                left_true, left_false = self.process_bool_term(child['children'][0])
+            if child.type == 'COMPARISON':
+                return (yield self.process_comparison(child))
+            elif child.type == 'AND_OPERATOR':
+                left_true, left_false = (yield self.process_bool_term(child.children[0]))
                 self.code_gen.backpatch(left_true, self.code_gen.next_quad_label())
-                right_true, right_false = self.process_bool_term(child['children'][1])
+                right_true, right_false = (yield self.process_bool_term(child.children[1]))
                 return right_true, self.code_gen.merge(left_false, right_false)
-            elif child['type'] == 'PARENTHESIZED_CONDITION':
-                return self.process_condition(child['children'][0])
+            elif child.type == 'PARENTHESIZED_CONDITION':
+                return (yield self.process_condition(child.children[0]))
 
         # Default case
         return self.code_gen.empty_list(), self.code_gen.empty_list()
 
     def process_comparison(self, comparison_node):
         """Process a comparison node."""
-        if 'children' in comparison_node and len(comparison_node['children']) >= 3:
-            left_expr = self.process_expression(comparison_node['children'][0])
-            op_node = comparison_node['children'][1]
-            right_expr = self.process_expression(comparison_node['children'][2])
+        if len(comparison_node.children) >= 3:
+            left_expr = (yield self.process_expression(comparison_node.children[0]))
+            op_node = comparison_node.children[1]
+            right_expr = (yield self.process_expression(comparison_node.children[2]))
 
-            if op_node['type'] == 'RELATIONAL_OPERATOR':
-                op = op_node['value']
+            if op_node.type == 'RELATIONAL_OPERATOR':
+                op = op_node.value
                 true_list = self.code_gen.make_list(self.code_gen.gen_quad(op, left_expr, right_expr, "_"))
                 false_list = self.code_gen.make_list(self.code_gen.gen_quad("jump", "_", "_", "_"))
 
@@ -238,75 +248,60 @@ class ExpressionProcessor:
         return self.code_gen.empty_list(), self.code_gen.empty_list()
 
 
-class StatementProcessor:
+class StatementProcessor(NodeVisitor):
+    """
+    Visitor that generates the intermediate code of statements.
+    Statements of other types are skipped. The statements and expressions inside a statement
+    are yielded to visit, so nested ones do not use the Python stack.
+    """
+
     def __init__(self, code_gen, expr_processor):
         self.code_gen = code_gen
         self.expr_processor = expr_processor
 
+    def generic_visit(self, node):
+        pass
+
     def process_sequence(self, sequence_node):
         """Process a sequence of statements."""
-        if sequence_node['type'] == 'SEQUENCE' and 'children' in sequence_node:
-            for stmt in sequence_node['children']:
-                self.process_statement(stmt)
+        if sequence_node.type == 'SEQUENCE':
+            for stmt in sequence_node.children:
+                yield stmt
 
     def process_statement(self, stmt_node):
         """Process a statement based on its type."""
-        if 'type' not in stmt_node:
-            return
-
-        stmt_type = stmt_node['type']
-
-        if stmt_type == 'ASSIGNMENT':
-            self.process_assignment(stmt_node)
-        elif stmt_type == 'IF_STATEMENT':
-            self.process_if_statement(stmt_node)
-        elif stmt_type == 'WHILE_STATEMENT':
-            self.process_while_statement(stmt_node)
-        elif stmt_type == 'DO_WHILE_STATEMENT':
-            self.process_do_while_statement(stmt_node)
-        elif stmt_type == 'FOR_STATEMENT':
-            self.process_for_statement(stmt_node)
-        elif stmt_type == 'CALL_STATEMENT':
-            self.process_call_statement(stmt_node)
-        elif stmt_type == 'INPUT_STATEMENT':
-            self.process_input_statement(stmt_node)
-        elif stmt_type == 'PRINT_STATEMENT':
-            self.process_print_statement(stmt_node)
-        elif stmt_type == 'RETURN_STATEMENT':
-            self.process_return_statement(stmt_node)
-        elif stmt_type == 'SEQUENCE':
-            self.process_sequence(stmt_node)
+        return self.visit(stmt_node)
 
     def process_assignment(self, assignment_node):
         """Process an assignment statement."""
-        if 'children' in assignment_node and len(assignment_node['children']) >= 2:
-            identifier = assignment_node['children'][0]['value']
-            expr_node = assignment_node['children'][1]
-            expr_place = self.expr_processor.process_expression(expr_node)
+        if len(assignment_node.children) >= 2:
+            identifier = assignment_node.children[0].value
+            expr_node = assignment_node.children[1]
+            expr_place = (yield self.expr_processor.process_expression(expr_node))
 
             if expr_place:
                 self.code_gen.gen_quad(":=", expr_place, "_", identifier)
 
     def process_if_statement(self, if_node):
         """Process an if statement."""
-        if 'children' in if_node and len(if_node['children']) >= 2:
-            condition_node = if_node['children'][0]
-            then_block = if_node['children'][1]
+        if len(if_node.children) >= 2:
+            condition_node = if_node.children[0]
+            then_block = if_node.children[1]
 
             # Process condition
-            true_list, false_list = self.expr_processor.process_condition(condition_node)
+            true_list, false_list = (yield self.expr_processor.process_condition(condition_node))
 
             # Backpatch true condition to execute 'then' part
             self.code_gen.backpatch(true_list, self.code_gen.next_quad_label())
 
             # Process 'then' statements
-            if then_block['type'] == 'THEN_BLOCK' and 'children' in then_block:
-                for child in then_block['children']:
-                    self.process_statement(child)
+            if then_block.type == 'THEN_BLOCK':
+                for child in then_block.children:
+                    yield child
 
             # Check if there's an 'else' block
-            if len(if_node['children']) > 2:
-                else_block = if_node['children'][2]
+            if len(if_node.children) > 2:
+                else_block = if_node.children[2]
 
                 # Generate jump for 'then' part to skip 'else' part
                 if_end = self.code_gen.make_list(self.code_gen.gen_quad("jump", "_", "_", "_"))
@@ -315,9 +310,9 @@ class StatementProcessor:
                 self.code_gen.backpatch(false_list, self.code_gen.next_quad_label())
 
                 # Process 'else' statements
-                if else_block['type'] == 'ELSE_BLOCK' and 'children' in else_block:
-                    for child in else_block['children']:
-                        self.process_statement(child)
+                if else_block.type == 'ELSE_BLOCK':
+                    for child in else_block.children:
+                        yield child
 
                 # Backpatch end of 'then' to jump here (after 'else')
                 self.code_gen.backpatch(if_end, self.code_gen.next_quad_label())
@@ -327,21 +322,21 @@ class StatementProcessor:
 
     def process_while_statement(self, while_node):
         """Process a while statement."""
-        if 'children' in while_node and len(while_node['children']) >= 2:
-            condition_node = while_node['children'][0]
-            body = while_node['children'][1]
+        if len(while_node.children) >= 2:
+            condition_node = while_node.children[0]
+            body = while_node.children[1]
 
             # Remember the quad where condition evaluation begins
             cond_quad = self.code_gen.next_quad_label()
 
             # Process the condition
-            true_list, false_list = self.expr_processor.process_condition(condition_node)
+            true_list, false_list = (yield self.expr_processor.process_condition(condition_node))
 
             # Backpatch true condition to execute loop body
             self.code_gen.backpatch(true_list, self.code_gen.next_quad_label())
 
             # Process loop body
-            self.process_statement(body)
+            yield body
 
             # Generate jump back to condition
             self.code_gen.gen_quad("jump", "_", "_", cond_quad)
@@ -351,18 +346,18 @@ class StatementProcessor:
 
     def process_do_while_statement(self, do_while_node):
         """Process a repeat-until/do-while statement."""
-        if 'children' in do_while_node and len(do_while_node['children']) >= 2:
-            body = do_while_node['children'][0]
-            condition_node = do_while_node['children'][1]
+        if len(do_while_node.children) >= 2:
+            body = do_while_node.children[0]
+            condition_node = do_while_node.children[1]
 
             # Remember the quad where the body starts
             body_quad = self.code_gen.next_quad_label()
 
             # Process the body
-            self.process_statement(body)
+            yield body
 
             # Process the condition
-            true_list, false_list = self.expr_processor.process_condition(condition_node)
+            true_list, false_list = (yield self.expr_processor.process_condition(condition_node))
 
             # If condition is false, jump back to body
             self.code_gen.backpatch(false_list, body_quad)
@@ -372,24 +367,24 @@ class StatementProcessor:
 
     def process_for_statement(self, for_node):
         """Process a for statement."""
-        if 'children' in for_node and len(for_node['children']) >= 5:
-            counter_var = for_node['children'][0]['value']
-            start_expr = for_node['children'][1]
-            end_expr = for_node['children'][2]
-            step_expr = for_node['children'][3]
-            body = for_node['children'][4]
+        if len(for_node.children) >= 5:
+            counter_var = for_node.children[0].value
+            start_expr = for_node.children[1]
+            end_expr = for_node.children[2]
+            step_expr = for_node.children[3]
+            body = for_node.children[4]
 
             # Initialize counter variable
-            if 'children' in start_expr:
-                start_value = self.expr_processor.process_expression(start_expr['children'][0])
+            if start_expr.children:
+                start_value = (yield self.expr_processor.process_expression(start_expr.children[0]))
                 self.code_gen.gen_quad(":=", start_value, "_", counter_var)
 
             # Start of the loop
             loop_start = self.code_gen.next_quad_label()
 
             # Generate the condition check (counter <= end_value)
-            if 'children' in end_expr:
-                end_value = self.expr_processor.process_expression(end_expr['children'][0])
+            if end_expr.children:
+                end_value = (yield self.expr_processor.process_expression(end_expr.children[0]))
                 condition_temp = self.code_gen.new_temp()
                 self.code_gen.gen_quad("<=", counter_var, end_value, condition_temp)
 
@@ -397,11 +392,11 @@ class StatementProcessor:
                 exit_jump = self.code_gen.gen_quad("jumpz", condition_temp, "_", "_")
 
                 # Process loop body
-                self.process_statement(body)
+                yield body
 
                 # Increment counter
-                if 'children' in step_expr:
-                    step_value = self.expr_processor.process_expression(step_expr['children'][0])
+                if step_expr.children:
+                    step_value = (yield self.expr_processor.process_expression(step_expr.children[0]))
                     temp = self.code_gen.new_temp()
                     self.code_gen.gen_quad("+", counter_var, step_value, temp)
                     self.code_gen.gen_quad(":=", temp, "_", counter_var)
@@ -414,21 +409,20 @@ class StatementProcessor:
 
     def process_call_statement(self, call_node):
         """Process a procedure call statement."""
-        if 'children' in call_node and len(call_node['children']) >= 2:
-            proc_name = call_node['children'][0]['value']
+        if len(call_node.children) >= 2:
+            proc_name = call_node.children[0].value
             params = []
 
             # Extract parameters
-            id_tail = call_node['children'][1]
-            if 'children' in id_tail and id_tail['children']:
-                actual_params = id_tail['children'][0]
-                if 'children' in actual_params and actual_params['children']:
-                    param_list = actual_params['children'][0]
-                    if 'children' in param_list:
-                        for param in param_list['children']:
-                            if param['type'] == 'VALUE_PARAMETER' and 'children' in param:
-                                param_expr = self.expr_processor.process_expression(param['children'][0])
-                                params.append(param_expr)
+            id_tail = call_node.children[1]
+            if id_tail.children:
+                actual_params = id_tail.children[0]
+                if actual_params.children:
+                    param_list = actual_params.children[0]
+                    for param in param_list.children:
+                        if param.type == 'VALUE_PARAMETER' and param.children:
+                            param_expr = (yield self.expr_processor.process_expression(param.children[0]))
+                            params.append(param_expr)
 
             # Generate procedure call code
             for param in params:
@@ -438,31 +432,43 @@ class StatementProcessor:
 
     def process_input_statement(self, input_node):
         """Process an input statement."""
-        if 'children' in input_node and input_node['children']:
-            var_node = input_node['children'][0]
-            var_name = var_node['value']
+        if input_node.children:
+            var_node = input_node.children[0]
+            var_name = var_node.value
             self.code_gen.gen_quad("in", "_", "_", var_name)
 
     def process_print_statement(self, print_node):
         """Process a print statement."""
-        if 'children' in print_node and print_node['children']:
-            expr_node = print_node['children'][0]
-            expr_place = self.expr_processor.process_expression(expr_node)
+        if print_node.children:
+            expr_node = print_node.children[0]
+            expr_place = (yield self.expr_processor.process_expression(expr_node))
 
             if expr_place:
                 self.code_gen.gen_quad("out", expr_place, "_", "_")
 
     def process_return_statement(self, return_node):
         """Process a return statement."""
-        if 'children' in return_node and return_node['children']:
-            expr_node = return_node['children'][0]
-            expr_place = self.expr_processor.process_expression(expr_node)
+        if return_node.children:
+            expr_node = return_node.children[0]
+            expr_place = (yield self.expr_processor.process_expression(expr_node))
 
             if expr_place:
                 self.code_gen.gen_quad("retv", expr_place, "_", "_")
             else:
                 self.code_gen.gen_quad("ret", "_", "_", "_")
 
+    # The statement types that visit dispatches on
+    visit_ASSIGNMENT = process_assignment
+    visit_IF_STATEMENT = process_if_statement
+    visit_WHILE_STATEMENT = process_while_statement
+    visit_DO_WHILE_STATEMENT = process_do_while_statement
+    visit_FOR_STATEMENT = process_for_statement
+    visit_CALL_STATEMENT = process_call_statement
+    visit_INPUT_STATEMENT = process_input_statement
+    visit_PRINT_STATEMENT = process_print_statement
+    visit_RETURN_STATEMENT = process_return_statement
+    visit_SEQUENCE = process_sequence
+
 
 class ProgramProcessor:
     def __init__(self, code_gen, stmt_processor, symbol_table=None):
@@ -472,80 +478,397 @@ class ProgramProcessor:
 
     def process_program(self, ast):
         """Process a complete program AST."""
-        if ast['type'] == 'PROGRAM':
-            program_name = ast['children'][0]['value']
-            program_block = ast['children'][1]
+        if ast.type == 'PROGRAM':
+            program_name = ast.children[0].value
+            program_block = ast.children[1]
 
             # Get declarations, subprograms, and statements
             declarations_block = None
             subprograms_block = None
             statements_block = None
 
-            if 'children' in program_block:
-                for child in program_block['children']:
-                    if child['type'] == 'DECLARATIONS':
-                        declarations_block = child
-                    elif child['type'] == 'SUBPROGRAMS':
-                        subprograms_block = child
-                    elif child['type'] == 'SEQUENCE':
-                        statements_block = child
-
-            # Generate program start
-            self.code_gen.gen_quad("begin_block", program_name, "_", "_")
-
-            # Process functions and procedures
-            if subprograms_block and 'children' in subprograms_block:
-                for subprogram in subprograms_block['children']:
-                    if subprogram['type'] == 'FUNCTION':
-                        self.process_function(subprogram)
-                    elif subprogram['type'] == 'PROCEDURE':
-                        self.process_procedure(subprogram)
+            for child in program_block.children:
+                if child.type == 'DECLARATIONS':
+                    declarations_block = child
+                elif child.type == 'SUBPROGRAMS':
+                    subprograms_block = child
+                elif child.type == 'SEQUENCE':
+                    statements_block = child
+
+            # Generate program start, in the global scope
+            self.code_gen.gen_quad("begin_block", program_name, 0, "_")
+
+            # Process functions and procedures, with the ids that build_symbol_table gives their scopes
+            if subprograms_block:
+                scope_id = 1
+                for subprogram in subprograms_block.children:
+                    if subprogram.type == 'FUNCTION':
+                        self.process_function(subprogram, scope_id)
+                    elif subprogram.type == 'PROCEDURE':
+                        self.process_procedure(subprogram, scope_id)
+                    else:
+                        continue
+                    scope_id += count_subprograms(subprogram)
 
             # Process statements in the main program
             if statements_block:
-                self.stmt_processor.process_sequence(statements_block)
+                self.stmt_processor.visit(statements_block)
 
             # Generate program end
             self.code_gen.gen_quad("halt", "_", "_", "_")
             self.code_gen.gen_quad("end_block", program_name, "_", "_")
 
-    def process_function(self, function_node):
-        """Process a function."""
-        if 'children' in function_node and len(function_node['children']) >= 3:
-            function_name = function_node['children'][0]['value']
-            block = function_node['children'][2]
+    def process_function(self, function_node, scope_id):
+        """Process a function, whose scope has the given id."""
+        if len(function_node.children) >= 3:
+            function_name = function_node.children[0].value
+            block = function_node.children[2]
 
             # Generate function start
-            self.code_gen.gen_quad("begin_block", function_name, "_", "_")
+            self.code_gen.gen_quad("begin_block", function_name, scope_id, "_")
 
             # Process function body
-            if 'children' in block:
-                for child in block['children']:
-                    if child['type'] == 'SEQUENCE':
-                        self.stmt_processor.process_sequence(child)
+            for child in block.children:
+                if child.type == 'SEQUENCE':
+                    self.stmt_processor.visit(child)
 
             # Generate function end
             self.code_gen.gen_quad("end_block", function_name, "_", "_")
 
-    def process_procedure(self, procedure_node):
-        """Process a procedure."""
-        if 'children' in procedure_node and len(procedure_node['children']) >= 3:
-            procedure_name = procedure_node['children'][0]['value']
-            block = procedure_node['children'][2]
+    def process_procedure(self, procedure_node, scope_id):
+        """Process a procedure, whose scope has the given id."""
+        if len(procedure_node.children) >= 3:
+            procedure_name = procedure_node.children[0].value
+            block = procedure_node.children[2]
 
             # Generate procedure start
-            self.code_gen.gen_quad("begin_block", procedure_name, "_", "_")
+            self.code_gen.gen_quad("begin_block", procedure_name, scope_id, "_")
 
             # Process procedure body
-            if 'children' in block:
-                for child in block['children']:
-                    if child['type'] == 'SEQUENCE':
-                        self.stmt_processor.process_sequence(child)
+            for child in block.children:
+                if child.type == 'SEQUENCE':
+                    self.stmt_processor.visit(child)
 
             # Generate procedure end
             self.code_gen.gen_quad("end_block", procedure_name, "_", "_")
 
 
+def count_subprograms(node):
+    """
+    Return the number of subprograms in the subtree of a subprogram, itself included, which is the
+    number of scopes it has. Only the blocks of the subprograms are looked at, not their statements.
+    """
+    count = 0
+    stack = [node]
+    while stack:
+        node = stack.pop()
+        count += 1
+        for block in node.children[2:]:
+            for child in block.children:
+                if child.type == 'SUBPROGRAMS':
+                    stack.extend(subprogram for subprogram in child.children
+                                 if subprogram.type == 'FUNCTION' or subprogram.type == 'PROCEDURE')
+    return count
+
+
+class TranslatingSyntax(Syntax):
+    """
+    Parser that generates the intermediate code and the symbol table while it parses, in one pass.
+
+    The rules of the program, the subprograms, the declarations and the statements emit their quads
+    and declare their names as soon as they recognize them, instead of building nodes, giving the
+    same quads and symbol table as build_symbol_table and generate_intermediate_code would for the
+    AST. Only the expressions and conditions are still parsed into nodes, each one being lowered by
+    an ExpressionProcessor when its statement needs its code and dropped after that: whether a part
+    of an expression gets code depends on the operators that follow it.
+
+    parse returns the IntermediateCodeGenerator, the symbol table is `self.symbol_table`, and the
+    NameResolution of the names used in each block is `self.resolution`, as resolve_names would give it
+    without the uses of the nodes, which are not kept. The names are resolved at the end of the program,
+    since a subprogram can call the ones declared after it.
+    There is no error recovery, since the code of a statement is emitted before its end is parsed.
+    """
+
+    def __init__(self, tokens, trivia=None):
+        super().__init__(tokens, trivia)
+        self.symbol_table = SymbolTable()
+        self.resolution = NameResolution()
+        self.use_code_gen(IntermediateCodeGenerator())
+
+    def use_code_gen(self, code_gen):
+        """Emit the quads to `code_gen` from now on."""
+        self.code_gen = code_gen
+        self.expr_processor = ExpressionProcessor(code_gen)
+        self.stmt_processor = StatementProcessor(code_gen, self.expr_processor)
+
+    def lower_expression(self, expr_node=None):
+        """Parse an expression, unless its node is given, and return the place of its value, as process_expression does."""
+        if expr_node is None:
+            expr_node = self.expression()
+        return self.stmt_processor.run(self.expr_processor.process_expression(expr_node))
+
+    def lower_condition(self):
+        """Parse a condition and return its true and false lists, as process_condition does."""
+        return self.stmt_processor.run(self.expr_processor.process_condition(self.condition()))
+
+    def name(self):
+        """Eat an identifier token and return its name."""
+        if self.current_kind != TokenKind.IDENTIFIER:
+            self.error(f"Expected token type {TokenType.IDENTIFIER}")
+        name = self.current_value
+        self.advance()
+        return name
+
+    def use_name(self):
+        """Eat an identifier token that uses its name, and return the name."""
+        line = self.current_line
+        name = self.name()
+        self.resolution.use_later(name, line)
+        return name
+
+    def identifier(self):
+        # Only the expressions still parse their identifiers into nodes, and those are all uses
+        node = super().identifier()
+        self.resolution.use_later(node.value, node.line)
+        return node
+
+    def declare(self, names, entity_type):
+        for name in names:
+            self.symbol_table.insert(name, entity_type)
+
+    def program(self):
+        """program : 'πρόγραμμα' ID programblock"""
+        self.expect(TokenKind.PROGRAM)
+        program_name = self.name()
+        self.symbol_table.insert(program_name, 'program')
+        self.resolution.enter(0)
+        self.code_gen.gen_quad("begin_block", program_name, 0, "_")
+
+        self.declarations()
+        self.subprograms()
+        self.expect(TokenKind.BEGIN_PROGRAM)
+        self.run(self.sequence())
+        self.expect(TokenKind.END_PROGRAM)
+
+        self.code_gen.gen_quad("halt", "_", "_", "_")
+        self.code_gen.gen_quad("end_block", program_name, "_", "_")
+        self.resolution.exit()
+        self.resolution.resolve_later(self.symbol_table.freeze())
+        return self.code_gen
+
+    def declarations(self):
+        """declarations : ('δήλωση' varlist)* | """
+        while self.current_kind == TokenKind.DECLARE:
+            self.expect(TokenKind.DECLARE)
+            self.declare(self.varlist(), 'variable')
+
+    def varlist(self):
+        """varlist : ID (',' ID)*, returned as the list of the names"""
+        names = [self.name()]
+        while self.current_kind == TokenKind.COMMA:
+            self.expect(TokenKind.COMMA)
+            names.append(self.name())
+        return names
+
+    def subprograms(self):
+        """subprograms : (func | proc)*"""
+        subprogram_rules = self.subprogram_rules
+        while self.current_kind in subprogram_rules:
+            subprogram_rules[self.current_kind]()
+
+    def nested_subprograms(self):
+        """Parse the subprograms of a subprogram. ProgramProcessor gives them no code, so their quads are dropped."""
+        code_gen = self.code_gen
+        self.use_code_gen(IntermediateCodeGenerator())
+        try:
+            self.subprograms()
+        finally:
+            self.use_code_gen(code_gen)
+
+    def func(self):
+        """func : 'συνάρτηση' ID '(' formalparlist ')' funcblock"""
+        self.subprogram(TokenKind.FUNCTION, 'function', TokenKind.BEGIN_FUNCTION, TokenKind.END_FUNCTION)
+
+    def proc(self):
+        """proc : 'διαδικασία' ID '(' formalparlist ')' procblock"""
+        self.subprogram(TokenKind.PROCEDURE, 'procedure', TokenKind.BEGIN_PROCEDURE, TokenKind.END_PROCEDURE)
+
+    def subprogram(self, kind, entity_type, begin, end):
+        """
+        Parse a function or a procedure, with its block:
+        'διαπροσωπεία' funcinput funcoutput declarations subprograms begin sequence end
+        """
+        self.expect(kind)
+        self.open_blocks.append(end)
+        name = self.name()
+        self.expect(TokenKind.LEFT_PARENTHESIS)
+        params = self.varlist() if self.current_kind == TokenKind.IDENTIFIER else []
+        self.expect(TokenKind.RIGHT_PARENTHESIS)
+
+        self.symbol_table.insert(name, entity_type, params)
+        self.symbol_table.enter_scope(name)
+        scope_id = len(self.symbol_table.all_scopes) - 1
+        self.resolution.enter(scope_id)
+        self.declare(params, 'parameter')
+
+        self.expect(TokenKind.INTERFACE)
+        for keyword in (TokenKind.INPUT, TokenKind.OUTPUT):
+            if self.current_kind == keyword:
+                self.expect(keyword)
+                self.declare(self.varlist(), 'variable')
+        self.declarations()
+        self.nested_subprograms()
+
+        self.expect(begin)
+        self.code_gen.gen_quad("begin_block", name, scope_id, "_")
+        self.run(self.sequence())
+        self.code_gen.gen_quad("end_block", name, "_", "_")
+        self.expect(end)
+
+        self.symbol_table.exit_scope()
+        self.resolution.exit()
+        self.open_blocks.pop()
+
+    def sequence(self):
+        """sequence : statement (';' statement)*, as a step (see Syntax.run)"""
+        yield self.statement()
+        while self.current_kind == TokenKind.SEMICOLON:
+            self.expect(TokenKind.SEMICOLON)
+            if self.current_kind in SEQUENCE_FOLLOW:
+                break
+            yield self.statement()
+
+    def assignment_stat(self):
+        """assignment_stat : ID ':=' expression"""
+        identifier = self.use_name()
+        self.expect(TokenKind.ASSIGN)
+        expr_place = self.lower_expression()
+        if expr_place:
+            self.code_gen.gen_quad(":=", expr_place, "_", identifier)
+
+    def if_stat(self):
+        """if_stat : 'εάν' condition 'τότε' sequence elsepart 'εάν_τέλος'"""
+        self.expect(TokenKind.IF)
+        self.open_blocks.append(TokenKind.END_IF)
+        true_list, false_list = self.lower_condition()
+        self.code_gen.backpatch(true_list, self.code_gen.next_quad_label())
+
+        self.expect(TokenKind.THEN)
+        yield self.sequence()
+
+        # The else part is always there in the AST, even when it is empty
+        if_end = self.code_gen.make_list(self.code_gen.gen_quad("jump", "_", "_", "_"))
+        self.code_gen.backpatch(false_list, self.code_gen.next_quad_label())
+        if self.current_kind == TokenKind.ELSE:
+            self.expect(TokenKind.ELSE)
+            yield self.sequence()
+        self.code_gen.backpatch(if_end, self.code_gen.next_quad_label())
+
+        self.expect(TokenKind.END_IF)
+        self.open_blocks.pop()
+
+    def while_stat(self):
+        """while_stat : 'όσο' condition 'επανάλαβε' sequence 'όσο_τέλος'"""
+        self.expect(TokenKind.WHILE)
+        self.open_blocks.append(TokenKind.END_WHILE)
+        cond_quad = self.code_gen.next_quad_label()
+        true_list, false_list = self.lower_condition()
+        self.code_gen.backpatch(true_list, self.code_gen.next_quad_label())
+
+        self.expect(TokenKind.REPEAT)
+        yield self.sequence()
+        self.code_gen.gen_quad("jump", "_", "_", cond_quad)
+        self.code_gen.backpatch(false_list, self.code_gen.next_quad_label())
+
+        self.expect(TokenKind.END_WHILE)
+        self.open_blocks.pop()
+
+    def do_stat(self):
+        """do_stat : 'επανάλαβε' sequence 'μέχρι' condition"""
+        self.expect(TokenKind.REPEAT)
+        self.open_blocks.append(TokenKind.UNTIL)
+        body_quad = self.code_gen.next_quad_label()
+        yield self.sequence()
+        self.expect(TokenKind.UNTIL)
+        self.open_blocks.pop()
+
+        true_list, false_list = self.lower_condition()
+        self.code_gen.backpatch(false_list, body_quad)
+        self.code_gen.backpatch(true_list, self.code_gen.next_quad_label())
+
+    def for_stat(self):
+        """for_stat : 'για' ID ':=' expression 'έως' expression step 'επανάλαβε' sequence 'για_τέλος'"""
+        self.expect(TokenKind.FOR)
+        self.open_blocks.append(TokenKind.END_FOR)
+        counter_var = self.use_name()
+        self.expect(TokenKind.ASSIGN)
+        start_value = self.lower_expression()
+        self.code_gen.gen_quad(":=", start_value, "_", counter_var)
+
+        loop_start = self.code_gen.next_quad_label()
+        self.expect(TokenKind.TO)
+        end_value = self.lower_expression()
+        condition_temp = self.code_gen.new_temp()
+        self.code_gen.gen_quad("<=", counter_var, end_value, condition_temp)
+        exit_jump = self.code_gen.gen_quad("jumpz", condition_temp, "_", "_")
+
+        # The step is lowered after the body, where its code goes
+        step_expr = None
+        if self.current_kind == TokenKind.STEP:
+            self.expect(TokenKind.STEP)
+            step_expr = self.expression()
+
+        self.expect(TokenKind.REPEAT)
+        yield self.sequence()
+        if step_expr is not None:
+            step_value = self.lower_expression(step_expr)
+            temp = self.code_gen.new_temp()
+            self.code_gen.gen_quad("+", counter_var, step_value, temp)
+            self.code_gen.gen_quad(":=", temp, "_", counter_var)
+        self.code_gen.gen_quad("jump", "_", "_", loop_start)
+        self.code_gen.backpatch(self.code_gen.make_list(exit_jump), self.code_gen.next_quad_label())
+
+        self.expect(TokenKind.END_FOR)
+        self.open_blocks.pop()
+
+    def print_stat(self):
+        """print_stat : 'γράψε' expression"""
+        self.expect(TokenKind.WRITE)
+        expr_place = self.lower_expression()
+        if expr_place:
+            self.code_gen.gen_quad("out", expr_place, "_", "_")
+
+    def input_stat(self):
+        """input_stat : 'διάβασε' ID"""
+        self.expect(TokenKind.READ)
+        self.code_gen.gen_quad("in", "_", "_", self.use_name())
+
+    def call_stat(self):
+        """call_stat : 'εκτέλεσε' ID idtail"""
+        self.expect(TokenKind.CALL)
+        proc_name = self.use_name()
+
+        # Only the value parameters are passed, like in process_call_statement
+        params = []
+        if self.current_kind == TokenKind.LEFT_PARENTHESIS:
+            self.expect(TokenKind.LEFT_PARENTHESIS)
+            if self.current_kind != TokenKind.RIGHT_PARENTHESIS:
+                while True:
+                    if self.current_kind == TokenKind.REFERENCE:
+                        self.expect(TokenKind.REFERENCE)
+                        self.use_name()
+                    else:
+                        params.append(self.lower_expression())
+                    if self.current_kind != TokenKind.COMMA:
+                        break
+                    self.expect(TokenKind.COMMA)
+            self.expect(TokenKind.RIGHT_PARENTHESIS)
+
+        for param in params:
+            self.code_gen.gen_quad("par", param, "cv", "_")
+        self.code_gen.gen_quad("call", proc_name, "_", "_")
+
+
 ##################################################################################
 # Function that uses the classes generated above to get the intermediate code    #
 ##################################################################################
@@ -555,7 +878,7 @@ def generate_intermediate_code(ast, symbol_table=None):
     Generate intermediate code from an abstract syntax tree.
 
     Args:
-        :param ast: The abstract syntax tree generated by the parser
+        :param ast: The abstract syntax tree generated by the parser, as an ASTNode or in the dict form of ASTNode.to_dict
     Returns:
         IntermediateCodeGenerator instance with the generated quads
         :param symbol_table: The symbol table that was generated
@@ -564,6 +887,22 @@ def generate_intermediate_code(ast, symbol_table=None):
     expr_processor = ExpressionProcessor(code_gen)
     stmt_processor = StatementProcessor(code_gen, expr_processor)
     program_processor = ProgramProcessor(code_gen, stmt_processor, symbol_table)
+    if isinstance(ast, dict):
+        ast = ASTNode.from_dict(ast)
     # Process the AST and return the generated code
     program_processor.process_program(ast)
     return code_gen
+
+
+def translate(tokens, trivia=None):
+    """
+    Generate the intermediate code and the symbol table of a program in one pass over its tokens,
+    without building its AST (see TranslatingSyntax). The `trivia` of tokens that are already free
+    of comments can be given, as for Syntax.
+
+    Returns:
+        The IntermediateCodeGenerator instance with the generated quads, the SymbolTable and the
+        NameResolution of the blocks
+    """
+    syntax = TranslatingSyntax(tokens, trivia)
+    return syntax.parse(), syntax.symbol_table, syntax.resolution
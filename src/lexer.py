@@ -4,6 +4,27 @@
 # The Lexer class reads the file character by character and tokenizes it#
 # into a list of tuples.                                                #
 #########################################################################
+import io
+import mmap
+import re
+import sys
+from array import array
+from bisect import bisect_left
+from concurrent.futures import ProcessPoolExecutor
+from itertools import accumulate, compress, count, repeat
+from os import PathLike, cpu_count
+
+try:
+    import numpy as np
+except ImportError:  # NumpyLexer falls back to the scalar RegexLexer scan
+    np = None
+
+from src.diagnostics import get_diagnostics
+
+# Diagnostics of the lexers, configured by the entry point (see configure_diagnostics)
+lexer_diagnostics = get_diagnostics("Lexer Logger")
+
+
 class TokenType:
     KEYWORD = 'KEYWORD'
     IDENTIFIER = 'IDENTIFIER'
@@ -36,21 +57,52 @@ REFERENCE = '%'
 
 
 class Lexer:
-    def __init__(self, filename):
+    def __init__(self, filename=None, source=None):
+        """
+        Lex the file at `filename`, or the in-memory `source`. The source can be a str, bytes,
+        bytearray, memoryview or a text or binary file object. Anything other than a path that is
+        passed as `filename` is taken as the source.
+        """
+        if filename is not None and not isinstance(filename, (str, PathLike)):
+            filename, source = None, filename
         self.filename = filename
+        self.source = source
         self.tokens = []
         self.current_char = None
         self.next_char = None
         self.file = None
         self.line_number = 1
+        self.trivia = {}  # Comments by the index of the token that follows them, see split_trivia
 
     def open_file(self):
-        try:
-            self.file = open(self.filename, 'r', encoding='utf-8')
-            self.advance()  # Load the first character
-        except FileNotFoundError:
-            print(f"File not found: {self.filename}")
-            raise
+        self.file = self.open_source()
+        self.advance()  # Load the first character
+
+    def open_source(self):
+        """Return a text file object over the input, decoding bytes as UTF-8 with universal newlines."""
+        source = self.source
+        if source is None:
+            try:
+                return open(self.filename, 'r', encoding='utf-8')
+            except FileNotFoundError:
+                lexer_diagnostics.error("File not found: %s", self.filename)
+                raise
+        if isinstance(source, str):
+            return io.StringIO(source, newline=None)
+        if isinstance(source, (bytes, bytearray, memoryview)):
+            return io.TextIOWrapper(io.BytesIO(source), encoding='utf-8')
+        if isinstance(source.read(0), bytes):
+            return io.TextIOWrapper(source, encoding='utf-8')
+        return source
+
+    def close_file(self):
+        """Close the file opened by open_source, leaving file objects of the caller open."""
+        if self.file is None or self.file is self.source:
+            return
+        if isinstance(self.file, io.TextIOWrapper) and self.file.buffer is self.source:
+            self.file.detach()
+        else:
+            self.file.close()
 
     def advance(self):
         """Move to the next character in the file."""
@@ -65,6 +117,12 @@ class Lexer:
         if self.current_char == '\n':
             self.line_number += 1
 
+    def unexpected(self, char, line_number):
+        """Report an unexpected character at the given line."""
+        self.line_number = line_number
+        lexer_diagnostics.error("Unexpected character: %s", char)
+        raise SyntaxError(f'Unexpected character: {char} in line {line_number}')
+
     def peek(self):
         """Look at the next character without advancing."""
         return self.next_char
@@ -115,6 +173,15 @@ class Lexer:
 
     def tokenize(self):
         """Tokenize the input file character by character."""
+        self.tokens.extend(self.iter_tokens())
+        return self.tokens
+
+    def iter_code_tokens(self):
+        """Yield the tokens without the comments, which are collected in `self.trivia`."""
+        return split_trivia(self.iter_tokens(), self.trivia)
+
+    def iter_tokens(self):
+        """Yield the tokens of the input file one by one, as they are read."""
         try:
             self.open_file()
 
@@ -135,24 +202,24 @@ class Lexer:
 
                     if self.current_char == '}':
                         self.advance()  # Skip closing brace
-                        self.tokens.append((TokenType.COMMENT, comment.strip(), line_number))
+                        yield (TokenType.COMMENT, comment.strip(), line_number)
                     continue
 
                 if self.current_char.isdigit():
-                    self.tokens.append(self.collect_number())
+                    yield self.collect_number()
                     continue
 
                 if self.current_char.isalpha():
-                    self.tokens.append(self.collect_identifier())
+                    yield self.collect_identifier()
                     continue
 
                 if self.current_char == ':':
                     line_number = self.line_number
                     if self.peek() == '=':
                         self.advance()
-                        self.tokens.append((TokenType.ASSIGNMENT, ':=', line_number))
+                        yield (TokenType.ASSIGNMENT, ':=', line_number)
                     else:
-                        self.tokens.append((TokenType.SEPARATOR, ':', line_number))
+                        yield (TokenType.SEPARATOR, ':', line_number)
                     self.advance()
                     continue
 
@@ -160,12 +227,12 @@ class Lexer:
                     line_number = self.line_number
                     if self.peek() == '=':
                         self.advance()
-                        self.tokens.append((TokenType.RELATIONAL_OPERATOR, '<=', line_number))
+                        yield (TokenType.RELATIONAL_OPERATOR, '<=', line_number)
                     elif self.peek() == '>':
                         self.advance()
-                        self.tokens.append((TokenType.RELATIONAL_OPERATOR, '<>', line_number))
+                        yield (TokenType.RELATIONAL_OPERATOR, '<>', line_number)
                     else:
-                        self.tokens.append((TokenType.RELATIONAL_OPERATOR, '<', line_number))
+                        yield (TokenType.RELATIONAL_OPERATOR, '<', line_number)
                     self.advance()
                     continue
 
@@ -173,47 +240,959 @@ class Lexer:
                     line_number = self.line_number
                     if self.peek() == '=':
                         self.advance()
-                        self.tokens.append((TokenType.RELATIONAL_OPERATOR, '>=', line_number))
+                        yield (TokenType.RELATIONAL_OPERATOR, '>=', line_number)
                     else:
-                        self.tokens.append((TokenType.RELATIONAL_OPERATOR, '>', line_number))
+                        yield (TokenType.RELATIONAL_OPERATOR, '>', line_number)
                     self.advance()
                     continue
 
                 if self.current_char == '=':
-                    self.tokens.append((TokenType.RELATIONAL_OPERATOR, '=', self.line_number))
+                    yield (TokenType.RELATIONAL_OPERATOR, '=', self.line_number)
                     self.advance()
                     continue
 
                 if self.current_char in OPERATORS:
-                    self.tokens.append((TokenType.OPERATOR, self.current_char, self.line_number))
+                    yield (TokenType.OPERATOR, self.current_char, self.line_number)
                     self.advance()
                     continue
 
                 if self.current_char in SEPARATORS:
-                    self.tokens.append((TokenType.SEPARATOR, self.current_char, self.line_number))
+                    yield (TokenType.SEPARATOR, self.current_char, self.line_number)
                     self.advance()
                     continue
 
                 if self.current_char in GROUPING:
-                    self.tokens.append((TokenType.GROUPING, self.current_char, self.line_number))
+                    yield (TokenType.GROUPING, self.current_char, self.line_number)
                     self.advance()
                     continue
 
                 if self.current_char == '%':
-                    self.tokens.append((TokenType.REFERENCE, self.current_char, self.line_number))
+                    yield (TokenType.REFERENCE, self.current_char, self.line_number)
                     self.advance()
                     continue
 
-                print(f'Unexpected character: {self.current_char}')
+                lexer_diagnostics.error("Unexpected character: %s", self.current_char)
                 raise SyntaxError(f'Unexpected character: {self.current_char} in line {self.line_number}')
 
-            self.tokens.append((TokenType.EOF, 'EOF', self.line_number))
-            return self.tokens
+            yield (TokenType.EOF, 'EOF', self.line_number)
         finally:
             # Make sure to close the file even on error
-            if self.file:
-                self.file.close()
+            self.close_file()
+
+
+def split_trivia(tokens, trivia):
+    """
+    Yield the tokens that are not comments, and collect the comments in the `trivia` dict.
+
+    The comments are keyed by the index, among the yielded tokens, of the token that follows them,
+    so trivia[i] is the list of comment tokens found right before token i.
+    """
+    index = 0
+    for token in tokens:
+        if token[0] == TokenType.COMMENT:
+            trivia.setdefault(index, []).append(token)
+        else:
+            yield token
+            index += 1
 
 #########################################################################
 # End of Lexer class                                                    #
 #########################################################################
+
+
+#########################################################################
+# TokenStream class                                                     #
+# A columnar token list. The kind, value and line of every token are    #
+# kept in parallel arrays, and the values are interned so that every    #
+# distinct identifier or keyword is stored once.                        #
+#########################################################################
+TOKEN_KINDS = [
+    TokenType.KEYWORD, TokenType.IDENTIFIER, TokenType.NUMBER, TokenType.OPERATOR,
+    TokenType.RELATIONAL_OPERATOR, TokenType.ASSIGNMENT, TokenType.SEPARATOR, TokenType.GROUPING,
+    TokenType.COMMENT, TokenType.REFERENCE, TokenType.EOF
+]
+KIND_CODES = {kind: code for code, kind in enumerate(TOKEN_KINDS)}
+
+SYMBOL_TYPES = {
+    ASSIGNMENT: TokenType.ASSIGNMENT, REFERENCE: TokenType.REFERENCE,
+    **{operator: TokenType.OPERATOR for operator in OPERATORS},
+    **{operator: TokenType.RELATIONAL_OPERATOR for operator in RELATIONAL_OPERATORS},
+    **{separator: TokenType.SEPARATOR for separator in SEPARATORS},
+    **{group: TokenType.GROUPING for group in GROUPING},
+}
+
+# Every keyword and symbol has a kind of its own, numbered after the kinds of the TokenTypes.
+# The values are sorted so that the kinds are the same in every process.
+VALUE_KINDS = {value: kind for kind, value in enumerate(sorted(KEYWORDS) + sorted(SYMBOL_TYPES), len(TOKEN_KINDS))}
+KIND_VALUES = {kind: value for value, kind in VALUE_KINDS.items()}
+KIND_TYPES = TOKEN_KINDS + [SYMBOL_TYPES.get(value, TokenType.KEYWORD) for value in VALUE_KINDS]
+
+
+def token_kind(token_type, value):
+    """Return the kind of a token: the kind of its keyword or symbol, or else the kind of its TokenType."""
+    kind = VALUE_KINDS.get(value)
+    if kind is None or KIND_TYPES[kind] != token_type:
+        return KIND_CODES[token_type]
+    return kind
+
+
+class TokenKind:
+    """Names for the integer kinds of the tokens that the parser looks at."""
+    IDENTIFIER = KIND_CODES[TokenType.IDENTIFIER]
+    NUMBER = KIND_CODES[TokenType.NUMBER]
+    EOF = KIND_CODES[TokenType.EOF]
+
+    PROGRAM = VALUE_KINDS['πρόγραμμα']
+    DECLARE = VALUE_KINDS['δήλωση']
+    IF = VALUE_KINDS['εάν']
+    THEN = VALUE_KINDS['τότε']
+    ELSE = VALUE_KINDS['αλλιώς']
+    END_IF = VALUE_KINDS['εάν_τέλος']
+    REPEAT = VALUE_KINDS['επανάλαβε']
+    UNTIL = VALUE_KINDS['μέχρι']
+    WHILE = VALUE_KINDS['όσο']
+    END_WHILE = VALUE_KINDS['όσο_τέλος']
+    FOR = VALUE_KINDS['για']
+    TO = VALUE_KINDS['έως']
+    STEP = VALUE_KINDS['με_βήμα']
+    END_FOR = VALUE_KINDS['για_τέλος']
+    READ = VALUE_KINDS['διάβασε']
+    WRITE = VALUE_KINDS['γράψε']
+    FUNCTION = VALUE_KINDS['συνάρτηση']
+    PROCEDURE = VALUE_KINDS['διαδικασία']
+    INPUT = VALUE_KINDS['είσοδος']
+    OUTPUT = VALUE_KINDS['έξοδος']
+    INTERFACE = VALUE_KINDS['διαπροσωπεία']
+    BEGIN_FUNCTION = VALUE_KINDS['αρχή_συνάρτησης']
+    END_FUNCTION = VALUE_KINDS['τέλος_συνάρτησης']
+    BEGIN_PROCEDURE = VALUE_KINDS['αρχή_διαδικασίας']
+    END_PROCEDURE = VALUE_KINDS['τέλος_διαδικασίας']
+    BEGIN_PROGRAM = VALUE_KINDS['αρχή_προγράμματος']
+    END_PROGRAM = VALUE_KINDS['τέλος_προγράμματος']
+    OR = VALUE_KINDS['ή']
+    AND = VALUE_KINDS['και']
+    CALL = VALUE_KINDS['εκτέλεσε']
+
+    PLUS = VALUE_KINDS['+']
+    MINUS = VALUE_KINDS['-']
+    TIMES = VALUE_KINDS['*']
+    DIVIDE = VALUE_KINDS['/']
+    ASSIGN = VALUE_KINDS[':=']
+    SEMICOLON = VALUE_KINDS[';']
+    COMMA = VALUE_KINDS[',']
+    LEFT_PARENTHESIS = VALUE_KINDS['(']
+    RIGHT_PARENTHESIS = VALUE_KINDS[')']
+    LEFT_BRACKET = VALUE_KINDS['[']
+    RIGHT_BRACKET = VALUE_KINDS[']']
+    REFERENCE = VALUE_KINDS['%']
+
+
+class TokenStream:
+    """
+    Tokens stored as an array('B') of kinds (see token_kind), an array('I') of offsets into an
+    intern table of value strings, and an array('I') of lines.
+
+    Indexing returns the usual (TokenType, value, line) tuple for compatibility, while Syntax
+    reads the columns directly without building tuples.
+    """
+
+    def __init__(self):
+        self.kinds = array('B')
+        self.values = array('I')
+        self.lines = array('I')
+        self.strings = []  # Intern table, indexed by the entries of values
+        self.string_ids = {}
+
+    @classmethod
+    def from_tokens(cls, tokens):
+        """Build a TokenStream from an iterable of (TokenType, value, line) tuples."""
+        stream = cls()
+        append = stream.append
+        for token_type, value, line_number in tokens:
+            append(token_type, value, line_number)
+        return stream
+
+    def append(self, token_type, value, line_number):
+        value_id = self.string_ids.get(value)
+        if value_id is None:
+            value_id = self.string_ids[value] = len(self.strings)
+            self.strings.append(value)
+        self.kinds.append(token_kind(token_type, value))
+        self.values.append(value_id)
+        self.lines.append(line_number)
+
+    def __len__(self):
+        return len(self.kinds)
+
+    def __iter__(self):
+        strings = self.strings
+        return zip(map(KIND_TYPES.__getitem__, self.kinds), map(strings.__getitem__, self.values), self.lines)
+
+    def __getitem__(self, index):
+        return KIND_TYPES[self.kinds[index]], self.strings[self.values[index]], self.lines[index]
+
+    def __repr__(self):
+        return repr(list(self))
+
+#########################################################################
+# End of TokenStream class                                              #
+#########################################################################
+
+
+#########################################################################
+# RegexLexer class                                                      #
+# A second lexer engine that reads the whole file at once and scans it  #
+# with one precompiled master regex. It produces exactly the same       #
+# tokens and errors as the character based Lexer.                       #
+#########################################################################
+# Every match is the whitespace before a token followed by the token itself
+MASTER_PATTERN = re.compile(r'\s*(?:[^\W\d_]\w*|\d[\d.]*|:=|<=|<>|>=|\{[^}]*\}?|\S)')
+
+
+def _build_exact_pattern():
+    """
+    Build a master regex whose classes agree with the str predicates used by Lexer on all of Unicode.
+
+    The regex digit class only matches decimals while Lexer uses isdigit(), and the identifier start
+    class also accepts numeric characters that are not isalpha(). Those characters are added to the
+    number classes and removed from the identifier start class. The resulting classes are large and
+    slow, so this pattern is only used for sources that contain such characters.
+    """
+    extra_digits = []
+    non_alpha = []
+    for code in range(sys.maxunicode + 1):
+        char = chr(code)
+        if char.isalnum() and not char.isalpha() and not char.isdecimal():
+            non_alpha.append(char)
+            if char.isdigit():
+                extra_digits.append(char)
+    extra_digits = re.escape(''.join(extra_digits))
+    non_alpha = re.escape(''.join(non_alpha))
+    return re.compile(rf'\s*(?:[^\W\d_{non_alpha}]\w*|[\d{extra_digits}][\d{extra_digits}.]*|:=|<=|<>|>=|\{{[^}}]*\}}?|\S)')
+
+
+class _NeedsExactPattern(Exception):
+    """Raised when MASTER_PATTERN split a token differently than Lexer would."""
+
+
+def _token_type(value, exact):
+    """Return the TokenType of a value matched by the master regex, or None for an unexpected character."""
+    if value in KEYWORDS:
+        return TokenType.KEYWORD
+    first = value[0]
+    if first.isalpha():
+        return TokenType.IDENTIFIER
+    if first.isdecimal() or (exact and first.isdigit()):
+        return TokenType.NUMBER
+    if value in SYMBOL_TYPES:
+        return SYMBOL_TYPES[value]
+    if first == '{':
+        return TokenType.COMMENT
+    if not exact and first.isalnum():
+        raise _NeedsExactPattern(value)
+    return None
+
+
+class RegexLexer(Lexer):
+    exact_pattern = None  # Compiled on first use, shared by all instances
+
+    def read_source(self):
+        """Read the whole input into one string."""
+        self.file = self.open_source()
+        try:
+            return self.file.read()
+        finally:
+            self.close_file()
+
+    def tokenize(self):
+        """Tokenize the input file with one pass of the master regex over the whole buffer."""
+        source = self.read_source()
+        tokens = self.scan_source(source)
+        self.line_number = source.count('\n') + 1
+        tokens.append((TokenType.EOF, 'EOF', self.line_number))
+        self.tokens = tokens
+        return tokens
+
+    def iter_tokens(self):
+        """Iterate over the tokens. The whole buffer is still scanned at once."""
+        return iter(self.tokenize())
+
+    def scan_source(self, source, first_line=1):
+        """Scan the source with the master regex, falling back to the exact pattern when needed."""
+        try:
+            return self.scan(source, MASTER_PATTERN, exact=False, first_line=first_line)
+        except _NeedsExactPattern:
+            if RegexLexer.exact_pattern is None:
+                RegexLexer.exact_pattern = _build_exact_pattern()
+            return self.scan(source, RegexLexer.exact_pattern, exact=True, first_line=first_line)
+
+    def scan(self, source, pattern, exact, first_line=1):
+        """
+        Split the source into tokens without a Python level loop over the tokens.
+
+        The token values, types and line numbers are built with map/zip/accumulate, the type of each
+        distinct value is computed once, and only comments and errors are fixed up one by one.
+        """
+        matches = pattern.findall(source)
+        values = list(map(str.lstrip, matches))
+        types = {value: _token_type(value, exact) for value in set(values)}
+        # The line of a token is the first line plus the newlines before its end
+        lines = accumulate(map(str.count, matches, repeat('\n')), initial=first_line)
+        next(lines)
+        tokens = list(zip(map(types.__getitem__, values), values, lines))
+        del matches
+
+        if None in types.values():
+            index = min(values.index(value) for value, token_type in types.items() if token_type is None)
+            _, value, line_number = tokens[index]
+            self.unexpected(value, line_number)
+
+        if TokenType.COMMENT in types.values():
+            for index in compress(count(), map(str.startswith, values, repeat('{'))):
+                _, value, line_number = tokens[index]
+                if value.endswith('}'):
+                    # Comments are reported at the line where they start
+                    tokens[index] = (TokenType.COMMENT, value[1:-1].strip(), line_number - value.count('\n'))
+                else:
+                    # An unterminated comment runs to the end of the file and is dropped, as in Lexer
+                    del tokens[index]
+        return tokens
+
+#########################################################################
+# End of RegexLexer class                                               #
+#########################################################################
+
+
+#########################################################################
+# MmapLexer class                                                       #
+# A lexer engine for very large sources. It memory-maps the file and    #
+# scans the UTF-8 bytes directly. Tokens are kept as (kind, start, end) #
+# byte offsets and lines are only computed when they are needed.       #
+#########################################################################
+KEYWORD_BYTES = {keyword.encode('utf-8') for keyword in KEYWORDS}
+SYMBOL_BYTES = {symbol.encode('ascii'): token_type for symbol, token_type in SYMBOL_TYPES.items()}
+
+# ASCII whitespace as seen by str.isspace(). Non-ASCII bytes are scanned as part of words and
+# every non-ASCII word is checked against the str predicates used by Lexer.
+MAPPED_PATTERN = re.compile(
+    rb'[\t-\r\x1c-\x1f ]*(?:'
+    rb'([A-Za-z\x80-\xff][\w\x80-\xff]*)'
+    rb'|([0-9][0-9.]*)'
+    rb'|(\{[^}]*\}?)'
+    rb'|(:=|<=|<>|>=|[^\t-\r\x1c-\x1f ]))'
+)
+LINE_BREAK_PATTERN = re.compile(rb'\r\n?|\n')
+
+
+class LineIndex:
+    """Maps byte offsets of a buffer to line numbers by bisecting the offsets of its line breaks."""
+
+    def __init__(self, buffer):
+        self.buffer = buffer
+        self.breaks = None  # Built on the first lookup
+
+    def line_of(self, offset):
+        """Return the line number of the byte at the given offset."""
+        if self.breaks is None:
+            # '\r\n' and a lone '\r' are one line break each, as with universal newlines
+            self.breaks = array('Q', (match.start() for match in LINE_BREAK_PATTERN.finditer(self.buffer)))
+        return bisect_left(self.breaks, offset) + 1
+
+
+class MappedTokens:
+    """
+    The tokens of a memory-mapped source, kept as parallel columns of kinds and byte offsets.
+
+    Indexing returns the usual (TokenType, value, line) tuple, decoding the value and looking up
+    the line only for that token, so the parser can consume it like a token list.
+    """
+
+    def __init__(self, buffer):
+        self.buffer = buffer
+        self.lines = LineIndex(buffer)
+        self.kinds = []
+        self.starts = array('Q')
+        self.ends = array('Q')
+
+    def append(self, kind, start, end):
+        self.kinds.append(kind)
+        self.starts.append(start)
+        self.ends.append(end)
+
+    def __len__(self):
+        return len(self.kinds)
+
+    def __iter__(self):
+        return (self[index] for index in range(len(self.kinds)))
+
+    def __getitem__(self, index):
+        kind = self.kinds[index]
+        start = self.starts[index]
+        return kind, self.value(index), self.lines.line_of(start)
+
+    def span(self, index):
+        """Return the (kind, start, end) byte offsets of a token without decoding it."""
+        return self.kinds[index], self.starts[index], self.ends[index]
+
+    def line(self, index):
+        return self.lines.line_of(self.starts[index])
+
+    def value(self, index):
+        kind = self.kinds[index]
+        if kind == TokenType.EOF:
+            return 'EOF'
+        value = str(self.buffer[self.starts[index]:self.ends[index]], 'utf-8')
+        if kind == TokenType.COMMENT:
+            return value[1:-1].replace('\r\n', '\n').replace('\r', '\n').strip()
+        return value
+
+    def close(self):
+        if isinstance(self.buffer, mmap.mmap):
+            self.buffer.close()
+
+
+class MmapLexer(Lexer):
+    def map_source(self):
+        """
+        Return the input as a bytes-like buffer: the input file memory-mapped read-only, a
+        bytes-like source as it is, or the UTF-8 bytes of any other source.
+        """
+        source = self.source
+        if source is None:
+            try:
+                with open(self.filename, 'rb') as file:
+                    if file.seek(0, 2) == 0:
+                        return b''  # Empty files cannot be mapped
+                    return mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+            except FileNotFoundError:
+                lexer_diagnostics.error("File not found: %s", self.filename)
+                raise
+        if isinstance(source, (bytes, bytearray)):
+            return source
+        if isinstance(source, memoryview):
+            return source.cast('B')
+        if isinstance(source, str):
+            return source.encode('utf-8')
+        data = source.read()
+        return data if isinstance(data, bytes) else data.encode('utf-8')
+
+    def tokenize(self):
+        """Tokenize the memory-mapped input file into MappedTokens."""
+        buffer = self.map_source()
+        try:
+            try:
+                self.tokens = self.scan(buffer)
+            except _NeedsExactPattern:
+                self.tokens = self.scan_exact(buffer)
+        except SyntaxError:
+            if isinstance(buffer, mmap.mmap):
+                buffer.close()
+            raise
+
+        self.tokens.append(TokenType.EOF, len(buffer), len(buffer))
+        return self.tokens
+
+    def iter_tokens(self):
+        """Iterate over the tokens, decoding each one only when it is reached. The map is closed after the last one."""
+        tokens = self.tokenize()
+        try:
+            yield from tokens
+        finally:
+            tokens.close()
+
+    def scan(self, buffer):
+        """Scan the UTF-8 bytes of the buffer without decoding them."""
+        tokens = MappedTokens(buffer)
+        append = tokens.append
+        words = {}  # Token type of every distinct word
+        number, comment = TokenType.NUMBER, TokenType.COMMENT
+
+        for match in MAPPED_PATTERN.finditer(buffer):
+            group = match.lastindex
+            start, end = match.span(group)
+            if group == 1:
+                word = match.group(1)
+                kind = words.get(word)
+                if kind is None:
+                    kind = words[word] = self.word_type(word)
+            elif group == 2:
+                kind = number
+            elif group == 3:
+                if buffer[end - 1] != 0x7d:  # '}'
+                    # An unterminated comment runs to the end of the file and is dropped, as in Lexer
+                    continue
+                kind = comment
+            else:
+                kind = SYMBOL_BYTES.get(match.group(4))
+                if kind is None:
+                    self.unexpected(str(match.group(4), 'utf-8'), tokens.lines.line_of(start))
+            append(kind, start, end)
+        return tokens
+
+    def word_type(self, word):
+        """Return the token type of a word, checking non-ASCII words against the rules of Lexer."""
+        if word in KEYWORD_BYTES:
+            return TokenType.KEYWORD
+        if not word.isascii():
+            text = word.decode('utf-8')
+            if not text[0].isalpha() or not all(char.isalnum() or char == '_' for char in text):
+                raise _NeedsExactPattern(text)
+        return TokenType.IDENTIFIER
+
+    def scan_exact(self, buffer):
+        """
+        Scan a buffer containing characters the byte pattern cannot classify.
+
+        The buffer is decoded and scanned with the exact pattern of RegexLexer, and the character
+        offsets are converted back to byte offsets.
+        """
+        if RegexLexer.exact_pattern is None:
+            RegexLexer.exact_pattern = _build_exact_pattern()
+        source = bytes(buffer).decode('utf-8')
+        tokens = MappedTokens(buffer)
+        position = 0
+        byte_position = 0
+        for match in RegexLexer.exact_pattern.finditer(source):
+            value = match.group().lstrip()
+            start = match.end() - len(value)
+            byte_start = byte_position + len(source[position:start].encode('utf-8'))
+            byte_end = byte_start + len(value.encode('utf-8'))
+            position, byte_position = match.end(), byte_end
+            kind = _token_type(value, exact=True)
+            if kind is None:
+                self.unexpected(value, tokens.lines.line_of(byte_start))
+            if kind == TokenType.COMMENT and not value.endswith('}'):
+                continue
+            tokens.append(kind, byte_start, byte_end)
+        return tokens
+
+#########################################################################
+# End of MmapLexer class                                                #
+#########################################################################
+
+
+#########################################################################
+# IncrementalLexer class                                                #
+# A lexer for editors. After the first full scan it keeps the tokens    #
+# with their offsets, and after every text edit it re-lexes only the    #
+# region around the edit until the token stream resynchronizes.         #
+#########################################################################
+class TokenBlock:
+    """A run of tokens whose offsets and lines are stored relative to the block, so they move with it."""
+    __slots__ = ('offset', 'line', 'tokens')
+
+    def __init__(self, offset, line, tokens):
+        self.offset = offset  # Offset of the first token
+        self.line = line  # Line of the first token
+        self.tokens = tokens  # (TokenType, value, start, end, line) relative to offset and line
+
+    def spans(self):
+        """Return the tokens of the block with absolute offsets and lines."""
+        offset, line = self.offset, self.line
+        return [(token_type, value, start + offset, end + offset, line_number + line)
+                for token_type, value, start, end, line_number in self.tokens]
+
+
+class IncrementalLexer(RegexLexer):
+    block_size = 256  # Tokens per block. An edit rebuilds the blocks it touches and shifts the rest.
+
+    def tokenize(self):
+        """Lex the whole input and keep its text and token offsets for later edits."""
+        self.text = self.read_source()
+        self.exact = False
+        self.types = {}  # Token type of every distinct value seen so far
+        self.relex_all()
+        return self.token_list()
+
+    def relex_all(self):
+        """Lex the whole text again. After an unexpected character, the text is kept without tokens (see edit)."""
+        self.blocks = None
+        self.newlines = self.text.count('\n')
+        try:
+            spans = list(self.scan_spans(self.text, 0, 1))
+        except _NeedsExactPattern:
+            self.use_exact_pattern()
+            spans = list(self.scan_spans(self.text, 0, 1))
+        self.blocks = self.make_blocks(spans)
+
+    def use_exact_pattern(self):
+        if RegexLexer.exact_pattern is None:
+            RegexLexer.exact_pattern = _build_exact_pattern()
+        self.exact = True
+        self.types = {}
+
+    def scan_spans(self, text, position, line_number):
+        """Yield (TokenType, value, start, end, line) for the tokens of text from the given position on."""
+        pattern = RegexLexer.exact_pattern if self.exact else MASTER_PATTERN
+        types = self.types
+        count_newlines = text.count
+        last = position
+        for match in pattern.finditer(text, position):
+            value = match.group().lstrip()
+            end = match.end()
+            start = end - len(value)
+            line_number += count_newlines('\n', last, start)
+            last = start
+            if value in types:
+                token_type = types[value]
+            else:
+                token_type = _token_type(value, self.exact)
+                if token_type != TokenType.COMMENT:
+                    types[value] = token_type
+            if token_type is None:
+                self.unexpected(value, line_number)
+            if token_type == TokenType.COMMENT:
+                if not value.endswith('}'):
+                    # An unterminated comment runs to the end of the file and is dropped, as in Lexer
+                    return
+                value = value[1:-1].strip()
+            yield token_type, value, start, end, line_number
+
+    def make_blocks(self, spans):
+        blocks = []
+        for index in range(0, len(spans), self.block_size):
+            chunk = spans[index:index + self.block_size]
+            _, _, offset, _, line = chunk[0]
+            blocks.append(TokenBlock(offset, line, [
+                (token_type, value, start - offset, end - offset, line_number - line)
+                for token_type, value, start, end, line_number in chunk]))
+        return blocks
+
+    def edit(self, start, end, new_text):
+        """
+        Replace text[start:end] with new_text and update the tokens.
+
+        Tokens that end before the edit cannot change, because a token only depends on its own
+        characters and the one character after it. Scanning restarts at the end of the last such
+        token and stops at the first new token after the edit that starts where an old token
+        started, shifted by the length difference: from there on the text, and so the tokens,
+        are the same as before. A comment opened or closed by the edit simply moves that point.
+        Returns the number of tokens that were re-lexed.
+
+        An edit that makes an unexpected character raises SyntaxError, but its text is kept, so that
+        the offsets of the next edits, such as the one that removes the character, still match the
+        editor's buffer. Until the text lexes again, it has no tokens to keep, and each edit lexes all of it.
+        """
+        old_text = self.text
+        text = old_text[:start] + new_text + old_text[end:]
+        if self.blocks is None:
+            self.text = text
+            self.relex_all()
+            return len(self.token_list()) - 1
+        delta = len(new_text) - (end - start)
+        edit_end = start + len(new_text)
+        blocks = self.blocks
+
+        # The tokens before the edit are kept as they are
+        first = max(bisect_left(blocks, start, key=lambda block: block.offset) - 1, 0)
+        prefix = [span for span in blocks[first].spans() if span[3] < start] if blocks else []
+        if prefix:
+            _, _, token_start, position, line_number = prefix[-1]
+            line_number += old_text.count('\n', token_start, position)
+        elif first > 0:
+            first -= 1  # The edit is right at the first token of the block
+            prefix = blocks[first].spans()
+            _, _, token_start, position, line_number = prefix[-1]
+            line_number += old_text.count('\n', token_start, position)
+        else:
+            position, line_number = 0, 1
+
+        try:
+            relexed, resync = self.relex(text, position, line_number, edit_end, delta, first)
+        except _NeedsExactPattern:
+            self.use_exact_pattern()
+            self.text = text
+            self.relex_all()
+            return len(self.token_list()) - 1
+        except SyntaxError:
+            self.text = text
+            self.blocks = None
+            raise
+
+        if resync is None:
+            middle = prefix + relexed
+            tail_blocks = []
+        else:
+            # Shift the tokens after the resynchronization point
+            last, index, line_delta = resync
+            middle = prefix + relexed + [
+                (token_type, value, token_start + delta, token_end + delta, token_line + line_delta)
+                for token_type, value, token_start, token_end, token_line in blocks[last].spans()[index:]]
+            tail_blocks = blocks[last + 1:]
+            for block in tail_blocks:
+                block.offset += delta
+                block.line += line_delta
+
+        self.blocks = blocks[:first] + self.make_blocks(middle) + tail_blocks
+        self.newlines += new_text.count('\n') - old_text.count('\n', start, end)
+        self.text = text
+        return len(relexed)
+
+    def relex(self, text, position, line_number, edit_end, delta, first):
+        """
+        Scan the new text from position until it resynchronizes with the old tokens.
+        Returns the new tokens and (block, index, line shift) of the first old token that is kept,
+        or None if the scan ran to the end of the text.
+        """
+        blocks = self.blocks
+        block_index, spans, index = first, blocks[first].spans() if blocks else [], 0
+        relexed = []
+        for span in self.scan_spans(text, position, line_number):
+            token_start = span[2]
+            if token_start >= edit_end:
+                old_start = token_start - delta
+                # Move through the old tokens up to the one that starts where this one started
+                while True:
+                    while index < len(spans) and spans[index][2] < old_start:
+                        index += 1
+                    if index < len(spans) or block_index + 1 >= len(blocks):
+                        break
+                    block_index, spans, index = block_index + 1, blocks[block_index + 1].spans(), 0
+                if index < len(spans) and spans[index][2] == old_start and spans[index][:2] == span[:2]:
+                    return relexed, (block_index, index, span[4] - spans[index][4])
+            relexed.append(span)
+        return relexed, None
+
+    def token_list(self):
+        """Return the tokens as (TokenType, value, line) tuples, ending with EOF."""
+        tokens = [(token_type, value, line_number)
+                  for block in self.blocks
+                  for token_type, value, _, _, line_number in block.spans()]
+        self.line_number = self.newlines + 1
+        tokens.append((TokenType.EOF, 'EOF', self.line_number))
+        self.tokens = tokens
+        return tokens
+
+#########################################################################
+# End of IncrementalLexer class                                         #
+#########################################################################
+
+
+#########################################################################
+# ParallelLexer class                                                   #
+# A lexer engine for huge sources. The buffer is cut into chunks at     #
+# line breaks outside comments, the chunks are scanned by RegexLexer in #
+# a process pool and their tokens are joined in order.                  #
+#########################################################################
+COMMENT_PATTERN = re.compile(r'\{[^}]*\}?')
+
+
+class _UnexpectedCharacter(Exception):
+    """Raised in a worker process instead of reporting the error, which the parent does in order."""
+
+
+class _ChunkLexer(RegexLexer):
+    def unexpected(self, char, line_number):
+        raise _UnexpectedCharacter(char, line_number)
+
+
+def _scan_chunk(chunk, first_line):
+    """
+    Tokenize one chunk of a ParallelLexer source, numbering its lines from first_line. The tokens
+    are sent back as a TokenStream, which is much cheaper to pickle than a list of tuples.
+    """
+    return TokenStream.from_tokens(_ChunkLexer().scan_source(chunk, first_line))
+
+
+def split_chunks(source, chunk_count):
+    """
+    Return the offsets at which the source is cut into about chunk_count chunks.
+
+    A chunk only starts right after a line break, where no token but a comment can continue, and
+    a pre-scan of the `{`/`}` comments moves every cut that falls inside a comment past its end.
+    """
+    starts = [0]
+    comments = COMMENT_PATTERN.finditer(source)
+    comment = next(comments, None)
+    size = len(source) // chunk_count
+    position = 0
+    for target in range(size, len(source), size):
+        if target <= position:
+            continue  # The last cut was moved past this one
+        position = source.find('\n', target)
+        while position != -1 and comment is not None and comment.start() < position:
+            if position < comment.end():
+                position = source.find('\n', comment.end())
+            else:
+                comment = next(comments, None)
+        if position == -1:
+            break
+        if position + 1 < len(source):
+            starts.append(position + 1)
+    return starts
+
+
+class ParallelLexer(RegexLexer):
+    min_chunk_size = 1 << 20  # Sources smaller than two chunks are scanned in this process
+
+    def __init__(self, filename=None, source=None, workers=None):
+        super().__init__(filename, source)
+        self.workers = workers or cpu_count() or 1
+
+    def tokenize(self):
+        """Tokenize the chunks of the input in a process pool. The tokens are the same as RegexLexer's."""
+        source = self.read_source()
+        chunk_count = min(self.workers, len(source) // self.min_chunk_size)
+        if chunk_count < 2:
+            tokens = self.scan_source(source)
+        else:
+            tokens = self.scan_chunks(source, split_chunks(source, chunk_count))
+
+        self.line_number = source.count('\n') + 1
+        tokens.append((TokenType.EOF, 'EOF', self.line_number))
+        self.tokens = tokens
+        return tokens
+
+    def scan_chunks(self, source, starts):
+        ends = starts[1:] + [len(source)]
+        chunks = [source[start:end] for start, end in zip(starts, ends)]
+        # The first line of a chunk is one plus the line breaks before it
+        first_lines = list(accumulate((chunk.count('\n') for chunk in chunks[:-1]), initial=1))
+        tokens = []
+        with ProcessPoolExecutor(min(self.workers, len(chunks))) as pool:
+            try:
+                # The results come in order, so the first error is the one of the serial scan
+                for chunk_tokens in pool.map(_scan_chunk, chunks, first_lines):
+                    tokens.extend(chunk_tokens)
+            except _UnexpectedCharacter as error:
+                self.unexpected(*error.args)
+        return tokens
+
+#########################################################################
+# End of ParallelLexer class                                            #
+#########################################################################
+
+
+#########################################################################
+# NumpyLexer class                                                      #
+# A lexer engine that classifies every character of the buffer at once  #
+# with NumPy and finds the token boundaries from the class arrays. Only #
+# the token values are sliced out and typed in Python.                  #
+#########################################################################
+SPACE_CLASS = 1  # isspace()
+DIGIT_CLASS = 2  # isdigit(), which starts and continues a number
+ALPHA_CLASS = 4  # isalpha(), which starts an identifier
+WORD_CLASS = 8  # isalnum() or '_', which continues an identifier
+
+
+def _run_ends(mask, positions):
+    """Return, for each of the positions, the index of the first False of the mask at or after it."""
+    stops = np.append(np.flatnonzero(~mask), len(mask))
+    return stops[np.searchsorted(stops, positions)]
+
+
+def _shifted(mask):
+    """Return the mask moved one position to the right, so that item i tells about character i - 1."""
+    shifted = np.zeros_like(mask)
+    shifted[1:] = mask[:-1]
+    return shifted
+
+
+class NumpyLexer(RegexLexer):
+    char_classes = None  # Class flags of every BMP code point, built on first use
+
+    @classmethod
+    def class_table(cls):
+        if cls.char_classes is None:
+            flags = bytearray(0x10000)
+            for code in range(0x10000):
+                char = chr(code)
+                flags[code] = ((char.isspace() and SPACE_CLASS) | (char.isdigit() and DIGIT_CLASS)
+                               | (char.isalpha() and ALPHA_CLASS) | ((char.isalnum() or char == '_') and WORD_CLASS))
+            cls.char_classes = np.frombuffer(bytes(flags), dtype=np.uint8)
+        return cls.char_classes
+
+    def tokenize(self):
+        """
+        Tokenize the input by classifying its code points with NumPy. Without NumPy, or for a source
+        with code points outside the BMP, the scalar RegexLexer scan is used instead.
+        """
+        source = self.read_source()
+        codes = None
+        if np is not None:
+            codes = np.frombuffer(source.encode('utf-32-le'), dtype=np.uint32)
+        if codes is None or (len(codes) and codes.max() > 0xFFFF):
+            tokens = self.scan_source(source)
+        else:
+            tokens = self.classify(source, codes)
+
+        self.line_number = source.count('\n') + 1
+        tokens.append((TokenType.EOF, 'EOF', self.line_number))
+        self.tokens = tokens
+        return tokens
+
+    def classify(self, source, codes):
+        flags = self.class_table()[codes]
+
+        # Comments are the only tokens that need state, so they are found first by a scan for `{`
+        comment_spans = [match.span() for match in COMMENT_PATTERN.finditer(source)]
+        depth = np.zeros(len(codes) + 1, dtype=np.int8)
+        if comment_spans:
+            comment_starts, comment_ends = np.array(comment_spans, dtype=np.int64).T
+            depth[comment_starts] += 1
+            depth[comment_ends] -= 1
+        significant = (np.cumsum(depth[:-1]) == 0) & (flags & SPACE_CLASS == 0)
+
+        # Words are the runs of identifier and number characters. A run holds an identifier, a number,
+        # or a number followed by an identifier, and anything left over is an unexpected character.
+        dot = codes == ord('.')
+        alpha = flags & ALPHA_CLASS != 0
+        digit = flags & DIGIT_CLASS != 0
+        run = significant & ((flags & WORD_CLASS != 0) | dot)
+        identifier_part = run & ~dot
+        number_part = run & (digit | dot)
+        run_starts = np.flatnonzero(run & ~_shifted(run))
+        run_ends = _run_ends(run, run_starts)
+
+        number_starts = run_starts[digit[run_starts]]
+        number_ends = _run_ends(number_part, number_starts)
+        # An identifier starts either a run or right after the number at the start of a run
+        after_number = number_ends < run_ends[digit[run_starts]]
+        identifier_starts = np.concatenate((run_starts[alpha[run_starts]], number_ends[after_number]))
+        identifier_run_ends = np.concatenate((run_ends[alpha[run_starts]], run_ends[digit[run_starts]][after_number]))
+        identifier_ends = _run_ends(identifier_part, identifier_starts)
+        errors = [
+            run_starts[~alpha[run_starts] & ~digit[run_starts]],
+            number_ends[after_number][~alpha[number_ends[after_number]]],
+            identifier_ends[identifier_ends < identifier_run_ends],
+        ]
+
+        # Symbols are one character, or two for the pairs ':=', '<=', '<>' and '>='
+        following = np.zeros_like(codes)
+        following[:-1] = codes[1:]
+        pair = significant & (((codes == ord(':')) | (codes == ord('<')) | (codes == ord('>'))) & (following == ord('='))
+                       | (codes == ord('<')) & (following == ord('>')))
+        pair &= ~_shifted(pair)  # In '<>=' the '>=' does not start a token
+        symbol_starts = np.flatnonzero(significant & ~run & ~_shifted(pair))
+        symbol_ends = symbol_starts + 1 + pair[symbol_starts]
+
+        # An unterminated comment runs to the end of the file and is dropped, as in Lexer
+        comments = np.array([span for span in comment_spans if source[span[1] - 1] == '}'], dtype=np.int64)
+        comments = comments.reshape(-1, 2)
+        starts = np.concatenate((number_starts, identifier_starts, symbol_starts, comments[:, 0]))
+        ends = np.concatenate((number_ends, identifier_ends, symbol_ends, comments[:, 1]))
+        order = np.argsort(starts, kind='stable')
+        starts = starts[order].tolist()
+        ends = ends[order].tolist()
+        newlines = np.flatnonzero(codes == ord('\n'))
+        lines = (np.searchsorted(newlines, starts) + 1).tolist()
+
+        values = list(map(source.__getitem__, map(slice, starts, ends)))
+        types = {value: _token_type(value, True) for value in set(values)}
+        if None in types.values():
+            errors.append(np.array([start for start, value in zip(starts, values) if types[value] is None],
+                                   dtype=np.int64))
+        error_positions = np.concatenate(errors)
+        if len(error_positions):
+            position = int(error_positions.min())
+            self.unexpected(source[position], int(np.searchsorted(newlines, position)) + 1)
+
+        tokens = list(zip(map(types.__getitem__, values), values, lines))
+        if TokenType.COMMENT in types.values():
+            for index in compress(count(), map(str.startswith, values, repeat('{'))):
+                tokens[index] = (TokenType.COMMENT, values[index][1:-1].strip(), lines[index])
+        return tokens
+
+#########################################################################
+# End of NumpyLexer class                                               #
+#########################################################################
@@ -0,0 +1,259 @@
+#########################################################################
+# Serialization                                                         #
+# This part of the code saves syntax trees and symbol tables in a       #
+# compact binary format and loads them back, so that a parsed program   #
+# can be reused without lexing and parsing it again.                    #
+#########################################################################
+
+import struct
+import sys
+from array import array
+
+from src.syntaxAST import ASTNode, paused_gc
+from src.symboltable import Scope, SymbolTable, SymbolTableEntity
+
+FORMAT_MAGIC = b'GRPP'
+FORMAT_VERSION = 2
+AST_SECTION = 1
+SYMBOL_TABLE_SECTION = 2
+
+# magic, version, section
+FILE_HEADER = struct.Struct('<4sHB')
+# Number of new strings, number of nodes and the array typecode of each column in a block of the AST
+BLOCK_HEADER = struct.Struct('<II4s')
+# current_scope_level, number of strings, number of scopes, number of open scopes
+SYMBOL_TABLE_HEADER = struct.Struct('<IIII')
+# name, level, parent scope + 1, next_offset, number of entities
+SCOPE_RECORD = struct.Struct('<IIIiI')
+# name, entity type + 1, scope + 1, offset, number of parameters
+ENTITY_RECORD = struct.Struct('<IIIiI')
+
+
+def _little_endian(column):
+    """Return the array in little-endian byte order, the order of the files."""
+    if sys.byteorder != 'little':
+        column = array(column.typecode, column)
+        column.byteswap()
+    return column
+
+
+def _compact(column):
+    """Return the array of unsigned ints with the smallest item size that holds its values."""
+    largest = max(column, default=0)
+    typecode = 'B' if largest < 1 << 8 else 'H' if largest < 1 << 16 else 'I'
+    return column if typecode == column.typecode else array(typecode, column)
+
+
+def _read_exactly(file, size):
+    data = file.read(size)
+    if len(data) != size:
+        raise ValueError("Truncated file")
+    return data
+
+
+def _read_header(file, section):
+    magic, version, found = FILE_HEADER.unpack(_read_exactly(file, FILE_HEADER.size))
+    if magic != FORMAT_MAGIC:
+        raise ValueError("Not a Greek++ binary file")
+    if version != FORMAT_VERSION:
+        raise ValueError(f"Unsupported format version {version}, expected {FORMAT_VERSION}")
+    if found != section:
+        raise ValueError(f"Expected section {section}, got {found}")
+
+
+def _write_strings(file, strings):
+    data = [string.encode('utf-8') for string in strings]
+    lengths = _little_endian(array('I', map(len, data)))
+    file.write(lengths.tobytes())
+    file.write(b''.join(data))
+
+
+def _read_strings(file, count):
+    lengths = array('I')
+    lengths.frombytes(_read_exactly(file, count * lengths.itemsize))
+    data = _read_exactly(file, sum(_little_endian(lengths)))
+    strings = []
+    position = 0
+    for length in _little_endian(lengths):
+        strings.append(data[position:position + length].decode('utf-8'))
+        position += length
+    return strings
+
+
+class ASTWriter:
+    """
+    Streaming writer of the binary AST format.
+
+    The nodes are added one at a time in pre-order with their number of children, and are written
+    in blocks of `block_size` nodes, so the encoded tree is never held in memory as a whole. Each
+    block holds the strings that first appear in it, then the node type, value, line and child
+    count columns as arrays of the smallest unsigned int type that fits each of them. A value or
+    line of 0 stands for None; other values are string indexes plus one.
+    """
+    block_size = 1 << 16
+
+    def __init__(self, file):
+        self.file = file
+        self.string_ids = {}
+        self.new_strings = []
+        self.types = array('I')
+        self.values = array('I')
+        self.lines = array('I')
+        self.child_counts = array('I')
+        file.write(FILE_HEADER.pack(FORMAT_MAGIC, FORMAT_VERSION, AST_SECTION))
+
+    def string_id(self, string):
+        string_id = self.string_ids.get(string)
+        if string_id is None:
+            string_id = self.string_ids[string] = len(self.string_ids)
+            self.new_strings.append(string)
+        return string_id
+
+    def add(self, node_type, value, line, child_count):
+        """Add the next node in pre-order."""
+        self.types.append(self.string_id(node_type))
+        self.values.append(0 if value is None else self.string_id(value) + 1)
+        self.lines.append(line or 0)
+        self.child_counts.append(child_count)
+        if len(self.types) >= self.block_size:
+            self.flush()
+
+    def write(self, node):
+        """Add the nodes of a whole subtree."""
+        for child in node.walk():
+            self.add(child.type, child.value, child.line, len(child.children))
+
+    def flush(self):
+        """Write the nodes added since the last flush as one block."""
+        if not self.types:
+            return
+        columns = [self.types, self.values, self.lines, self.child_counts]
+        compact = [_compact(column) for column in columns]
+        typecodes = ''.join(column.typecode for column in compact).encode('ascii')
+        self.file.write(BLOCK_HEADER.pack(len(self.new_strings), len(self.types), typecodes))
+        _write_strings(self.file, self.new_strings)
+        for column in compact:
+            self.file.write(_little_endian(column).tobytes())
+        for column in columns:
+            del column[:]
+        self.new_strings = []
+
+    def close(self):
+        """Write the last block and the end marker. The file itself is left open."""
+        self.flush()
+        self.file.write(BLOCK_HEADER.pack(0, 0, b'BBBB'))
+
+
+def dump_ast(ast, file):
+    """Write the AST to a binary file object."""
+    writer = ASTWriter(file)
+    writer.write(ast)
+    writer.close()
+
+
+def load_ast(file):
+    """Read an AST written by dump_ast or ASTWriter from a binary file object."""
+    _read_header(file, AST_SECTION)
+    strings = []
+    types, values, lines, child_counts = columns = [], [], [], []
+    while True:
+        string_count, node_count, typecodes = BLOCK_HEADER.unpack(_read_exactly(file, BLOCK_HEADER.size))
+        if not node_count:
+            break
+        strings.extend(_read_strings(file, string_count))
+        for column, typecode in zip(columns, typecodes.decode('ascii')):
+            block = array(typecode)
+            block.frombytes(_read_exactly(file, node_count * block.itemsize))
+            column.extend(_little_endian(block))
+    types = list(map(strings.__getitem__, types))
+    values = list(map([None, *strings].__getitem__, values))
+    records = zip(reversed(types), reversed(values), reversed(lines), reversed(child_counts))
+
+    # The nodes are built from the last one back, so that the children of each node are already
+    # built, as the last ones on the stack, when it is reached
+    stack = []
+    push = stack.append
+    with paused_gc():
+        for node_type, value, line, child_count in records:
+            if child_count:
+                if child_count > len(stack):
+                    raise ValueError("Malformed syntax tree")
+                children = stack[:-child_count - 1:-1]
+                del stack[-child_count:]
+                push(ASTNode(node_type, children, value, line or None))
+            else:
+                push(ASTNode(node_type, None, value, line or None))
+    if len(stack) != 1:
+        raise ValueError("Malformed syntax tree")
+    return stack[0]
+
+
+def dump_symbol_table(symbol_table, file):
+    """Write the scopes and entities of a symbol table to a binary file object."""
+    # Every scope in the order it was entered, so that the scope ids stay the same
+    scopes = symbol_table.all_scopes
+    scope_ids = {id(scope): index for index, scope in enumerate(scopes)}
+
+    strings = {}
+    records = []
+    for scope in scopes:
+        parent = 0 if scope.parent is None else scope_ids[id(scope.parent)] + 1
+        records.append(SCOPE_RECORD.pack(strings.setdefault(scope.name, len(strings)), scope.level, parent,
+                                         scope.next_offset, len(scope.entities)))
+        for entity in scope.entities.values():
+            entity_type = 0 if entity.entity_type is None else strings.setdefault(entity.entity_type, len(strings)) + 1
+            records.append(ENTITY_RECORD.pack(strings.setdefault(entity.name, len(strings)), entity_type,
+                                              0 if entity.scope is None else entity.scope + 1, entity.offset,
+                                              len(entity.parameters)))
+            parameters = array('I', [strings.setdefault(parameter, len(strings)) for parameter in entity.parameters])
+            records.append(_little_endian(parameters).tobytes())
+
+    file.write(FILE_HEADER.pack(FORMAT_MAGIC, FORMAT_VERSION, SYMBOL_TABLE_SECTION))
+    file.write(SYMBOL_TABLE_HEADER.pack(symbol_table.current_scope_level, len(strings), len(scopes),
+                                       len(symbol_table.scopes)))
+    _write_strings(file, strings)
+    file.write(b''.join(records))
+
+
+def load_symbol_table(file):
+    """Read a symbol table written by dump_symbol_table from a binary file object."""
+    _read_header(file, SYMBOL_TABLE_SECTION)
+    current_scope_level, string_count, scope_count, table_scope_count = SYMBOL_TABLE_HEADER.unpack(
+        _read_exactly(file, SYMBOL_TABLE_HEADER.size))
+    strings = _read_strings(file, string_count)
+
+    scopes = []
+    parents = []
+    for _ in range(scope_count):
+        name, level, parent, next_offset, entity_count = SCOPE_RECORD.unpack(_read_exactly(file, SCOPE_RECORD.size))
+        # Scopes are built directly so that loading does not log every one of them
+        scope = Scope.__new__(Scope)
+        scope.name, scope.level, scope.next_offset, scope.entities = strings[name], level, next_offset, {}
+        for _ in range(entity_count):
+            name, entity_type, level, offset, parameter_count = ENTITY_RECORD.unpack(
+                _read_exactly(file, ENTITY_RECORD.size))
+            parameters = array('I')
+            parameters.frombytes(_read_exactly(file, parameter_count * parameters.itemsize))
+            scope.entities[strings[name]] = SymbolTableEntity(
+                strings[name], strings[entity_type - 1] if entity_type else None, level - 1 if level else None,
+                offset, [strings[parameter] for parameter in _little_endian(parameters)])
+        scopes.append(scope)
+        parents.append(parent)
+    for scope, parent in zip(scopes, parents):
+        scope.parent = scopes[parent - 1] if parent else None
+
+    # The open scopes of the table are the last ones entered of each level, up to the current one
+    table_scopes = [None] * table_scope_count
+    for scope in scopes:
+        if scope.level < table_scope_count:
+            table_scopes[scope.level] = scope
+
+    symbol_table = SymbolTable.__new__(SymbolTable)
+    symbol_table.scopes = table_scopes
+    symbol_table.all_scopes = scopes
+    symbol_table.current_scope_level = current_scope_level
+    return symbol_table
+
+#########################################################################
+# End of Serialization                                                  #
+#########################################################################
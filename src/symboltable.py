@@ -5,11 +5,19 @@
 # such as type, scope level, offsets, etc.                             #
 #########################################################################
 
-import logging
+from bisect import bisect_right
+from collections import namedtuple
+from src.diagnostics import get_diagnostics
+from src.syntaxAST import ASTNode, NodeVisitor
 
-# Configure logger for debug purposes
-logging.basicConfig(level=logging.INFO, format='%(levelname)s: %(message)s')
-logger = logging.getLogger("Symbol Table Logger")
+# Diagnostics for debug purposes, configured by the entry point (see configure_diagnostics)
+diagnostics = get_diagnostics("Symbol Table Logger")
+
+# The words at the start of every frame: the return address, the access link and the address of the return value
+FRAME_HEADER_SIZE = 12
+WORD_SIZE = 4
+# The entities that are stored in the frame of their scope
+STORED_TYPES = ('variable', 'parameter')
 
 class SymbolTableEntity:
     """Represents an entity in the symbol table (variable, function, etc.)."""
@@ -34,17 +42,21 @@ class Scope:
         self.level = level      # Nesting level (0 for global)
         self.parent = parent    # Parent scope
         self.entities = {}      # Entities declared in this scope
-        self.next_offset = 0    # Next available offset
-        logger.debug(f"Created new scope: {name} (level {level})")
+        self.next_offset = FRAME_HEADER_SIZE  # Next available offset
+        if diagnostics.debug_enabled:
+            diagnostics.debug("Created new scope: %s (level %s)", name, level)
 
     def insert(self, entity):
         """Insert an entity into the current scope, or update if it already exists."""
         if entity.name in self.entities:
-            logger.warning(
-                f"{entity.entity_type.capitalize()} '{entity.name}' already exists in scope '{self.name}', skipping.")
+            diagnostics.warning("%s '%s' already exists in scope '%s', skipping.",
+                                entity.entity_type.capitalize(), entity.name, self.name)
             return self.entities[entity.name]  # Return existing entity
 
         self.entities[entity.name] = entity
+        if entity.entity_type in STORED_TYPES:
+            entity.offset = self.next_offset
+            self.next_offset += WORD_SIZE
         return entity
 
 
@@ -53,41 +65,44 @@ class SymbolTable:
 
     def __init__(self):
         """Initialize with global scope."""
+        # Pick up the logging configuration of the caller, once per table, so that the lookups,
+        # the hottest path, do not even check it
+        diagnostics.refresh()
+        if diagnostics.debug_enabled:
+            self.lookup = self.logged_lookup
         self.current_scope_level = 0
+        # The open scopes, from the global one to the current one
         self.scopes = [Scope("global", 0)]
-        self.current_scope = self.scopes[0]
-        logger.info("Symbol table initialized")
+        # Every scope in the order it was entered, which is the pre-order of the scope tree, so the
+        # scopes that were exited are kept. The index of a scope in this list is its scope id.
+        self.all_scopes = [self.scopes[0]]
+        diagnostics.info("Symbol table initialized")
 
     @property
     def current_scope(self):
         """Get the current scope."""
         return self.scopes[self.current_scope_level]
 
-    @current_scope.setter
-    def current_scope(self, scope):
-        """Set the current scope."""
-        if self.current_scope_level < len(self.scopes):
-            self.scopes[self.current_scope_level] = scope
-        else:
-            self.scopes.append(scope)
-
     def enter_scope(self, name):
         """Enter a new scope."""
         parent = self.current_scope
         self.current_scope_level += 1
         new_scope = Scope(name, self.current_scope_level, parent)
-        self.current_scope = new_scope
-        logger.debug(f"Entered scope: {name} (level {self.current_scope_level})")
+        self.scopes.append(new_scope)
+        self.all_scopes.append(new_scope)
+        if diagnostics.debug_enabled:
+            diagnostics.debug("Entered scope: %s (level %s)", name, self.current_scope_level)
         return new_scope
 
     def exit_scope(self):
         """Exit the current scope and return to parent scope."""
         if self.current_scope_level > 0:
-            exited_scope_name = self.current_scope.name
+            exited_scope_name = self.scopes.pop().name
             self.current_scope_level -= 1
-            logger.debug(f"Exited scope: {exited_scope_name}, returned to level {self.current_scope_level}")
+            if diagnostics.debug_enabled:
+                diagnostics.debug("Exited scope: %s, returned to level %s", exited_scope_name, self.current_scope_level)
             return True
-        logger.warning("Attempted to exit global scope")
+        diagnostics.warning("Attempted to exit global scope")
         return False
 
     def insert(self, name, entity_type=None, parameters=None):
@@ -104,157 +119,387 @@ class SymbolTable:
         scope = self.current_scope
         while scope:
             if name in scope.entities:
-                logger.debug(f"Found '{name}' in scope '{scope.name}'")
                 return scope.entities[name]
             if current_scope_only:
                 break
             scope = scope.parent
+        return None
 
-        logger.debug(f"Entity '{name}' not found")
+    def logged_lookup(self, name, current_scope_only=False):
+        """lookup with a debug message of where the entity was found, used instead when debug messages are enabled."""
+        scope = self.current_scope
+        while scope:
+            if name in scope.entities:
+                diagnostics.debug("Found '%s' in scope '%s'", name, scope.name)
+                return scope.entities[name]
+            if current_scope_only:
+                break
+            scope = scope.parent
+
+        diagnostics.debug("Entity '%s' not found", name)
         return None
 
+    def freeze(self):
+        """Return a FrozenSymbolTable of the scopes entered so far, for the lookups from any scope."""
+        return FrozenSymbolTable(self.all_scopes)
+
     def __str__(self):
         """Generate a string representation of the entire symbol table."""
         result = ["Symbol Table:"]
-        for scope in self.scopes:
+        for scope in self.all_scopes:
             result.append(f"\nScope: {scope.name} (level {scope.level})")
             for name, entity in scope.entities.items():
                 result.append(f"  {entity}")
         return "\n".join(result)
 
 
+class FrozenSymbolTable:
+    """
+    A read-only index of the scope tree of a symbol table, for looking up names from any scope.
+
+    Each scope is identified by its scope id, its index in the pre-order of the tree, and covers the
+    interval [id, end) of the ids of itself and its descendants. For each name, the declarations are
+    flattened into the pieces of the id range where the same declaration is the innermost one in
+    scope: `declarations[name]` is the sorted list of the starts of the pieces and the list of their
+    (scope id, entity) declarations, or None where the name is not declared. A lookup from any scope
+    is then one bisect, with no scope chain to walk.
+
+    The index holds the scopes and entities of the table, which are not changed by the lookups, so it
+    can be shared by the later phases and sent to worker processes.
+    """
+
+    def __init__(self, scopes):
+        self.scopes = list(scopes)
+        self.ends = self.scope_ends(self.scopes)
+        declared = {}
+        for scope_id, scope in enumerate(self.scopes):
+            for name, entity in scope.entities.items():
+                declared.setdefault(name, []).append((scope_id, entity))
+        self.declarations = {name: self.pieces(declarations) for name, declarations in declared.items()}
+
+    @staticmethod
+    def scope_ends(scopes):
+        """Return the end of the interval of each scope, the id of the first scope after its descendants."""
+        ends = [len(scopes)] * len(scopes)
+        open_ids = []
+        for scope_id, scope in enumerate(scopes):
+            while open_ids and scopes[open_ids[-1]].level >= scope.level:
+                ends[open_ids.pop()] = scope_id
+            open_ids.append(scope_id)
+        return ends
+
+    def pieces(self, declarations):
+        """Flatten the (scope id, entity) declarations of a name, in pre-order, into the pieces of the id range."""
+        ends = self.ends
+        starts = []
+        innermost = []
+
+        def start_piece(start, declaration):
+            if starts and starts[-1] == start:
+                innermost[-1] = declaration
+            else:
+                starts.append(start)
+                innermost.append(declaration)
+
+        # The declarations whose intervals hold the current one, the innermost last
+        enclosing = []
+        for declaration in declarations + [(len(ends), None)]:
+            scope_id = declaration[0]
+            while enclosing and ends[enclosing[-1][0]] <= scope_id:
+                end = ends[enclosing.pop()[0]]
+                start_piece(end, enclosing[-1] if enclosing else None)
+            if declaration[1] is not None:
+                enclosing.append(declaration)
+                start_piece(scope_id, declaration)
+        return starts, innermost
+
+    def find(self, name, scope_id):
+        """Return the (scope id, entity) declaration of a name in scope in the given scope, or None."""
+        declarations = self.declarations.get(name)
+        if declarations is None:
+            return None
+        starts, innermost = declarations
+        index = bisect_right(starts, scope_id) - 1
+        return innermost[index] if index >= 0 else None
+
+    def lookup(self, name, scope_id=0):
+        """Look up an entity by name from the given scope, as SymbolTable.lookup does from the current one."""
+        declaration = self.find(name, scope_id)
+        return declaration and declaration[1]
+
+    def interval(self, scope_id):
+        """Return the [start, end) interval of the ids of a scope and its descendants."""
+        return scope_id, self.ends[scope_id]
+
+
 def build_symbol_table(ast):
     """
     Build a symbol table from an AST.
 
     Args:
-        ast: The abstract syntax tree
+        ast: The abstract syntax tree, as an ASTNode or in the dict form of ASTNode.to_dict
 
     Returns:
         A populated SymbolTable instance
     """
-    logger.info("Building symbol table from AST")
+    diagnostics.info("Building symbol table from AST")
     symbol_table = SymbolTable()
 
     # Process the AST to build the symbol table
-    _process_ast_node(ast, symbol_table)
+    if isinstance(ast, dict):
+        ast = ASTNode.from_dict(ast)
+    SymbolTableBuilder(symbol_table).visit(ast)
 
-    logger.info("Symbol table construction complete")
+    diagnostics.info("Symbol table construction complete")
     return symbol_table
 
 
-def _process_ast_node(node, symbol_table):
+class SymbolTableBuilder(NodeVisitor):
     """
-    Recursively process an AST node to populate the symbol table.
+    Visitor that populates a symbol table from the declarations of an AST.
 
-    Args:
-        node: The current AST node
-        symbol_table: The symbol table to populate
+    Each node is visited once. The nodes a visit method handles itself are not visited again,
+    and statements are skipped, since they declare nothing.
     """
-    node_type = node.get('type')
 
-    # Process based on node type
-    if node_type == 'PROGRAM':
+    def __init__(self, symbol_table):
+        self.symbol_table = symbol_table
+
+    def visit_PROGRAM(self, node):
         # Program name
-        program_name = node['children'][0]['value']
-        logger.debug(f"Processing program: {program_name}")
-        symbol_table.insert(program_name, 'program')
+        program_name = node.children[0].value
+        diagnostics.debug("Processing program: %s", program_name)
+        self.symbol_table.insert(program_name, 'program')
 
         # Process program block
-        if len(node['children']) > 1:
-            _process_ast_node(node['children'][1], symbol_table)
-
-    elif node_type == 'DECLARATIONS':
-        if 'children' in node:
-            for var_list in node['children']:
-                _process_ast_node(var_list, symbol_table)
-
-    elif node_type == 'VAR_LIST':
-        if 'children' in node:
-            for var_node in node['children']:
-                var_name = var_node['value']
-                logger.debug(f"Declaring variable: {var_name}")
-                try:
-                    symbol_table.insert(var_name, 'variable')
-                except ValueError as e:
-                    logger.error(f"Error adding variable {var_name}: {str(e)}")
-
-    elif node_type == 'FUNCTION':
-        # Function name
-        func_name = node['children'][0]['value']
-        logger.debug(f"Processing function: {func_name}")
+        if len(node.children) > 1:
+            yield node.children[1]
+
+    def visit_VAR_LIST(self, node):
+        for var_node in node.children:
+            var_name = var_node.value
+            if diagnostics.debug_enabled:
+                diagnostics.debug("Declaring variable: %s", var_name)
+            try:
+                self.symbol_table.insert(var_name, 'variable')
+            except ValueError as e:
+                diagnostics.error("Error adding variable %s: %s", var_name, e)
+
+    def visit_SEQUENCE(self, node):
+        pass
+
+    def visit_FUNCTION(self, node):
+        return self.visit_subprogram(node, 'function')
+
+    def visit_PROCEDURE(self, node):
+        return self.visit_subprogram(node, 'procedure')
+
+    def visit_subprogram(self, node, entity_type):
+        """Declare a function or procedure and its parameters, and process its body in its own scope."""
+        name = node.children[0].value
+        diagnostics.debug("Processing %s: %s", entity_type, name)
 
         # Parse parameters
         params = []
-        if len(node['children']) > 1:
-            param_node = node['children'][1]
-            if 'children' in param_node and param_node['children']:
-                for var_list in param_node['children']:
-                    if 'children' in var_list:
-                        for param in var_list['children']:
-                            params.append(param['value'])
-
-        # Add function to symbol table
+        if len(node.children) > 1:
+            for var_list in node.children[1].children:
+                for param in var_list.children:
+                    params.append(param.value)
+
+        # Add the subprogram to symbol table
         try:
-            symbol_table.insert(func_name, 'function', params)
+            self.symbol_table.insert(name, entity_type, params)
         except ValueError as e:
-            logger.error(f"Error adding function {func_name}: {str(e)}")
+            diagnostics.error("Error adding %s %s: %s", entity_type, name, e)
             raise
 
-        # Enter function scope
-        symbol_table.enter_scope(func_name)
+        # Enter the subprogram scope
+        self.symbol_table.enter_scope(name)
 
-        # Add parameters to function scope
+        # Add parameters to the subprogram scope
         for param in params:
-            symbol_table.insert(param, 'parameter')
+            self.symbol_table.insert(param, 'parameter')
 
-        # Process function body
-        if len(node['children']) > 2:
-            _process_ast_node(node['children'][2], symbol_table)
+        # Process the subprogram body
+        if len(node.children) > 2:
+            yield node.children[2]
 
-        # Exit function scope
-        symbol_table.exit_scope()
+        # Exit the subprogram scope
+        self.symbol_table.exit_scope()
 
-    elif node_type == 'PROCEDURE':
-        # Similar to function processing
-        proc_name = node['children'][0]['value']
-        logger.debug(f"Processing procedure: {proc_name}")
 
-        # Parse parameters
-        params = []
-        if len(node['children']) > 1:
-            param_node = node['children'][1]
-            if 'children' in param_node and param_node['children']:
-                for var_list in param_node['children']:
-                    if 'children' in var_list:
-                        for param in var_list['children']:
-                            params.append(param['value'])
-
-        # Add procedure to symbol table
-        try:
-            symbol_table.insert(proc_name, 'procedure', params)
-        except ValueError as e:
-            logger.error(f"Error adding procedure {proc_name}: {str(e)}")
-            raise
 
-        # Enter procedure scope
-        symbol_table.enter_scope(proc_name)
+# Where the name of a use is declared: `depth` scopes out from the scope of the use, in the scope with
+# the id `scope_id`, at `offset` in its frame. `kind` is 'local', 'parameter', 'nonlocal', 'nonlocal_parameter'
+# or 'global' for the variables and parameters, and the entity type for the subprograms and the program.
+Resolution = namedtuple('Resolution', ['depth', 'scope_id', 'offset', 'kind'])
 
-        # Add parameters to procedure scope
-        for param in params:
-            symbol_table.insert(param, 'parameter')
 
-        # Process procedure body
-        if len(node['children']) > 2:
-            _process_ast_node(node['children'][2], symbol_table)
+class NameResolution:
+    """
+    The resolutions of the names used in a program.
+
+    `uses` maps the scope id of each block and an IDENTIFIER node of its statements to the Resolution of
+    that use, so that a SharedNode that stands for uses in several blocks has one for each. `blocks` maps
+    the scope id of each block, the program or a subprogram, to the resolutions of the names used in it.
+    The begin_block quads carry the scope id, since subprograms in different scopes can have the same name.
+    All the uses of a name in a block resolve the same way, since the declarations of a block come before
+    its statements, so each name is looked up once per block.
+
+    The names are looked up in the FrozenSymbolTable `table`, from the scope of the block entered with
+    enter. While the table is still being filled, as in the one pass, the uses are noted with use_later
+    instead, and resolved by resolve_later with the table of the whole program.
+    """
+
+    def __init__(self, table=None):
+        self.table = table
+        self.uses = {}
+        self.blocks = {}
+        # (scope id, resolutions of the block, uses to resolve later) of the blocks around the current
+        # one, the current one last
+        self.chain = []
+        self.scope_id = self.names = None
+        # The same for the blocks that were exited with uses to resolve later
+        self.later = []
+
+    def enter(self, scope_id):
+        """Resolve the names in the block of the scope with the given id from now on."""
+        self.scope_id = scope_id
+        self.names = self.blocks[scope_id] = {}
+        self.chain.append((scope_id, self.names, {}))
+
+    def exit(self):
+        """Go back to the block around the current one."""
+        entry = self.chain.pop()
+        if entry[2]:
+            self.later.append(entry)
+        self.scope_id, self.names = self.chain[-1][:2] if self.chain else (None, None)
+
+    def resolve(self, name):
+        """Return the Resolution of a name used in the current scope, or None if it is not declared."""
+        resolution = self.names.get(name)
+        if resolution is None:
+            declaration = self.table.find(name, self.scope_id)
+            if declaration is not None:
+                scope_id, entity = declaration
+                scopes = self.table.scopes
+                level = scopes[scope_id].level
+                depth = scopes[self.scope_id].level - level
+                resolution = self.names[name] = Resolution(depth, scope_id, entity.offset,
+                                                           self.kind(entity, depth, level))
+        return resolution
+
+    def use(self, name, line=None):
+        """
+        Resolve a use of a name, with a warning if it is not declared. The warning has no line for the
+        uses without one, such as the SharedNode identifiers of a tree parsed with share_nodes.
+        """
+        resolution = self.resolve(name)
+        if resolution is None:
+            if line is None:
+                diagnostics.warning("'%s' is not declared", name)
+            else:
+                diagnostics.warning("'%s' is not declared (line %s)", name, line)
+        return resolution
+
+    def use_later(self, name, line=None):
+        """Note a use of a name in the current scope, to be resolved by resolve_later."""
+        self.chain[-1][2].setdefault(name, line)
+
+    def resolve_later(self, table):
+        """Resolve the uses noted with use_later in the blocks that were exited, in the given FrozenSymbolTable."""
+        self.table = table
+        current = self.scope_id, self.names
+        for self.scope_id, self.names, uses in self.later:
+            for name, line in uses.items():
+                self.use(name, line)
+        self.scope_id, self.names = current
+        self.later = []
+
+    @staticmethod
+    def kind(entity, depth, level):
+        if entity.entity_type not in STORED_TYPES:
+            return entity.entity_type
+        if depth == 0:
+            return 'local' if entity.entity_type == 'variable' else 'parameter'
+        if level == 0:
+            return 'global'
+        return 'nonlocal' if entity.entity_type == 'variable' else 'nonlocal_parameter'
+
+
+def resolve_names(ast, symbol_table):
+    """
+    Resolve every name used in the statements of an AST, once, in the scopes of its symbol table.
+
+    Args:
+        ast: The abstract syntax tree, as an ASTNode or in the dict form of ASTNode.to_dict
+        symbol_table: The SymbolTable that build_symbol_table built from the AST
+
+    Returns:
+        The NameResolution of the uses and the blocks of the program
+    """
+    resolution = NameResolution(symbol_table.freeze())
+    if isinstance(ast, dict):
+        ast = ASTNode.from_dict(ast)
+    NameResolver(symbol_table, resolution).visit(ast)
+    return resolution
+
 
-        # Exit procedure scope
-        symbol_table.exit_scope()
+class NameResolver(NodeVisitor):
+    """
+    Visitor that resolves the uses of the names of an AST in the scopes of its symbol table.
+
+    The subprograms are visited in the order build_symbol_table entered their scopes, so the scope of each
+    one is the next one of `symbol_table.all_scopes`. Only the subprograms and the statements are visited.
+    """
 
-    # Process other node types recursively
-    if 'children' in node:
-        for child in node['children']:
-            _process_ast_node(child, symbol_table)
+    def __init__(self, symbol_table, resolution):
+        self.scopes = symbol_table.all_scopes
+        self.next_scope_id = 1
+        self.resolution = resolution
+
+    def visit_PROGRAM(self, node):
+        self.resolution.enter(0)
+        if len(node.children) > 1:
+            yield node.children[1]
+        self.resolution.exit()
+
+    def visit_DECLARATIONS(self, node):
+        pass
+
+    def visit_FUNCTION(self, node):
+        return self.visit_subprogram(node)
+
+    def visit_PROCEDURE(self, node):
+        return self.visit_subprogram(node)
+
+    def visit_subprogram(self, node):
+        name = node.children[0].value
+        scope_id = self.next_scope_id
+        if scope_id >= len(self.scopes) or self.scopes[scope_id].name != name:
+            raise ValueError(f"The symbol table has no scope for the subprogram '{name}'")
+        self.next_scope_id += 1
+        self.resolution.enter(scope_id)
+        if len(node.children) > 2:
+            yield node.children[2]
+        self.resolution.exit()
+
+    def visit_FUNCTION_INPUT(self, node):
+        pass
+
+    def visit_FUNCTION_OUTPUT(self, node):
+        pass
+
+    def visit_SEQUENCE(self, node):
+        # Statements declare nothing, so every name in them is a use
+        use = self.resolution.use
+        uses = self.resolution.uses
+        scope_id = self.resolution.scope_id
+        for child in node.walk():
+            if child.type == 'IDENTIFIER' and child.value is not None:
+                resolution = use(child.value, child.line)
+                if resolution is not None:
+                    uses[scope_id, child] = resolution
 
 #########################################################################
 # End of Symbol Table                                                   #
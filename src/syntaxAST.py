@@ -6,81 +6,490 @@
 # Finally, the parse method returns True if the program is syntactically correct, otherwise it returns False.   #
 #################################################################################################################
 
-from src.lexer import TokenType
+import gc
+from bisect import bisect_left
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from os import cpu_count
+from types import GeneratorType
+from weakref import WeakValueDictionary
+
+from src.lexer import (TokenType, TokenKind, TokenStream, KIND_CODES, KIND_TYPES, KIND_VALUES, VALUE_KINDS,
+                       RELATIONAL_OPERATORS, split_trivia, token_kind)
+from src.diagnostics import get_diagnostics
+
+# Diagnostics of the parsers, configured by the entry point (see configure_diagnostics)
+syntax_diagnostics = get_diagnostics("Syntax Logger")
+
+
+@contextmanager
+def paused_gc():
+    """
+    Pause the garbage collector while building a large structure without reference cycles, which
+    it would otherwise scan over and over as the structure grows.
+    """
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if enabled:
+            gc.enable()
 
 
 class ASTNode:
+    """
+    A node of the syntax tree.
+
+    Nodes have no __dict__, and a node without children shares one empty tuple instead of
+    owning an empty list. Most nodes are leaves, so this keeps large trees small.
+    """
+    __slots__ = ('type', 'children', 'value', 'line')
+
     def __init__(self, node_type, children=None, value=None, line=None):
         self.type = node_type
-        self.children = children if children is not None else []
+        self.children = children if children is not None else ()
         self.value = value
         self.line = line
 
     def add_child(self, child):
-        self.children.append(child)
+        if self.children:
+            self.children.append(child)
+        else:
+            self.children = [child]
+
+    @classmethod
+    def from_dict(cls, data):
+        """Build a node from the dict form returned by to_dict, without recursing."""
+        root = cls(data['type'], None, data.get('value'), data.get('line'))
+        stack = [(root, data)]
+        with paused_gc():
+            while stack:
+                node, data = stack.pop()
+                if data.get('children'):
+                    node.children = [cls(child['type'], None, child.get('value'), child.get('line'))
+                                     for child in data['children']]
+                    stack.extend(zip(node.children, data['children']))
+        return root
+
+    def walk(self):
+        """Yield the node and all of its descendants in pre-order, without recursing."""
+        stack = [self]
+        while stack:
+            node = stack.pop()
+            yield node
+            stack.extend(reversed(node.children))
 
     def to_dict(self):
-        result = {'type': self.type}
-        if self.value is not None:
-            result['value'] = self.value
-        if self.line is not None:
-            result['line'] = self.line
-        if self.children:
-            result['children'] = [child.to_dict() for child in self.children]
-        return result
+        """Return the subtree as nested dicts, without recursing."""
+        # Going over the nodes in reverse pre-order, the dicts of the children of each node are the
+        # last ones on the stack when it is reached, the first child on top
+        stack = []
+        with paused_gc():
+            for node in reversed(list(self.walk())):
+                result = {'type': node.type}
+                if node.value is not None:
+                    result['value'] = node.value
+                if node.line is not None:
+                    result['line'] = node.line
+                if node.children:
+                    count = len(node.children)
+                    result['children'] = stack[:-count - 1:-1]
+                    del stack[-count:]
+                stack.append(result)
+        return stack[0]
+
+
+_children = ASTNode.children  # The children slot of ASTNode, which LazyNode hides behind a property
+
+
+class LazyNode(ASTNode):
+    """
+    A node whose children are parsed only when they are first accessed, by calling `parse_children`,
+    which returns a node with the same type.
+    """
+    __slots__ = ('parse_children',)
+
+    def __init__(self, node_type, parse_children, value=None, line=None):
+        self.parse_children = parse_children
+        super().__init__(node_type, value=value, line=line)
+
+    @property
+    def children(self):
+        if self.parse_children is not None:
+            # Only dropped once the parse succeeds, so that a syntax error is raised again on every access
+            _children.__set__(self, self.parse_children().children)
+            self.parse_children = None
+        return _children.__get__(self)
+
+    @children.setter
+    def children(self, children):
+        _children.__set__(self, children)
+
+
+class SharedNode(ASTNode):
+    """
+    A node of a subtree that is shared by every structurally identical subtree (see share). Its
+    children are a tuple, since shared nodes must not be changed.
+    """
+    __slots__ = ('__weakref__',)
+
+
+# (type, value, children) -> the SharedNode with them. An entry goes away with the last tree using it.
+SHARED_NODES = WeakValueDictionary()
+
+
+def share(node):
+    """
+    Return the shared node that is structurally identical to the subtree: same types, values and
+    shape. The nodes of the subtree are interned from the leaves up. Shared nodes have no line,
+    since the subtrees that they stand for can be on any line.
+    """
+    if type(node) is SharedNode:
+        return node
+    # Pre-order over the nodes that are not shared yet, so that reversed, the children come first
+    nodes = []
+    stack = [node]
+    while stack:
+        current = stack.pop()
+        nodes.append(current)
+        stack.extend(child for child in current.children if type(child) is not SharedNode)
+    shared = {}
+    for current in reversed(nodes):
+        children = tuple(shared.get(id(child), child) for child in current.children)
+        key = (current.type, current.value, children)
+        result = SHARED_NODES.get(key)
+        if result is None:
+            result = SHARED_NODES[key] = SharedNode(current.type, children or None, current.value)
+        shared[id(current)] = result
+    return shared[id(node)]
+
+
+class NodeVisitor:
+    """
+    Base class for the phases that walk the syntax tree.
+
+    visit(node) calls the visit_<node type> method of the subclass, such as visit_FUNCTION,
+    or generic_visit, which visits the children of the node, when it has none.
+
+    A visit method that has to visit other nodes is a generator: it yields each node to visit, or
+    the generator of another step, and is sent back its result. visit runs them from an explicit
+    stack, so that the depth of the tree is not limited by the recursion limit.
+    """
+
+    def visit(self, node):
+        return self.run(getattr(self, 'visit_' + node.type, self.generic_visit)(node))
+
+    def run(self, result):
+        """Run a step, the result of a visit method or another generator of steps, and return its result."""
+        stack = []
+        while True:
+            if isinstance(result, GeneratorType):
+                stack.append(result)
+                result = None
+            if not stack:
+                return result
+            try:
+                step = stack[-1].send(result)
+            except StopIteration as done:
+                stack.pop()
+                result = done.value
+            else:
+                result = step if isinstance(step, GeneratorType) else (
+                    getattr(self, 'visit_' + step.type, self.generic_visit)(step))
+
+    def generic_visit(self, node):
+        for child in node.children:
+            yield child
+
+
+class TokenRing:
+    """
+    A fixed-size window over a token iterator.
+
+    Tokens are pulled from the iterator only when they are first indexed, and only the last `size`
+    tokens are kept, so a parser that never looks back further than that can run in constant memory.
+    """
+
+    def __init__(self, tokens, size=2):
+        self.tokens = iter(tokens)
+        self.size = size
+        self.buffer = [None] * size
+        self.start = 0  # Index of the oldest buffered token
+        self.end = 0  # Index after the newest buffered token
+
+    def get(self, index):
+        """Return the token at the given index, or None after the end of the stream."""
+        if index < self.start:
+            raise IndexError(f"Token {index} is no longer buffered")
+        while index >= self.end:
+            token = next(self.tokens, None)
+            if token is None:
+                return None
+            self.buffer[self.end % self.size] = token
+            self.end += 1
+            if self.end - self.start > self.size:
+                self.start += 1
+        return self.buffer[index % self.size]
+
+    def __getitem__(self, index):
+        token = self.get(index)
+        if token is None:
+            raise IndexError(f"Token {index} is after the end of the stream")
+        return token
+
+
+# FIRST and FOLLOW sets of the rules, as sets of token kinds
+ADD_OPERATORS = {TokenKind.PLUS, TokenKind.MINUS}
+MUL_OPERATORS = {TokenKind.TIMES, TokenKind.DIVIDE}
+RELATIONAL_OPERATOR_KINDS = {VALUE_KINDS[operator] for operator in RELATIONAL_OPERATORS}
+# The tokens that can follow a sequence, where a ';' before them ends it
+SEQUENCE_FOLLOW = {
+    TokenKind.END_PROGRAM, TokenKind.END_FUNCTION, TokenKind.END_PROCEDURE, TokenKind.ELSE,
+    TokenKind.END_IF, TokenKind.END_WHILE, TokenKind.END_FOR, TokenKind.UNTIL,
+}
+# The rule to parse for each kind in the FIRST set of statement and of subprograms
+STATEMENT_RULES = {
+    TokenKind.IDENTIFIER: 'assignment_stat', TokenKind.IF: 'if_stat', TokenKind.WHILE: 'while_stat',
+    TokenKind.REPEAT: 'do_stat', TokenKind.FOR: 'for_stat', TokenKind.READ: 'input_stat',
+    TokenKind.WRITE: 'print_stat', TokenKind.CALL: 'call_stat',
+}
+SUBPROGRAM_RULES = {TokenKind.FUNCTION: 'func', TokenKind.PROCEDURE: 'proc'}
+
+# Panic mode error recovery: after a syntax error in a statement or a subprogram, the parser
+# skips to one of these tokens and goes on from there
+STATEMENT_SYNC = SEQUENCE_FOLLOW | {TokenKind.SEMICOLON, TokenKind.BEGIN_PROGRAM}
+SUBPROGRAM_SYNC = {
+    TokenKind.FUNCTION, TokenKind.PROCEDURE, TokenKind.BEGIN_PROGRAM, TokenKind.BEGIN_FUNCTION,
+    TokenKind.BEGIN_PROCEDURE,
+}
+# The tokens that end a sequence in recovery mode, where a statement without its ';' is an error
+SEQUENCE_END = (STATEMENT_SYNC - {TokenKind.SEMICOLON}) | {TokenKind.EOF}
+# The block end of each keyword that opens a block, and the tokens where skipping always stops
+BLOCK_ENDS = {
+    TokenKind.IF: TokenKind.END_IF, TokenKind.WHILE: TokenKind.END_WHILE, TokenKind.FOR: TokenKind.END_FOR,
+    TokenKind.FUNCTION: TokenKind.END_FUNCTION, TokenKind.PROCEDURE: TokenKind.END_PROCEDURE,
+}
+HARD_STOPS = set(BLOCK_ENDS.values()) | {TokenKind.UNTIL, TokenKind.END_PROGRAM, TokenKind.BEGIN_PROGRAM}
+# The tokens before a statement, after which 'επανάλαβε' starts a do statement instead of a loop body
+STATEMENT_STARTS = {
+    TokenKind.SEMICOLON, TokenKind.THEN, TokenKind.ELSE, TokenKind.REPEAT, TokenKind.BEGIN_PROGRAM,
+    TokenKind.BEGIN_FUNCTION, TokenKind.BEGIN_PROCEDURE,
+}
 
 
 class Syntax:
-    def __init__(self, tokens):
+    def __init__(self, tokens, trivia=None, recover=False, lazy=False, share_nodes=False):
+        """
+        Parse `tokens`. The comments are moved out of the token stream into `self.trivia`
+        (see split_trivia), unless the `trivia` of tokens that are already free of comments is given.
+
+        By default the first syntax error raises SyntaxError. With `recover`, the parser skips past
+        each error instead (see synchronize), collects all of them in `self.errors`, and parse returns
+        the partial AST, with an ERROR node in place of each statement or subprogram that failed.
+
+        With `lazy`, the statements of the subprogram and program bodies are skipped up to the end of the
+        body, and each body is a LazyNode that parses them when its children are first accessed, so that
+        the signatures, declarations and nesting of the subprograms cost little more than lexing. The syntax
+        errors of a body are only found then.
+
+        With `share_nodes`, the identifiers, expressions and conditions are SharedNode subtrees (see
+        share), so that each of their repeats takes no memory. They have no lines, so the diagnostics
+        about them, such as the warnings of undeclared names, and the debug dump of the tree give no
+        line for them. The tree must not be changed.
+        """
+        if isinstance(tokens, TokenStream):
+            self.load = self.load_columnar
+            if trivia is None and KIND_CODES[TokenType.COMMENT] in tokens.kinds:
+                trivia = {}
+                tokens = TokenStream.from_tokens(split_trivia(tokens, trivia))
+        elif trivia is None:
+            trivia = {}
+            tokens = list(split_trivia(tokens, trivia))
         self.tokens = tokens
+        self.kinds = self.token_kinds(tokens)
+        self.trivia = {} if trivia is None else trivia
+        # Dispatch tables from token kinds to the bound rule methods
+        self.statement_rules = {kind: getattr(self, rule) for kind, rule in STATEMENT_RULES.items()}
+        self.subprogram_rules = {kind: getattr(self, rule) for kind, rule in SUBPROGRAM_RULES.items()}
         self.current_token_index = 0
-        self.current_token = self.tokens[self.current_token_index]
+        # The current token is kept as attributes so that no token tuple is needed. The rules
+        # look at its integer kind (see token_kind) rather than comparing strings.
+        self.current_type = self.current_value = self.current_line = self.current_kind = None
+        self.load(self.current_token_index)
         self.errors = []
         self.ast = None
+        self.recover = recover
+        # The block ends expected by the statements and subprograms being parsed, innermost last
+        self.open_blocks = []
+        self.lazy = lazy
+        if share_nodes:
+            # The nodes that these rules return are finished, so they can be shared
+            for rule in ['identifier', 'expression', 'condition']:
+                setattr(self, rule, lambda parse=getattr(self, rule): share(parse()))
+        self.body_ends = None  # Kind of subprogram body end -> indexes of its tokens, found when first needed
+
+    @property
+    def current_token(self):
+        return self.current_type, self.current_value, self.current_line
 
     def error(self, message):
-        _, token_value, line = self.current_token
-        error_msg = f"Error at line {line}: {message}, got '{token_value}'"
+        error_msg = f"Error at line {self.current_line}: {message}, got '{self.current_value}'"
         self.errors.append(error_msg)
-        print(error_msg)
+        syntax_diagnostics.error("%s", error_msg)
         raise SyntaxError(error_msg)
 
+    def token_kinds(self, tokens):
+        """
+        Return the kind of every token of a token list, found once so that load does not map the
+        types and values to kinds again on every token. A TokenStream already has them.
+        """
+        if isinstance(tokens, TokenStream):
+            return tokens.kinds
+        return [token_kind(token_type, value) for token_type, value, _ in tokens]
+
+    def load(self, index):
+        """Make the token at the given index the current token. Return False after the last token."""
+        if index >= len(self.tokens):
+            return False
+        self.current_type, self.current_value, self.current_line = self.tokens[index]
+        self.current_kind = self.kinds[index]
+        return True
+
+    def load_columnar(self, index):
+        """Same as load, reading the columns of a TokenStream directly."""
+        tokens = self.tokens
+        if index >= len(tokens.kinds):
+            return False
+        self.current_kind = kind = tokens.kinds[index]
+        self.current_type = KIND_TYPES[kind]
+        self.current_value = tokens.strings[tokens.values[index]]
+        self.current_line = tokens.lines[index]
+        return True
+
     def advance(self):
         self.current_token_index += 1
-        # ignore comments
-        while self.current_token_index < len(self.tokens) and self.tokens[self.current_token_index][
-            0] == TokenType.COMMENT:
-            self.current_token_index += 1
-
-        if self.current_token_index < len(self.tokens):
-            self.current_token = self.tokens[self.current_token_index]
-        return self.current_token
+        self.load(self.current_token_index)
 
     def eat(self, token_type=None, token_value=None):
-        current_token = self.current_token
-        if token_type and self.current_token[0] != token_type:
+        if token_type and self.current_type != token_type:
             self.error(f"Expected token type {token_type}")
-        elif token_value and self.current_token[1] != token_value:
-            self.error(f"Expected '{token_value}' got '{self.current_token[0]}'")
+        elif token_value and self.current_value != token_value:
+            self.error(f"Expected '{token_value}' got '{self.current_type}'")
         else:
             self.advance()
-            return current_token
+
+    def expect(self, kind):
+        """Eat the current token if it is the keyword or symbol of the given kind."""
+        if self.current_kind != kind:
+            self.error(f"Expected '{KIND_VALUES[kind]}' got '{self.current_type}'")
+        self.advance()
+
+    def identifier(self):
+        """Eat an identifier token and return it as an IDENTIFIER node."""
+        if self.current_kind != TokenKind.IDENTIFIER:
+            self.error(f"Expected token type {TokenType.IDENTIFIER}")
+        node = ASTNode('IDENTIFIER', value=self.current_value, line=self.current_line)
+        self.advance()
+        return node
+
+    def run(self, step):
+        """
+        Run a step of the statement rules and return its node.
+
+        The rules of the sequences and of the statements that contain them are steps: generators that
+        yield the nodes or the steps of their inner rules and are sent back their nodes. run keeps the
+        steps on an explicit stack, so that the nesting of the statements is not limited by the recursion
+        limit, and throws an exception raised by a step into the step that waits for it, as a recursive
+        call would. A node that is not a step is returned as it is.
+        """
+        stack = []
+        error = None
+        while True:
+            if isinstance(step, GeneratorType):
+                stack.append(step)
+                step = None
+            if not stack:
+                if error is not None:
+                    raise error
+                return step
+            try:
+                if error is None:
+                    step = stack[-1].send(step)
+                else:
+                    exception, error = error, None
+                    step = stack[-1].throw(exception)
+            except StopIteration as done:
+                stack.pop()
+                step = done.value
+            except Exception as raised:
+                stack.pop()
+                step, error = None, raised
+
+    def recovering(self, rule, stop):
+        """
+        Parse a rule and return its node, or the step that parses it (see run). In recovery mode, a syntax
+        error in the rule is replaced by an ERROR node, and the parser skips to the next token in `stop`.
+        """
+        if not self.recover:
+            return rule()
+        return self.recovered(rule, stop)
+
+    def recovered(self, rule, stop):
+        """The step of recovering in recovery mode."""
+        depth = len(self.open_blocks)
+        try:
+            return (yield rule())
+        except SyntaxError:
+            node = ASTNode('ERROR', value=self.errors[-1], line=self.current_line)
+            self.synchronize(depth, stop)
+            return node
+
+    def synchronize(self, depth, stop):
+        """
+        Skip the rest of a rule that failed, up to the next token in `stop` or EOF.
+
+        The blocks that the rule opened (those after `depth` in open_blocks) and the blocks opened by
+        the skipped tokens are skipped up to their block ends first. A block end that none of them
+        expects belongs to an enclosing rule, so skipping stops there.
+        """
+        pending = self.open_blocks[depth:]
+        del self.open_blocks[depth:]
+        previous = None
+        while self.current_kind != TokenKind.EOF:
+            kind = self.current_kind
+            if kind in pending:
+                del pending[len(pending) - 1 - pending[::-1].index(kind):]
+            elif kind in stop and (not pending or kind in HARD_STOPS):
+                return
+            elif kind in BLOCK_ENDS:
+                pending.append(BLOCK_ENDS[kind])
+            elif kind == TokenKind.REPEAT and previous in STATEMENT_STARTS:
+                pending.append(TokenKind.UNTIL)
+            previous = kind
+            self.advance()
 
     def parse(self):
-        return self.program()
+        if not self.recover:
+            return self.program()
+        try:
+            self.program()
+        except SyntaxError:
+            # An error outside of the statements and subprograms ends the parse, keeping the tree so far
+            pass
+        return self.ast
 
     # Κανόνες γραμματικής
 
     def program(self):
         """program : 'πρόγραμμα' ID programblock"""
-        node = ASTNode('PROGRAM')
+        node = self.ast = ASTNode('PROGRAM')
 
         # Eat πρόγραμμα token
-        program_token = self.eat(token_value='πρόγραμμα')
+        self.expect(TokenKind.PROGRAM)
 
         # Get program name (ID)
-        id_token = self.eat(TokenType.IDENTIFIER)
-        id_node = ASTNode('IDENTIFIER', value=id_token[1], line=id_token[2])
+        id_node = self.identifier()
         node.add_child(id_node)
 
         # Parse program block
@@ -102,14 +511,14 @@ class Syntax:
         node.add_child(subprograms_node)
 
         # Eat αρχή_προγράμματος token
-        self.eat(token_value='αρχή_προγράμματος')
+        self.expect(TokenKind.BEGIN_PROGRAM)
 
         # Parse sequence
-        sequence_node = self.sequence()
+        sequence_node = self.body(TokenKind.END_PROGRAM)
         node.add_child(sequence_node)
 
-        # Eat τέλος_προγράμματος token
-        self.eat(token_value='τέλος_προγράμματος')
+        # Eat τέλος_προγράμματος token, skipping everything after it if it is missing
+        self.run(self.recovering(lambda: self.expect(TokenKind.END_PROGRAM), ()))
 
         return node
 
@@ -117,8 +526,8 @@ class Syntax:
         """declarations : ('δήλωση' varlist)* | """
         node = ASTNode('DECLARATIONS')
 
-        while self.current_token[1] == 'δήλωση':
-            self.eat(token_value='δήλωση')
+        while self.current_kind == TokenKind.DECLARE:
+            self.expect(TokenKind.DECLARE)
             varlist_node = self.varlist()
             node.add_child(varlist_node)
 
@@ -129,15 +538,13 @@ class Syntax:
         node = ASTNode('VAR_LIST')
 
         # Add first ID
-        id_token = self.eat(TokenType.IDENTIFIER)
-        id_node = ASTNode('IDENTIFIER', value=id_token[1], line=id_token[2])
+        id_node = self.identifier()
         node.add_child(id_node)
 
         # Add remaining IDs if any
-        while self.current_token[1] == ',':
-            self.eat(token_value=',')
-            id_token = self.eat(TokenType.IDENTIFIER)
-            id_node = ASTNode('IDENTIFIER', value=id_token[1], line=id_token[2])
+        while self.current_kind == TokenKind.COMMA:
+            self.expect(TokenKind.COMMA)
+            id_node = self.identifier()
             node.add_child(id_node)
 
         return node
@@ -146,13 +553,9 @@ class Syntax:
         """subprograms : (func | proc)*"""
         node = ASTNode('SUBPROGRAMS')
 
-        while self.current_token[1] in ['συνάρτηση', 'διαδικασία']:
-            if self.current_token[1] == 'συνάρτηση':
-                func_node = self.func()
-                node.add_child(func_node)
-            else:
-                proc_node = self.proc()
-                node.add_child(proc_node)
+        subprogram_rules = self.subprogram_rules
+        while self.current_kind in subprogram_rules:
+            node.add_child(self.run(self.recovering(subprogram_rules[self.current_kind], SUBPROGRAM_SYNC)))
 
         return node
 
@@ -161,26 +564,27 @@ class Syntax:
         node = ASTNode('FUNCTION')
 
         # Eat συνάρτηση token
-        self.eat(token_value='συνάρτηση')
+        self.expect(TokenKind.FUNCTION)
+        self.open_blocks.append(TokenKind.END_FUNCTION)
 
         # Get function name (ID)
-        id_token = self.eat(TokenType.IDENTIFIER)
-        id_node = ASTNode('IDENTIFIER', value=id_token[1], line=id_token[2])
+        id_node = self.identifier()
         node.add_child(id_node)
 
         # Eat '('
-        self.eat(token_value='(')
+        self.expect(TokenKind.LEFT_PARENTHESIS)
 
         # Parse formal parameter list
         params_node = self.formalparlist()
         node.add_child(params_node)
 
         # Eat ')'
-        self.eat(token_value=')')
+        self.expect(TokenKind.RIGHT_PARENTHESIS)
 
         # Parse function block
         func_block = self.funcblock()
         node.add_child(func_block)
+        self.open_blocks.pop()
 
         return node
 
@@ -189,26 +593,27 @@ class Syntax:
         node = ASTNode('PROCEDURE')
 
         # Eat διαδικασία token
-        self.eat(token_value='διαδικασία')
+        self.expect(TokenKind.PROCEDURE)
+        self.open_blocks.append(TokenKind.END_PROCEDURE)
 
         # Get procedure name (ID)
-        id_token = self.eat(TokenType.IDENTIFIER)
-        id_node = ASTNode('IDENTIFIER', value=id_token[1], line=id_token[2])
+        id_node = self.identifier()
         node.add_child(id_node)
 
         # Eat '('
-        self.eat(token_value='(')
+        self.expect(TokenKind.LEFT_PARENTHESIS)
 
         # Parse formal parameter list
         params_node = self.formalparlist()
         node.add_child(params_node)
 
         # Eat ')'
-        self.eat(token_value=')')
+        self.expect(TokenKind.RIGHT_PARENTHESIS)
 
         # Parse procedure block
         proc_block = self.procblock()
         node.add_child(proc_block)
+        self.open_blocks.pop()
 
         return node
 
@@ -216,7 +621,7 @@ class Syntax:
         """formalparlist : varlist | """
         node = ASTNode('FORMAL_PARAMETERS')
 
-        if self.current_token[0] == TokenType.IDENTIFIER:
+        if self.current_kind == TokenKind.IDENTIFIER:
             varlist_node = self.varlist()
             node.add_child(varlist_node)
 
@@ -228,7 +633,7 @@ class Syntax:
         node = ASTNode('FUNCTION_BLOCK')
 
         # Eat διαπροσωπεία token
-        self.eat(token_value='διαπροσωπεία')
+        self.expect(TokenKind.INTERFACE)
 
         # Parse function input
         input_node = self.funcinput()
@@ -247,14 +652,14 @@ class Syntax:
         node.add_child(subprograms_node)
 
         # Eat αρχή_συνάρτησης token
-        self.eat(token_value='αρχή_συνάρτησης')
+        self.expect(TokenKind.BEGIN_FUNCTION)
 
         # Parse sequence
-        sequence_node = self.sequence()
+        sequence_node = self.body(TokenKind.END_FUNCTION)
         node.add_child(sequence_node)
 
         # Eat τέλος_συνάρτησης token
-        self.eat(token_value='τέλος_συνάρτησης')
+        self.expect(TokenKind.END_FUNCTION)
 
         return node
 
@@ -264,7 +669,7 @@ class Syntax:
         node = ASTNode('PROCEDURE_BLOCK')
 
         # Eat διαπροσωπεία token
-        self.eat(token_value='διαπροσωπεία')
+        self.expect(TokenKind.INTERFACE)
 
         # Parse function input
         input_node = self.funcinput()
@@ -283,23 +688,63 @@ class Syntax:
         node.add_child(subprograms_node)
 
         # Eat αρχή_διαδικασίας token
-        self.eat(token_value='αρχή_διαδικασίας')
+        self.expect(TokenKind.BEGIN_PROCEDURE)
 
         # Parse sequence
-        sequence_node = self.sequence()
+        sequence_node = self.body(TokenKind.END_PROCEDURE)
         node.add_child(sequence_node)
 
         # Eat τέλος_διαδικασίας token
-        self.eat(token_value='τέλος_διαδικασίας')
+        self.expect(TokenKind.END_PROCEDURE)
+
+        return node
 
+    def body(self, end):
+        """
+        Parse the sequence of a subprogram or program body that ends with the token of kind `end`.
+        In lazy mode, skip to that token instead and return a LazyNode for the sequence.
+        """
+        if not self.lazy:
+            return self.run(self.sequence())
+        if self.body_ends is None:
+            self.body_ends = {kind: [] for kind in (TokenKind.END_FUNCTION, TokenKind.END_PROCEDURE,
+                                                     TokenKind.END_PROGRAM)}
+            if isinstance(self.tokens, TokenStream):
+                for index, kind in enumerate(self.tokens.kinds):
+                    if kind in self.body_ends:
+                        self.body_ends[kind].append(index)
+            else:
+                values = {KIND_VALUES[kind]: indexes for kind, indexes in self.body_ends.items()}
+                for index in [index for index, (_, value, _) in enumerate(self.tokens) if value in values]:
+                    values[self.tokens[index][1]].append(index)
+        # A body cannot contain subprograms, so it ends at the next token of that kind
+        ends = self.body_ends[end]
+        position = bisect_left(ends, self.current_token_index)
+        start = self.current_token_index
+        end_index = self.current_token_index = ends[position] if position < len(ends) else len(self.tokens) - 1
+        self.load(end_index)
+        return LazyNode('SEQUENCE', lambda: self.parse_body(start, end_index, end))
+
+    def parse_body(self, start, end_index, end):
+        """Parse the sequence of a body skipped in lazy mode, from token `start` up to the token at `end_index`."""
+        index, open_blocks = self.current_token_index, self.open_blocks
+        self.current_token_index, self.open_blocks = start, [end]
+        self.load(start)
+        try:
+            node = self.run(self.sequence())
+            if self.current_token_index != end_index:
+                self.error(f"Expected '{KIND_VALUES[end]}' got '{self.current_type}'")
+        finally:
+            self.current_token_index, self.open_blocks = index, open_blocks
+            self.load(index)
         return node
 
     def funcinput(self):
         """funcinput : 'είσοδος' varlist | """
         node = ASTNode('FUNCTION_INPUT')
 
-        if self.current_token[1] == 'είσοδος':
-            self.eat(token_value='είσοδος')
+        if self.current_kind == TokenKind.INPUT:
+            self.expect(TokenKind.INPUT)
             varlist_node = self.varlist()
             node.add_child(varlist_node)
 
@@ -309,29 +754,34 @@ class Syntax:
         """funcoutput : 'έξοδος' varlist | """
         node = ASTNode('FUNCTION_OUTPUT')
 
-        if self.current_token[1] == 'έξοδος':
-            self.eat(token_value='έξοδος')
+        if self.current_kind == TokenKind.OUTPUT:
+            self.expect(TokenKind.OUTPUT)
             varlist_node = self.varlist()
             node.add_child(varlist_node)
 
         return node
 
     def sequence(self):
-        """sequence : statement (';' statement)*"""
+        """sequence : statement (';' statement)*, as a step (see run)"""
         node = ASTNode('SEQUENCE')
 
         # Parse first statement
-        statement_node = self.statement()
+        statement_node = yield self.recovering(self.statement, STATEMENT_SYNC)
         node.add_child(statement_node)
 
         # Parse remaining statements
-        while self.current_token[1] == ';':
-            self.eat(token_value=';')
-            # Check if we've reached the end of the sequence
-            if self.current_token[1] in ['τέλος_προγράμματος', 'τέλος_συνάρτησης', 'τέλος_διαδικασίας',
-                                         'αλλιώς', 'εάν_τέλος', 'όσο_τέλος', 'για_τέλος', 'μέχρι']:
+        while True:
+            if self.current_kind == TokenKind.SEMICOLON:
+                self.expect(TokenKind.SEMICOLON)
+                # Check if we've reached the end of the sequence
+                if self.current_kind in SEQUENCE_FOLLOW:
+                    break
+                statement_node = yield self.recovering(self.statement, STATEMENT_SYNC)
+            elif self.recover and self.current_kind not in SEQUENCE_END:
+                # A statement that is not followed by ';' or by the end of the sequence
+                statement_node = yield self.recovering(lambda: self.expect(TokenKind.SEMICOLON), STATEMENT_SYNC)
+            else:
                 break
-            statement_node = self.statement()
             node.add_child(statement_node)
 
         return node
@@ -346,37 +796,24 @@ class Syntax:
                  | input_stat
                  | print_stat
                  | call_stat
+
+        Return the node of the statement, or the step that parses it (see run).
         """
-        if self.current_token[0] == TokenType.IDENTIFIER:
-            return self.assignment_stat()
-        elif self.current_token[1] == 'εάν':
-            return self.if_stat()
-        elif self.current_token[1] == 'όσο':
-            return self.while_stat()
-        elif self.current_token[1] == 'επανάλαβε':
-            return self.do_stat()
-        elif self.current_token[1] == 'για':
-            return self.for_stat()
-        elif self.current_token[1] == 'διάβασε':
-            return self.input_stat()
-        elif self.current_token[1] == 'γράψε':
-            return self.print_stat()
-        elif self.current_token[1] == 'εκτέλεσε':
-            return self.call_stat()
-        else:
+        rule = self.statement_rules.get(self.current_kind)
+        if rule is None:
             self.error(f"Expected statement")
+        return rule()
 
     def assignment_stat(self):
         """assignment_stat : ID ':=' expression"""
         node = ASTNode('ASSIGNMENT')
 
         # Get identifier
-        id_token = self.eat(TokenType.IDENTIFIER)
-        id_node = ASTNode('IDENTIFIER', value=id_token[1], line=id_token[2])
+        id_node = self.identifier()
         node.add_child(id_node)
 
         # Eat ':=' token
-        self.eat(token_value=':=')
+        self.expect(TokenKind.ASSIGN)
 
         # Parse expression
         expr_node = self.expression()
@@ -389,27 +826,29 @@ class Syntax:
         node = ASTNode('IF_STATEMENT')
 
         # Eat εάν token
-        self.eat(token_value='εάν')
+        self.expect(TokenKind.IF)
+        self.open_blocks.append(TokenKind.END_IF)
 
         # Parse condition
         condition_node = self.condition()
         node.add_child(condition_node)
 
         # Eat τότε token
-        self.eat(token_value='τότε')
+        self.expect(TokenKind.THEN)
 
         # Parse then-sequence
-        then_node = self.sequence()
+        then_node = yield self.sequence()
         then_block = ASTNode('THEN_BLOCK')
         then_block.add_child(then_node)
         node.add_child(then_block)
 
         # Parse else-part
-        else_node = self.elsepart()
+        else_node = yield self.elsepart()
         node.add_child(else_node)
 
         # Eat εάν_τέλος token
-        self.eat(token_value='εάν_τέλος')
+        self.expect(TokenKind.END_IF)
+        self.open_blocks.pop()
 
         return node
 
@@ -417,9 +856,9 @@ class Syntax:
         """elsepart : 'αλλιώς' sequence | """
         node = ASTNode('ELSE_BLOCK')
 
-        if self.current_token[1] == 'αλλιώς':
-            self.eat(token_value='αλλιώς')
-            sequence_node = self.sequence()
+        if self.current_kind == TokenKind.ELSE:
+            self.expect(TokenKind.ELSE)
+            sequence_node = yield self.sequence()
             node.add_child(sequence_node)
 
         return node
@@ -429,21 +868,23 @@ class Syntax:
         node = ASTNode('WHILE_STATEMENT')
 
         # Eat όσο token
-        self.eat(token_value='όσο')
+        self.expect(TokenKind.WHILE)
+        self.open_blocks.append(TokenKind.END_WHILE)
 
         # Parse condition
         condition_node = self.condition()
         node.add_child(condition_node)
 
         # Eat επανάλαβε token
-        self.eat(token_value='επανάλαβε')
+        self.expect(TokenKind.REPEAT)
 
         # Parse sequence
-        sequence_node = self.sequence()
+        sequence_node = yield self.sequence()
         node.add_child(sequence_node)
 
         # Eat όσο_τέλος token
-        self.eat(token_value='όσο_τέλος')
+        self.expect(TokenKind.END_WHILE)
+        self.open_blocks.pop()
 
         return node
 
@@ -452,14 +893,16 @@ class Syntax:
         node = ASTNode('DO_WHILE_STATEMENT')
 
         # Eat επανάλαβε token
-        self.eat(token_value='επανάλαβε')
+        self.expect(TokenKind.REPEAT)
+        self.open_blocks.append(TokenKind.UNTIL)
 
         # Parse sequence
-        sequence_node = self.sequence()
+        sequence_node = yield self.sequence()
         node.add_child(sequence_node)
 
         # Eat μέχρι token
-        self.eat(token_value='μέχρι')
+        self.expect(TokenKind.UNTIL)
+        self.open_blocks.pop()
 
         # Parse condition
         condition_node = self.condition()
@@ -472,15 +915,15 @@ class Syntax:
         node = ASTNode('FOR_STATEMENT')
 
         # Eat για token
-        self.eat(token_value='για')
+        self.expect(TokenKind.FOR)
+        self.open_blocks.append(TokenKind.END_FOR)
 
         # Get counter variable (ID)
-        id_token = self.eat(TokenType.IDENTIFIER)
-        id_node = ASTNode('IDENTIFIER', value=id_token[1], line=id_token[2])
+        id_node = self.identifier()
         node.add_child(id_node)
 
         # Eat ':=' token
-        self.eat(token_value=':=')
+        self.expect(TokenKind.ASSIGN)
 
         # Parse start expression
         start_expr = self.expression()
@@ -489,7 +932,7 @@ class Syntax:
         node.add_child(start_node)
 
         # Eat έως token
-        self.eat(token_value='έως')
+        self.expect(TokenKind.TO)
 
         # Parse end expression
         end_expr = self.expression()
@@ -502,14 +945,15 @@ class Syntax:
         node.add_child(step_node)
 
         # Eat επανάλαβε token
-        self.eat(token_value='επανάλαβε')
+        self.expect(TokenKind.REPEAT)
 
         # Parse sequence
-        sequence_node = self.sequence()
+        sequence_node = yield self.sequence()
         node.add_child(sequence_node)
 
         # Eat για_τέλος token
-        self.eat(token_value='για_τέλος')
+        self.expect(TokenKind.END_FOR)
+        self.open_blocks.pop()
 
         return node
 
@@ -517,8 +961,8 @@ class Syntax:
         """step : 'με_βήμα' expression | """
         node = ASTNode('STEP')
 
-        if self.current_token[1] == 'με_βήμα':
-            self.eat(token_value='με_βήμα')
+        if self.current_kind == TokenKind.STEP:
+            self.expect(TokenKind.STEP)
             expr_node = self.expression()
             node.add_child(expr_node)
 
@@ -529,7 +973,7 @@ class Syntax:
         node = ASTNode('PRINT_STATEMENT')
 
         # Eat γράψε token
-        self.eat(token_value='γράψε')
+        self.expect(TokenKind.WRITE)
 
         # Parse expression
         expr_node = self.expression()
@@ -542,11 +986,10 @@ class Syntax:
         node = ASTNode('INPUT_STATEMENT')
 
         # Eat διάβασε token
-        self.eat(token_value='διάβασε')
+        self.expect(TokenKind.READ)
 
         # Get identifier
-        id_token = self.eat(TokenType.IDENTIFIER)
-        id_node = ASTNode('IDENTIFIER', value=id_token[1], line=id_token[2])
+        id_node = self.identifier()
         node.add_child(id_node)
 
         return node
@@ -556,11 +999,10 @@ class Syntax:
         node = ASTNode('CALL_STATEMENT')
 
         # Eat εκτέλεσε token
-        self.eat(token_value='εκτέλεσε')
+        self.expect(TokenKind.CALL)
 
         # Get procedure/function name (ID)
-        id_token = self.eat(TokenType.IDENTIFIER)
-        id_node = ASTNode('IDENTIFIER', value=id_token[1], line=id_token[2])
+        id_node = self.identifier()
         node.add_child(id_node)
 
         # Parse parameters (if any)
@@ -573,7 +1015,7 @@ class Syntax:
         """idtail : actualpars | """
         node = ASTNode('ID_TAIL')
 
-        if self.current_token[1] == '(':
+        if self.current_kind == TokenKind.LEFT_PARENTHESIS:
             actualpars_node = self.actualpars()
             node.add_child(actualpars_node)
 
@@ -584,14 +1026,14 @@ class Syntax:
         node = ASTNode('ACTUAL_PARAMETERS')
 
         # Eat '(' token
-        self.eat(token_value='(')
+        self.expect(TokenKind.LEFT_PARENTHESIS)
 
         # Parse parameter list
         actualparlist_node = self.actualparlist()
         node.add_child(actualparlist_node)
 
         # Eat ')' token
-        self.eat(token_value=')')
+        self.expect(TokenKind.RIGHT_PARENTHESIS)
 
         return node
 
@@ -599,14 +1041,14 @@ class Syntax:
         """actualparlist : actualparitem (',' actualparitem)* | """
         node = ASTNode('ACTUAL_PARAMETER_LIST')
 
-        if self.current_token[1] != ')':
+        if self.current_kind != TokenKind.RIGHT_PARENTHESIS:
             # Parse first parameter
             param_node = self.actualparitem()
             node.add_child(param_node)
 
             # Parse remaining parameters
-            while self.current_token[1] == ',':
-                self.eat(token_value=',')
+            while self.current_kind == TokenKind.COMMA:
+                self.expect(TokenKind.COMMA)
                 param_node = self.actualparitem()
                 node.add_child(param_node)
 
@@ -614,15 +1056,14 @@ class Syntax:
 
     def actualparitem(self):
         """actualparitem : expression | '%' ID"""
-        if self.current_token[1] == '%':
+        if self.current_kind == TokenKind.REFERENCE:
             node = ASTNode('REFERENCE_PARAMETER')
 
             # Eat '%' token
-            self.eat(token_value='%')
+            self.expect(TokenKind.REFERENCE)
 
             # Get identifier
-            id_token = self.eat(TokenType.IDENTIFIER)
-            id_node = ASTNode('IDENTIFIER', value=id_token[1], line=id_token[2])
+            id_node = self.identifier()
             node.add_child(id_node)
         else:
             node = ASTNode('VALUE_PARAMETER')
@@ -633,253 +1074,469 @@ class Syntax:
 
         return node
 
-    def condition(self):
-        """condition : boolterm ('ή' boolterm)*"""
-        node = ASTNode('CONDITION')
-
-        # Parse first boolean term
-        boolterm_node = self.boolterm()
-        node.add_child(boolterm_node)
-
-        # Parse remaining boolean terms (if any)
-        while self.current_token[1] == 'ή':
-            or_node = ASTNode('OR_OPERATOR', value='ή')
-
-            # Eat 'ή' token
-            self.eat(token_value='ή')
-
-            # Parse boolean term
-            boolterm_node = self.boolterm()
-
-            # Add both to or_node
-            or_node.add_child(node.children.pop())  # Remove last child from condition node
-            or_node.add_child(boolterm_node)
-
-            # Add or_node to condition node
-            node.add_child(or_node)
-
-        return node
-
-    def boolterm(self):
-        """boolterm : boolfactor ('και' boolfactor)*"""
-        node = ASTNode('BOOL_TERM')
-
-        # Parse first boolean factor
-        boolfactor_node = self.boolfactor()
-        node.add_child(boolfactor_node)
-
-        # Parse remaining boolean factors (if any)
-        while self.current_token[1] == 'και':
-            and_node = ASTNode('AND_OPERATOR', value='και')
-
-            # Eat 'και' token
-            self.eat(token_value='και')
-
-            # Parse boolean factor
-            boolfactor_node = self.boolfactor()
-
-            # Add both to and_node
-            and_node.add_child(node.children.pop())  # Remove last child from bool_term node
-            and_node.add_child(boolfactor_node)
+    def next_value_parameter(self, parameters, first):
+        """
+        Parse the items of an actual parameter list up to its next value parameter, for expression.
+        Return the VALUE_PARAMETER node, whose expression is still to be parsed, or None at the end of the list.
+        """
+        if first:
+            if self.current_kind == TokenKind.RIGHT_PARENTHESIS:
+                return None
+        elif self.current_kind == TokenKind.COMMA:
+            self.advance()
+        else:
+            return None
 
-            # Add and_node to bool_term node
-            node.add_child(and_node)
+        # Reference parameters do not contain expressions, so they are parsed right away
+        while self.current_kind == TokenKind.REFERENCE:
+            parameters.add_child(self.actualparitem())
+            if self.current_kind != TokenKind.COMMA:
+                return None
+            self.advance()
 
+        node = ASTNode('VALUE_PARAMETER')
+        parameters.add_child(node)
         return node
 
-    def boolfactor(self):
+    def condition(self):
         """
+        condition : boolterm ('ή' boolterm)*
+        boolterm : boolfactor ('και' boolfactor)*
         boolfactor : 'όχι' '[' condition ']'
                    | '[' condition ']'
                    | expression relational_oper expression
-        """
-        if self.current_token[1] == 'όχι':
-            node = ASTNode('NOT_FACTOR')
-
-            # Eat 'όχι' token
-            self.eat(token_value='όχι')
-
-            # Eat '[' token
-            self.eat(token_value='[')
-
-            # Parse condition
-            condition_node = self.condition()
-            node.add_child(condition_node)
 
-            # Eat ']' token
-            self.eat(token_value=']')
+        The brackets are kept on an explicit stack instead of recursing, so that the nesting
+        depth is not limited by the Python stack.
+        """
+        # The enclosing conditions, with the NOT_FACTOR or PARENTHESIZED_CONDITION node that waits for the inner one
+        stack = []
+        node = ASTNode('CONDITION')
+        # The left operands of the current 'ή' and 'και' chains
+        or_left = and_left = None
+
+        while True:
+            # 'όχι' is not a keyword, so it is lexed as an identifier and checked by value
+            if self.current_value == 'όχι':
+                self.advance()
+                self.expect(TokenKind.LEFT_BRACKET)
+                stack.append((node, or_left, and_left, ASTNode('NOT_FACTOR')))
+                node = ASTNode('CONDITION')
+                or_left = and_left = None
+                continue
+
+            if self.current_kind == TokenKind.LEFT_BRACKET:
+                self.advance()
+                stack.append((node, or_left, and_left, ASTNode('PARENTHESIZED_CONDITION')))
+                node = ASTNode('CONDITION')
+                or_left = and_left = None
+                continue
+
+            factor = ASTNode('COMPARISON', [self.expression(), self.relational_oper(), self.expression()])
+
+            # Fold the finished boolfactor into the chains, closing every bracket that it completes
+            while True:
+                if and_left is None:
+                    and_left = factor
+                else:
+                    and_left = ASTNode('AND_OPERATOR', [and_left, factor], value='και')
+                if self.current_kind == TokenKind.AND:
+                    self.advance()
+                    break
+
+                term = ASTNode('BOOL_TERM', [and_left])
+                and_left = None
+                if or_left is None:
+                    or_left = term
+                else:
+                    or_left = ASTNode('OR_OPERATOR', [or_left, term], value='ή')
+                if self.current_kind == TokenKind.OR:
+                    self.advance()
+                    break
+
+                node.add_child(or_left)
+                if not stack:
+                    return node
+                inner = node
+                node, or_left, and_left, factor = stack.pop()
+                factor.add_child(inner)
+                self.expect(TokenKind.RIGHT_BRACKET)
 
-        elif self.current_token[1] == '[':
-            node = ASTNode('PARENTHESIZED_CONDITION')
+    def expression(self):
+        """
+        expression : optional_sign term (add_oper term)*
+        term : factor (mul_oper factor)*
+        optional_sign : add_oper |
+        factor : INTEGER
+               | '(' expression ')'
+               | ID idtail
 
-            # Eat '[' token
-            self.eat(token_value='[')
+        The parentheses and the actual parameter lists of function calls are kept on an explicit
+        stack instead of recursing, and each operator is folded into a BINARY_OPERATION node in place.
+        """
+        # The enclosing expressions, each with the PARENTHESIZED_EXPRESSION node or the IDENTIFIER
+        # node of the call that waits for the inner one, and the ACTUAL_PARAMETER_LIST of the call
+        stack = []
+        start = True
+
+        while True:
+            if start:
+                start = False
+                node = ASTNode('EXPRESSION')
+                if self.current_kind in ADD_OPERATORS:
+                    sign = ASTNode('ADD_OPERATOR', value=self.current_value, line=self.current_line)
+                    node.add_child(ASTNode('OPTIONAL_SIGN', [sign]))
+                    self.advance()
+                # The left operands of the current sum and product, and their pending operators
+                add_left = add_operator = mul_left = mul_operator = None
+
+            kind = self.current_kind
+            if kind == TokenKind.NUMBER:
+                factor = ASTNode('NUMBER', value=self.current_value, line=self.current_line)
+                self.advance()
+
+            elif kind == TokenKind.LEFT_PARENTHESIS:
+                self.advance()
+                stack.append((node, add_left, add_operator, mul_left, mul_operator,
+                              ASTNode('PARENTHESIZED_EXPRESSION'), None))
+                start = True
+                continue
+
+            elif kind == TokenKind.IDENTIFIER:
+                factor = ASTNode('IDENTIFIER', [self.identifier()])
+                # Parse id tail (function call parameters, if any)
+                if self.current_kind == TokenKind.LEFT_PARENTHESIS:
+                    parameters = ASTNode('ACTUAL_PARAMETER_LIST')
+                    factor.add_child(ASTNode('ID_TAIL', [ASTNode('ACTUAL_PARAMETERS', [parameters])]))
+                    self.advance()
+                    if self.next_value_parameter(parameters, first=True):
+                        stack.append((node, add_left, add_operator, mul_left, mul_operator, factor, parameters))
+                        start = True
+                        continue
+                    self.expect(TokenKind.RIGHT_PARENTHESIS)
 
-            # Parse condition
-            condition_node = self.condition()
-            node.add_child(condition_node)
+            else:
+                self.error(f"Expected factor, got {self.current_value}")
+
+            # Fold the finished factor into the product and the sum, closing every parenthesis
+            # and parameter list that it completes
+            while True:
+                if mul_operator is None:
+                    mul_left = factor
+                else:
+                    mul_left = ASTNode('BINARY_OPERATION', [mul_left, factor], value=mul_operator)
+                if self.current_kind in MUL_OPERATORS:
+                    mul_operator = self.current_value
+                    self.advance()
+                    break
+
+                term = ASTNode('TERM', [mul_left])
+                mul_left = mul_operator = None
+                if add_operator is None:
+                    add_left = term
+                else:
+                    add_left = ASTNode('BINARY_OPERATION', [add_left, term], value=add_operator)
+                if self.current_kind in ADD_OPERATORS:
+                    add_operator = self.current_value
+                    self.advance()
+                    break
+
+                node.add_child(add_left)
+                if not stack:
+                    return node
+                inner = node
+                node, add_left, add_operator, mul_left, mul_operator, factor, parameters = stack.pop()
+                if parameters is None:
+                    factor.add_child(inner)
+                else:
+                    parameters.children[-1].add_child(inner)
+                    if self.next_value_parameter(parameters, first=False):
+                        stack.append((node, add_left, add_operator, mul_left, mul_operator, factor, parameters))
+                        start = True
+                        break
+                self.expect(TokenKind.RIGHT_PARENTHESIS)
 
-            # Eat ']' token
-            self.eat(token_value=']')
+    def relational_oper(self):
+        """relational_oper : '=' | '<=' | '>=' | '<>' | '<' | '>'"""
+        node = ASTNode('RELATIONAL_OPERATOR')
 
+        if self.current_kind in RELATIONAL_OPERATOR_KINDS:
+            node.value = self.current_value
+            node.line = self.current_line
+            self.advance()
         else:
-            node = ASTNode('COMPARISON')
-
-            # Parse left expression
-            left_expr = self.expression()
-            node.add_child(left_expr)
-
-            # Parse relational operator
-            op_token = self.current_token
-            op_node = self.relational_oper()
-            node.add_child(op_node)
-
-            # Parse right expression
-            right_expr = self.expression()
-            node.add_child(right_expr)
+            self.error("Expected relational operator")
 
         return node
 
-    def expression(self):
-        """expression : optional_sign term (add_oper term)*"""
-        node = ASTNode('EXPRESSION')
-
-        # Parse optional sign
-        sign_node = self.optional_sign()
-        if sign_node.children:  # If there's a sign
-            node.add_child(sign_node)
-
-        # Parse first term
-        term_node = self.term()
-        node.add_child(term_node)
 
-        # Parse remaining terms (if any)
-        while self.current_token[1] in ['+', '-']:
-            op_token = self.current_token
-            op_node = self.add_oper()
-
-            # Parse term
-            term_node = self.term()
+class StreamingSyntax(Syntax):
+    """
+    Syntax analyzer that pulls its tokens from an iterator, such as Lexer.iter_tokens(),
+    through a TokenRing. Parsing starts before lexing finishes and the tokens that were
+    already parsed are dropped.
+    """
+
+    def __init__(self, tokens, lookahead=1, recover=False):
+        trivia = {}
+        super().__init__(TokenRing(split_trivia(tokens, trivia), lookahead + 1), trivia, recover)
+
+    def token_kinds(self, tokens):
+        # The tokens are not there yet, so load finds the kind of each one as it arrives
+        return None
+
+    def load(self, index):
+        token = self.tokens.get(index)
+        if token is None:
+            return False
+        self.current_type, self.current_value, self.current_line = token
+        self.current_kind = token_kind(self.current_type, self.current_value)
+        return True
+
+
+def changed_range(old, new):
+    """
+    Compare two token lists and return (start, old_end, new_end): the tokens before `start` are equal,
+    and old[old_end:] equals new[new_end:] apart from their line, which differs by the same amount for all.
+    """
+    # Find the common prefix by comparing slices, which is much faster than comparing token by token
+    start, high = 0, min(len(old), len(new))
+    while start < high:
+        middle = (start + high + 1) // 2
+        if old[start:middle] == new[start:middle]:
+            start = middle
+        else:
+            high = middle - 1
+    old_end, new_end = len(old), len(new)
+    line_delta = new[-1][2] - old[-1][2] if old and new else 0
+    if not line_delta:
+        # The same for the common suffix, when the lines after the edit did not move
+        length, high = 0, min(old_end, new_end) - start
+        while length < high:
+            middle = (length + high + 1) // 2
+            if old[old_end - middle:old_end - length] == new[new_end - middle:new_end - length]:
+                length = middle
+            else:
+                high = middle - 1
+        return start, old_end - length, new_end - length
+    while old_end > start and new_end > start:
+        old_type, old_value, old_line = old[old_end - 1]
+        new_type, new_value, new_line = new[new_end - 1]
+        if old_type != new_type or old_value != new_value or new_line - old_line != line_delta:
+            break
+        old_end -= 1
+        new_end -= 1
+    return start, old_end, new_end
+
+
+def first_line(node):
+    """Return the line of the first node of the subtree, in pre-order, that has one."""
+    return next((child.line for child in node.walk() if child.line is not None), None)
+
+
+def shift_lines(node, delta):
+    """Add delta to the line of every node of the subtree that has one."""
+    stack = [node]
+    pop, extend = stack.pop, stack.extend
+    while stack:
+        node = pop()
+        if node.line is not None:
+            node.line += delta
+        if node.children:
+            extend(node.children)
+
+
+class IncrementalSyntax(Syntax):
+    """
+    Syntax analyzer that can parse an edited version of its tokens again (see reparse), reusing the
+    nodes of the statements and subprograms that the edit did not touch.
+
+    Each statement and subprogram is remembered by the index of its first token, with the number of
+    tokens it spans. A rule only looks at the tokens from where it starts up to the token after its
+    span, so its node can be reused as long as none of these tokens changed.
+    """
 
-            # Create binary operation node
-            bin_op = ASTNode('BINARY_OPERATION', value=op_token[1])
-            bin_op.add_child(node.children.pop())  # Remove last child from expression node
-            bin_op.add_child(term_node)
+    def __init__(self, tokens):
+        super().__init__(tokens)
+        # Start index -> (rule, token count, node, line of the node's first line minus the start line)
+        self.spans = {}
+        self.reused = 0  # Number of nodes reused by the last parse
 
-            # Add binary operation to expression node
-            node.add_child(bin_op)
+    def reparse(self, tokens):
+        """
+        Parse the tokens of the edited program and return its AST. Only the statements and subprograms
+        that contain the changed tokens are parsed again; the others keep their nodes, with their lines
+        moved if the edit added or removed lines before them. The reused nodes are shared with the
+        previous AST.
+        """
+        trivia = {}
+        tokens = list(split_trivia(tokens, trivia))
+        start, old_end, new_end = changed_range(self.tokens, tokens)
+        shift = new_end - old_end
+        self.spans = {
+            index if index < start else index + shift: span
+            for index, span in self.spans.items()
+            if index + span[1] < start or index >= old_end
+        }
+        self.tokens = tokens
+        self.kinds = self.token_kinds(tokens)
+        self.trivia = trivia
+        self.current_token_index = 0
+        self.load(0)
+        self.errors = []
+        self.ast = None
+        self.open_blocks = []
+        self.reused = 0
+        return self.parse()
 
+    def reuse(self, rule, parse):
+        """
+        Step (see run) that returns the node of `rule` at the current token, reusing the remembered one if
+        there is one, or else the node of `parse`, which can be a step itself.
+        """
+        start = self.current_token_index
+        span = self.spans.get(start)
+        if span is not None and span[0] == rule:
+            _, length, node, line_offset = span
+            if line_offset is not None:
+                delta = self.current_line + line_offset - first_line(node)
+                if delta:
+                    shift_lines(node, delta)
+            self.current_token_index += length
+            self.load(self.current_token_index)
+            self.reused += 1
+            return node
+        line = self.current_line
+        node = yield parse()
+        node_line = first_line(node)
+        self.spans[start] = (rule, self.current_token_index - start, node,
+                             None if node_line is None else node_line - line)
         return node
 
-    def term(self):
-        """term : factor (mul_oper factor)*"""
-        node = ASTNode('TERM')
-
-        # Parse first factor
-        factor_node = self.factor()
-        node.add_child(factor_node)
-
-        # Parse remaining factors (if any)
-        while self.current_token[1] in ['*', '/']:
-            op_token = self.current_token
-            op_node = self.mul_oper()
-
-            # Parse factor
-            factor_node = self.factor()
-
-            # Create binary operation node
-            bin_op = ASTNode('BINARY_OPERATION', value=op_token[1])
-            bin_op.add_child(node.children.pop())  # Remove last child from term node
-            bin_op.add_child(factor_node)
-
-            # Add binary operation to term node
-            node.add_child(bin_op)
-        return node
+    def statement(self):
+        return self.reuse('statement', super().statement)
 
-    def optional_sign(self):
-        """optional_sign : add_oper | """
-        node = ASTNode('OPTIONAL_SIGN')
+    def func(self):
+        return self.run(self.reuse('func', super().func))
 
-        if self.current_token[1] in ['+', '-']:
-            sign_node = self.add_oper()
-            node.add_child(sign_node)
+    def proc(self):
+        return self.run(self.reuse('proc', super().proc))
 
-        return node
 
-    def mul_oper(self):
-        """mul_oper : '*' | '/'"""
-        node = ASTNode('MUL_OPERATOR')
+# Token kinds that open and close a subprogram, for the boundary scan of ParallelSyntax
+SUBPROGRAM_OPENS = {TokenKind.FUNCTION, TokenKind.PROCEDURE}
+SUBPROGRAM_CLOSES = {TokenKind.END_FUNCTION, TokenKind.END_PROCEDURE}
+SUBPROGRAM_MARKERS = {KIND_VALUES[kind] for kind in SUBPROGRAM_OPENS | SUBPROGRAM_CLOSES}
 
-        if self.current_token[1] in ['*', '/']:
-            token = self.eat(TokenType.OPERATOR)
-            node.value = token[1]
-            node.line = token[2]
-        else:
-            self.error("Expected '*' or '/'")
 
-        return node
+def _flatten(node):
+    """Return the subtree as a list of (type, value, line, child count) records in pre-order."""
+    return [(child.type, child.value, child.line, len(child.children)) for child in node.walk()]
 
-    def add_oper(self):
-        """add_oper : '+' | '-'"""
-        node = ASTNode('ADD_OPERATOR')
 
-        if self.current_token[1] in ['+', '-']:
-            token = self.eat(TokenType.OPERATOR)
-            node.value = token[1]
-            node.line = token[2]
+def _unflatten(records):
+    """Rebuild the subtree from the records of _flatten, without recursing."""
+    root = None
+    stack = []  # [node, number of children still to add] of the nodes whose children are being added
+    for node_type, value, line, child_count in records:
+        node = ASTNode(node_type, value=value, line=line)
+        if stack:
+            parent = stack[-1]
+            parent[0].add_child(node)
+            parent[1] -= 1
+            if not parent[1]:
+                stack.pop()
         else:
-            self.error("Expected '+' or '-'")
+            root = node
+        if child_count:
+            stack.append([node, child_count])
+    return root
 
-        return node
 
-    def relational_oper(self):
-        """relational_oper : '=' | '<=' | '>=' | '<>' | '<' | '>'"""
-        node = ASTNode('RELATIONAL_OPERATOR')
+class _QuietSyntax(Syntax):
+    """Syntax analyzer for the workers of ParallelSyntax, which raises its errors without printing them."""
 
-        if self.current_token[0] == TokenType.RELATIONAL_OPERATOR:
-            token = self.eat(TokenType.RELATIONAL_OPERATOR)
-            node.value = token[1]
-            node.line = token[2]
+    def error(self, message):
+        raise SyntaxError(message)
+
+
+def _parse_subprogram(tokens):
+    """
+    Parse the tokens of one subprogram, followed by the token after it, in a worker process.
+    Return the flattened node, or None if the tokens are not exactly one valid subprogram.
+    """
+    syntax = _QuietSyntax(tokens, {})
+    try:
+        node = syntax.subprogram_rules[syntax.current_kind]()
+    except SyntaxError:
+        return None
+    if syntax.current_token_index != len(tokens) - 1:
+        return None
+    return _flatten(node)
+
+
+class ParallelSyntax(Syntax):
+    """
+    Syntax analyzer that parses the top-level subprograms in a process pool. A scan of the subprogram
+    keywords splits them into token ranges, and each range is parsed by a worker. The AST and the
+    errors are the same as Syntax's.
+    """
+    min_tokens = 1 << 15  # Subprogram sections with fewer tokens are parsed in this process
+
+    def __init__(self, tokens, trivia=None, recover=False, workers=None):
+        super().__init__(tokens, trivia, recover)
+        self.workers = workers or cpu_count() or 1
+
+    def subprogram_ranges(self):
+        """Return the (start, end) token ranges of the top-level subprograms from the current token on."""
+        tokens = self.tokens
+        if isinstance(tokens, TokenStream):
+            markers = [(index, kind) for index, kind in enumerate(tokens.kinds)
+                       if kind in SUBPROGRAM_OPENS or kind in SUBPROGRAM_CLOSES]
         else:
-            self.error("Expected relational operator")
-
-        return node
-
-    def factor(self):
-        """
-        factor : INTEGER
-               | '(' expression ')'
-               | ID idtail
-        """
-        if self.current_token[0] == TokenType.NUMBER:
-            node = ASTNode('NUMBER')
-
-            # Get number
-            num_token = self.eat(TokenType.NUMBER)
-            node.value = num_token[1]
-            node.line = num_token[2]
+            markers = [(index, VALUE_KINDS[value]) for index, (_, value, _) in enumerate(tokens)
+                       if value in SUBPROGRAM_MARKERS]
+        ranges = []
+        start = self.current_token_index
+        depth = 0
+        for index, kind in markers[bisect_left(markers, (start,)):]:
+            if kind in SUBPROGRAM_OPENS:
+                if not depth and index != start:
+                    # Not right after the previous subprogram, so it is not in the subprograms section
+                    break
+                depth += 1
+            else:
+                depth -= 1
+                if depth < 0:
+                    break
+                if not depth:
+                    ranges.append((start, index + 1))
+                    start = index + 1
+        return ranges
 
-        elif self.current_token[1] == '(':
-            node = ASTNode('PARENTHESIZED_EXPRESSION')
+    def subprograms(self):
+        if self.open_blocks or self.workers < 2:
+            return super().subprograms()
+        ranges = self.subprogram_ranges()
+        if not ranges or ranges[-1][1] - ranges[0][0] < self.min_tokens:
+            return super().subprograms()
 
-            # Eat '(' token
-            self.eat(token_value='(')
-            # Parse expression
-            expr_node = self.expression()
-            node.add_child(expr_node)
-            # Eat ')' token
-            self.eat(token_value=')')
-        elif self.current_token[0] == TokenType.IDENTIFIER:
-            node = ASTNode('IDENTIFIER')
-            # Get identifier
-            id_token = self.eat(TokenType.IDENTIFIER)
-            id_node = ASTNode('IDENTIFIER', value=id_token[1], line=id_token[2])
-            node.add_child(id_node)
-            # Parse id tail (function/procedure call parameters, if any)
-            idtail_node = self.idtail()
-            if idtail_node.children:  # If there are parameters
-                node.add_child(idtail_node)
+        node = ASTNode('SUBPROGRAMS')
+        tokens = self.tokens
+        if isinstance(tokens, TokenStream):
+            slices = ([tokens[index] for index in range(start, end + 1)] for start, end in ranges)
         else:
-            self.error(f"Expected factor, got {self.current_token[1]}")
+            slices = (tokens[start:end + 1] for start, end in ranges)
+        with ProcessPoolExecutor(min(self.workers, len(ranges))) as pool:
+            chunksize = max(1, len(ranges) // (self.workers * 4))
+            for (_, end), records in zip(ranges, pool.map(_parse_subprogram, slices, chunksize=chunksize)):
+                if records is None:
+                    break
+                node.add_child(_unflatten(records))
+                self.current_token_index = end
+        self.load(self.current_token_index)
+        # The subprograms from the first one that a worker could not parse on are parsed here, the way
+        # Syntax does, so that the errors, and the recovery from them, are the same
+        for child in super().subprograms().children:
+            node.add_child(child)
         return node
-
@@ -1,16 +1,25 @@
 import sys
 import os
+import tempfile
 # Add the src directory to the Python path
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
 
 import unittest
 from src.intermediate import IntermediateCodeGenerator
 from src.compiler import get_intermediate_code
-from src.symboltable import build_symbol_table
+from src.final import generate_risc_v_code
+from src.symboltable import build_symbol_table, resolve_names, Resolution
+from src.intermediate import generate_intermediate_code, translate
+from src.lexer import Lexer, RegexLexer, TokenStream
+from src.syntaxAST import SharedNode, Syntax
 
 class TestIntermediateCodeGenerator(unittest.TestCase):
     def setUp(self):
         self.code_gen = IntermediateCodeGenerator()
+        # The .int files go to a temporary directory, not to the working directory
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.int_file = os.path.join(directory.name, "test_program.int")
 
     def test_gen_quad(self):
         self.code_gen.gen_quad('ADD', 'x', 'y', 'z')
@@ -72,10 +81,10 @@ class TestIntermediateCodeGenerator(unittest.TestCase):
             ]
         }
         symbol_table = build_symbol_table(ast)
-        quads = get_intermediate_code(ast, "test_program.int", symbol_table, True)
+        quads = get_intermediate_code(ast, self.int_file, symbol_table, True)
         expected_quads = [
-            (0, 'begin_block', 'test_program', '_', '_'),
-            (1, 'begin_block', 'increase', '_', '_'),
+            (0, 'begin_block', 'test_program', 0, '_'),
+            (1, 'begin_block', 'increase', 1, '_'),
             (2, ':=', '1', '_', 'b'),
             (3, 'end_block', 'increase', '_', '_'),
             (4, 'halt', '_', '_', '_'),
@@ -84,6 +93,12 @@ class TestIntermediateCodeGenerator(unittest.TestCase):
         self.assertEqual(quads, expected_quads)
 
 class TestIntermediateCodeGeneration(unittest.TestCase):
+    def setUp(self):
+        # The .int files go to a temporary directory, not to the working directory
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.int_file = os.path.join(directory.name, "test_program.int")
+
     def test_generate_intermediate_code(self):
         ast = {
             'type': 'PROGRAM',
@@ -104,9 +119,9 @@ class TestIntermediateCodeGeneration(unittest.TestCase):
             ]
         }
         symbol_table = build_symbol_table(ast)
-        quads = get_intermediate_code(ast, "test_program.int", symbol_table, True)
+        quads = get_intermediate_code(ast, self.int_file, symbol_table, True)
         expected_quads = [
-            (0, 'begin_block', 'test_program', '_', '_'),
+            (0, 'begin_block', 'test_program', 0, '_'),
             (1, ':=', '5', '_', 'a'),
             (2, 'halt', '_', '_', '_'),
             (3, 'end_block', 'test_program', '_', '_')
@@ -147,13 +162,227 @@ class TestIntermediateCodeGeneration(unittest.TestCase):
             ]
         }
         symbol_table = build_symbol_table(ast)
-        quads = get_intermediate_code(ast, "test_program.int", symbol_table, True)
+        quads = get_intermediate_code(ast, self.int_file, symbol_table, True)
         expected_quads = [
-            (0, 'begin_block', 'test_program', '_', '_'),
-            (1, 'begin_block', 'increase', '_', '_'),
+            (0, 'begin_block', 'test_program', 0, '_'),
+            (1, 'begin_block', 'increase', 1, '_'),
             (2, ':=', '1', '_', 'b'),
             (3, 'end_block', 'increase', '_', '_'),
             (4, 'halt', '_', '_', '_'),
             (5, 'end_block', 'test_program', '_', '_')
         ]
         self.assertEqual(quads, expected_quads)
+
+    def test_ast_nodes_and_dicts_give_the_same_code(self):
+        ast = Syntax(Lexer("./tests/syntax_inputs/correct.gr").tokenize()).parse()
+        node_table = build_symbol_table(ast)
+        dict_table = build_symbol_table(ast.to_dict())
+        self.assertEqual(str(node_table), str(dict_table))
+        self.assertEqual(generate_intermediate_code(ast, node_table).quads,
+                         generate_intermediate_code(ast.to_dict(), dict_table).quads)
+
+    def test_shared_nodes_give_the_same_code(self):
+        for file in ["./tests/syntax_inputs/correct.gr", "./tests/syntax_inputs/correct_large.gr"]:
+            with self.subTest(file=file):
+                tokens = Lexer(file).tokenize()
+                ast = Syntax(tokens).parse()
+                shared = Syntax(tokens, share_nodes=True).parse()
+                symbol_table = build_symbol_table(ast)
+                shared_table = build_symbol_table(shared)
+                self.assertEqual(str(shared_table), str(symbol_table))
+                self.assertEqual(generate_intermediate_code(shared, shared_table).quads,
+                                 generate_intermediate_code(ast, symbol_table).quads)
+
+    def test_symbol_table_debug_messages_follow_the_logging_level(self):
+        ast = Syntax(Lexer("./tests/syntax_inputs/correct.gr").tokenize()).parse()
+        with self.assertLogs("Symbol Table Logger", "DEBUG") as logs:
+            symbol_table = build_symbol_table(ast)
+            symbol_table.lookup("α")
+        self.assertIn("DEBUG:Symbol Table Logger:Entered scope: αύξηση (level 1)", logs.output)
+        self.assertEqual(logs.output[-1], "DEBUG:Symbol Table Logger:Found 'α' in scope 'global'")
+
+        class Name(str):
+            """A name that counts how many times it is formatted into a message."""
+            formatted = 0
+
+            def __str__(self):
+                Name.formatted += 1
+                return str.__str__(self)
+
+            def __format__(self, spec):
+                Name.formatted += 1
+                return str.__format__(self, spec)
+
+        with self.assertLogs("Symbol Table Logger", "DEBUG"):
+            build_symbol_table(ast).lookup(Name("α"))
+        self.assertGreater(Name.formatted, 0)
+        # Without debug messages, the lookups make no records and format no messages
+        Name.formatted = 0
+        with self.assertLogs("Symbol Table Logger", "INFO") as logs:
+            symbol_table = build_symbol_table(ast)
+            self.assertIsNotNone(symbol_table.lookup(Name("α")))
+            self.assertIsNone(symbol_table.lookup(Name("ω")))
+        self.assertFalse([line for line in logs.output if line.startswith("DEBUG")])
+        self.assertEqual(Name.formatted, 0)
+
+    def test_one_pass_gives_the_same_code(self):
+        for file in ["./tests/syntax_inputs/correct.gr", "./tests/syntax_inputs/correct_large.gr"]:
+            tokens = Lexer(file).tokenize()
+            ast = Syntax(tokens).parse()
+            symbol_table = build_symbol_table(ast)
+            quads = generate_intermediate_code(ast, symbol_table).quads
+            for name, one_pass_tokens in [('list', tokens), ('stream', TokenStream.from_tokens(tokens))]:
+                with self.subTest(file=file, tokens=name):
+                    code_gen, one_pass_table, one_pass_resolution = translate(one_pass_tokens)
+                    self.assertEqual(code_gen.quads, quads)
+                    self.assertEqual(str(one_pass_table), str(symbol_table))
+                    self.assertEqual(one_pass_resolution.blocks, resolve_names(ast, symbol_table).blocks)
+
+    def test_one_pass_raises_syntax_errors(self):
+        tokens = RegexLexer(source="πρόγραμμα p αρχή_προγράμματος x := τέλος_προγράμματος").tokenize()
+        with self.assertRaises(SyntaxError):
+            translate(tokens)
+
+    def test_names_are_resolved_with_depth_and_offset(self):
+        source = ("πρόγραμμα p δήλωση x, y "
+                  "συνάρτηση f(a) διαπροσωπεία είσοδος a δήλωση z "
+                  "διαδικασία g() διαπροσωπεία αρχή_διαδικασίας z := a + x τέλος_διαδικασίας "
+                  "αρχή_συνάρτησης z := a; εκτέλεσε g; f := z τέλος_συνάρτησης "
+                  "αρχή_προγράμματος x := f(y) τέλος_προγράμματος")
+        tokens = RegexLexer(source=source).tokenize()
+        ast = Syntax(tokens).parse()
+        symbol_table = build_symbol_table(ast)
+        resolution = resolve_names(ast, symbol_table)
+        self.assertEqual([scope.name for scope in symbol_table.all_scopes], ['global', 'f', 'g'])
+        self.assertEqual(resolution.blocks[2], {
+            'z': Resolution(1, 1, 16, 'nonlocal'),
+            'a': Resolution(1, 1, 12, 'nonlocal_parameter'),
+            'x': Resolution(2, 0, 12, 'global'),
+        })
+        self.assertEqual(resolution.blocks[1], {
+            'z': Resolution(0, 1, 16, 'local'),
+            'a': Resolution(0, 1, 12, 'parameter'),
+            'g': Resolution(0, 1, 0, 'procedure'),
+            'f': Resolution(1, 0, 0, 'function'),
+        })
+        self.assertEqual(resolution.blocks[0]['y'], Resolution(0, 0, 16, 'local'))
+        # Every use in the statements is annotated, and the declarations are not
+        self.assertEqual(sorted(node.value for _, node in resolution.uses),
+                         ['a', 'a', 'f', 'f', 'g', 'x', 'x', 'y', 'z', 'z', 'z'])
+        self.assertEqual(translate(tokens)[2].blocks, resolution.blocks)
+
+        # The code of g reaches its non-local variables through the access links
+        quads = [(0, 'begin_block', 'g', 2, '_'), (1, '+', 'a', 'x', 'T_0'), (2, ':=', 'T_0', '_', 'z'),
+                 (3, 'end_block', 'g', '_', '_')]
+        code = generate_risc_v_code(quads, symbol_table, resolution)
+        self.assertIn('lw t0,-4(sp)\naddi t0,t0,-12\nlw t0,(t0)\nlw t1,-12(gp)\n', code)
+        self.assertIn('lw t3,-4(sp)\naddi t3,t3,-16\nsw t0,(t3)\n', code)
+
+    def test_subprograms_of_the_same_name_keep_their_own_names(self):
+        # The nested φ comes first, and the block of the top-level φ must not get its names
+        source = ("πρόγραμμα p δήλωση x "
+                  "συνάρτηση ζ(α) διαπροσωπεία "
+                  "διαδικασία φ(μ) διαπροσωπεία αρχή_διαδικασίας μ := α τέλος_διαδικασίας "
+                  "αρχή_συνάρτησης ζ := α τέλος_συνάρτησης "
+                  "διαδικασία φ(ν) διαπροσωπεία αρχή_διαδικασίας ν := ν + 1 τέλος_διαδικασίας "
+                  "αρχή_προγράμματος εκτέλεσε φ(x) τέλος_προγράμματος")
+        tokens = RegexLexer(source=source).tokenize()
+        ast = Syntax(tokens).parse()
+        symbol_table = build_symbol_table(ast)
+        resolution = resolve_names(ast, symbol_table)
+        self.assertEqual([scope.name for scope in symbol_table.all_scopes], ['global', 'ζ', 'φ', 'φ'])
+        self.assertEqual(resolution.blocks[2], {'μ': Resolution(0, 2, 12, 'parameter'),
+                                                'α': Resolution(1, 1, 12, 'nonlocal_parameter')})
+        self.assertEqual(resolution.blocks[3], {'ν': Resolution(0, 3, 12, 'parameter')})
+        quads = generate_intermediate_code(ast, symbol_table).quads
+        self.assertEqual([quad[2:4] for quad in quads if quad[1] == 'begin_block'], [('p', 0), ('ζ', 1), ('φ', 3)])
+        code_gen, _, one_pass_resolution = translate(tokens)
+        self.assertEqual(code_gen.quads, quads)
+        self.assertEqual(one_pass_resolution.blocks, resolution.blocks)
+
+        code = generate_risc_v_code(quads, symbol_table, resolution)
+        self.assertNotIn('# Warning: Variable', code)
+        self.assertIn('φ:\nsw ra,(sp)\naddi fp,sp,64\nL5:\nlw t0,-12(sp)\n', code)
+        # Quads that do not say the scope of their blocks cannot be given their names
+        with self.assertRaises(ValueError):
+            generate_risc_v_code([(0, 'begin_block', 'φ', '_', '_')], symbol_table, resolution)
+
+    def test_shared_nodes_are_resolved_in_each_block(self):
+        source = ("πρόγραμμα p δήλωση x, y "
+                  "διαδικασία f() διαπροσωπεία δήλωση x αρχή_διαδικασίας x := y τέλος_διαδικασίας "
+                  "αρχή_προγράμματος x := y τέλος_προγράμματος")
+        ast = Syntax(RegexLexer(source=source).tokenize(), share_nodes=True).parse()
+        symbol_table = build_symbol_table(ast)
+        resolution = resolve_names(ast, symbol_table)
+        x = next(node for node in ast.walk() if node.type == 'IDENTIFIER' and node.value == 'x'
+                 and (1, node) in resolution.uses)
+        self.assertIsInstance(x, SharedNode)
+        self.assertEqual(resolution.uses[1, x], Resolution(0, 1, 12, 'local'))
+        self.assertEqual(resolution.uses[0, x], Resolution(0, 0, 12, 'local'))
+
+    def test_undeclared_names_are_warned_with_their_line_when_known(self):
+        source = "πρόγραμμα p δήλωση x αρχή_προγράμματος x := z τέλος_προγράμματος"
+        for share_nodes, warning in [(False, "'z' is not declared (line 1)"), (True, "'z' is not declared")]:
+            with self.subTest(share_nodes=share_nodes):
+                ast = Syntax(RegexLexer(source=source).tokenize(), share_nodes=share_nodes).parse()
+                symbol_table = build_symbol_table(ast)
+                with self.assertLogs("Symbol Table Logger", "WARNING") as logs:
+                    resolve_names(ast, symbol_table)
+                self.assertEqual(logs.output, [f"WARNING:Symbol Table Logger:{warning}"])
+
+    def test_frozen_table_looks_up_from_any_scope(self):
+        source = ("πρόγραμμα p δήλωση x, y "
+                  "διαδικασία f() διαπροσωπεία δήλωση x "
+                  "διαδικασία g() διαπροσωπεία δήλωση y αρχή_διαδικασίας x := y τέλος_διαδικασίας "
+                  "αρχή_διαδικασίας x := 1 τέλος_διαδικασίας "
+                  "διαδικασία h() διαπροσωπεία αρχή_διαδικασίας x := y τέλος_διαδικασίας "
+                  "αρχή_προγράμματος x := 1 τέλος_προγράμματος")
+        symbol_table = build_symbol_table(Syntax(RegexLexer(source=source).tokenize()).parse())
+        # The sibling scopes are all kept, in pre-order, and the table is back at the global scope
+        self.assertEqual([scope.name for scope in symbol_table.all_scopes], ['global', 'f', 'g', 'h'])
+        self.assertEqual(symbol_table.scopes, symbol_table.all_scopes[:1])
+        self.assertIn("Scope: h (level 1)", str(symbol_table))
+
+        frozen = symbol_table.freeze()
+        self.assertEqual([frozen.interval(scope_id) for scope_id in range(4)], [(0, 4), (1, 3), (2, 3), (3, 4)])
+        global_scope, f, g, h = symbol_table.all_scopes
+        self.assertIs(frozen.lookup('x', 2), f.entities['x'])
+        self.assertIs(frozen.lookup('y', 2), g.entities['y'])
+        self.assertIs(frozen.lookup('y', 1), global_scope.entities['y'])
+        self.assertIs(frozen.lookup('x', 3), global_scope.entities['x'])
+        self.assertEqual(frozen.find('g', 2), (1, f.entities['g']))
+        self.assertIsNone(frozen.lookup('g', 3))
+        self.assertIsNone(frozen.lookup('z', 0))
+
+    def test_deep_nesting_gives_code(self):
+        depth = 20000
+        condition = '[' * depth + 'x < 1' + ']' * depth
+        expression = '(' * depth + 'x + 1' + ')' * depth
+        source = (f"πρόγραμμα p δήλωση x αρχή_προγράμματος "
+                  f"εάν {condition} τότε x := {expression} εάν_τέλος τέλος_προγράμματος")
+        ast = Syntax(RegexLexer(source=source).tokenize()).parse()
+        symbol_table = build_symbol_table(ast.to_dict())
+        quads = generate_intermediate_code(ast, symbol_table).quads
+        self.assertEqual(quads, [
+            (0, 'begin_block', 'p', 0, '_'),
+            (1, '<', 'x', '1', 3),
+            (2, 'jump', '_', '_', 6),
+            (3, '+', 'x', '1', 'T_0'),
+            (4, ':=', 'T_0', '_', 'x'),
+            (5, 'jump', '_', '_', 6),
+            (6, 'halt', '_', '_', '_'),
+            (7, 'end_block', 'p', '_', '_')
+        ])
+
+    def test_deep_statement_nesting_gives_the_same_code_in_one_pass(self):
+        depth = 1000
+        opens = 'εάν x < 1 τότε όσο x < 1 επανάλαβε για x := 1 έως 2 με_βήμα 1 επανάλαβε επανάλαβε '
+        closes = ' μέχρι x > 1 για_τέλος όσο_τέλος αλλιώς x := 2 εάν_τέλος'
+        source = (f"πρόγραμμα p δήλωση x αρχή_προγράμματος "
+                  f"{opens * depth}x := 1{closes * depth} τέλος_προγράμματος")
+        tokens = RegexLexer(source=source).tokenize()
+        ast = Syntax(tokens).parse()
+        symbol_table = build_symbol_table(ast)
+        code_gen, _, _ = translate(tokens)
+        self.assertEqual(code_gen.quads, generate_intermediate_code(ast, symbol_table).quads)
+        self.assertEqual(len(code_gen.quads), 15 * depth + 4)
@@ -2,8 +2,12 @@ import sys
 import os
 # Add the src directory to the Python path
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+import glob
+import io
+import tempfile
 import unittest
-from src.compiler import perform_lexical_analysis
+from src.compiler import perform_lexical_analysis, LEXERS
+from src.lexer import MmapLexer, IncrementalLexer, Lexer, NumpyLexer, ParallelLexer, split_chunks, np
 
 
 
@@ -34,8 +38,9 @@ class TestLexer(unittest.TestCase):
         self.assertEqual(tokens[:2], expected_tokens)
 
     def test_lexer_handles_unexpected_characters(self):
-        with self.assertRaises(SyntaxError):
+        with self.assertRaises(SyntaxError), self.assertLogs("Lexer Logger", "ERROR") as logs:
             tokens = perform_lexical_analysis("tests/lexer_inputs/unexpected.gr",True)
+        self.assertTrue(logs.output[0].startswith("ERROR:Lexer Logger:Unexpected character: "))
 
     def test_lexer_tokenizes_identifiers_correctly(self):
         tokens = perform_lexical_analysis("tests/lexer_inputs/identifiers.gr", True)
@@ -76,6 +81,12 @@ class TestLexer(unittest.TestCase):
         ]
         self.assertEqual(tokens[:3], expected_tokens)
 
+    def test_lexer_collects_comments_as_trivia(self):
+        lexer = Lexer("tests/lexer_inputs/comments.gr")
+        tokens = list(lexer.iter_code_tokens())
+        self.assertEqual(tokens[:2], [('KEYWORD', 'πρόγραμμα', 1), ('KEYWORD', 'δήλωση', 3)])
+        self.assertEqual(lexer.trivia[1], [('COMMENT', 'This is a comment', 2)])
+
     def test_lexer_tokenizes_separators_correctly(self):
         tokens = perform_lexical_analysis("tests/lexer_inputs/separators.gr", True)
         expected_tokens = [
@@ -93,3 +104,174 @@ class TestLexer(unittest.TestCase):
     def test_lexer_handles_wrong_path(self):
         with self.assertRaises(FileNotFoundError):
             tokens = perform_lexical_analysis("tests/lexer_inputs/non_existent_file.gr",True)
+
+
+class TestLexerEngines(unittest.TestCase):
+    input_files = sorted(glob.glob("tests/lexer_inputs/*.gr") + glob.glob("tests/syntax_inputs/*.gr"))
+
+    def assert_matches_char_lexer(self, engine):
+        for file in self.input_files:
+            with self.subTest(file=file, engine=engine):
+                try:
+                    expected = perform_lexical_analysis(file, False)
+                except SyntaxError as error:
+                    with self.assertRaises(SyntaxError) as engine_error:
+                        perform_lexical_analysis(file, False, engine)
+                    self.assertEqual(str(engine_error.exception), str(error))
+                else:
+                    self.assertEqual(list(perform_lexical_analysis(file, False, engine)), expected)
+
+    def test_regex_lexer_matches_char_lexer(self):
+        self.assert_matches_char_lexer('regex')
+
+    def test_mmap_lexer_matches_char_lexer(self):
+        self.assert_matches_char_lexer('mmap')
+
+    def test_numpy_lexer_matches_char_lexer(self):
+        self.assert_matches_char_lexer('numpy')
+
+    @unittest.skipIf(np is None, "NumPy is not installed")
+    def test_numpy_lexer_classifies_like_char_lexer(self):
+        sources = ['α1.2 12ab 1.2.3 x_1²', '<>= :== <=> {<>\n}>=', 'x\n\t{ a\n b }\x0by', '{ unterminated\nx',
+                   '12_', 'ab.c', '½', 'x }']
+        for source in sources:
+            with self.subTest(source=source):
+                try:
+                    expected = Lexer(source=source).tokenize()
+                except SyntaxError as error:
+                    with self.assertRaises(SyntaxError) as engine_error:
+                        NumpyLexer(source=source).tokenize()
+                    self.assertEqual(str(engine_error.exception), str(error))
+                else:
+                    self.assertEqual(NumpyLexer(source=source).tokenize(), expected)
+
+    def test_parallel_lexer_matches_char_lexer(self):
+        for file in self.input_files:
+            with self.subTest(file=file):
+                lexer = ParallelLexer(file, workers=3)
+                lexer.min_chunk_size = 64  # Use the process pool even for the small inputs
+                try:
+                    expected = perform_lexical_analysis(file, False)
+                except SyntaxError as error:
+                    with self.assertRaises(SyntaxError) as engine_error:
+                        lexer.tokenize()
+                    self.assertEqual(str(engine_error.exception), str(error))
+                else:
+                    self.assertEqual(lexer.tokenize(), expected)
+
+    def test_chunks_do_not_start_inside_comments(self):
+        source = "α;\n{ β;\n γ; }\nδ;\n{ ε\n"
+        self.assertEqual(split_chunks(source, 8), [0, 3, 14, 17])
+
+    def test_engines_handle_wrong_path(self):
+        for engine in ('regex', 'mmap'):
+            with self.subTest(engine=engine), self.assertRaises(FileNotFoundError):
+                perform_lexical_analysis("tests/lexer_inputs/non_existent_file.gr", False, engine)
+
+    def test_mmap_lexer_keeps_byte_offsets(self):
+        tokens = MmapLexer("tests/lexer_inputs/keywords.gr").tokenize()
+        self.assertIsNone(tokens.lines.breaks)  # No line was needed yet
+        kind, start, end = tokens.span(0)
+        self.assertEqual((kind, start, end), ('KEYWORD', 0, len('πρόγραμμα'.encode('utf-8'))))
+        self.assertEqual(tokens.line(1), 2)
+        tokens.close()
+
+    def test_mmap_lexer_closes_the_map(self):
+        class MapKeepingLexer(MmapLexer):
+            def map_source(self):
+                self.buffer = super().map_source()
+                return self.buffer
+
+        lexer = MapKeepingLexer("tests/lexer_inputs/keywords.gr")
+        tokens = list(lexer.iter_tokens())
+        self.assertEqual(tokens, Lexer("tests/lexer_inputs/keywords.gr").tokenize())
+        self.assertTrue(lexer.buffer.closed)
+        with tempfile.TemporaryDirectory() as directory:
+            # The first source fails in the fast scan, the second one in the exact scan
+            for source in ["πρόγραμμα @\n", "πρόγραμμα α· @\n"]:
+                with self.subTest(source=source):
+                    file = os.path.join(directory, "unexpected.gr")
+                    with open(file, 'w', encoding='utf-8') as f:
+                        f.write(source)
+                    lexer = MapKeepingLexer(file)
+                    with self.assertRaises(SyntaxError):
+                        lexer.tokenize()
+                    self.assertTrue(lexer.buffer.closed)
+
+    def test_engines_lex_in_memory_sources(self):
+        file = "tests/syntax_inputs/correct.gr"
+        expected = perform_lexical_analysis(file, False)
+        with open(file, 'rb') as f:
+            data = f.read()
+        sources = {
+            'str': lambda: data.decode('utf-8'),
+            'bytes': lambda: data,
+            'memoryview': lambda: memoryview(data),
+            'text file': lambda: io.StringIO(data.decode('utf-8')),
+            'binary file': lambda: io.BytesIO(data),
+        }
+        for engine in LEXERS:
+            for kind, make_source in sources.items():
+                with self.subTest(engine=engine, source=kind):
+                    source = make_source()
+                    lexer = LEXERS[engine](source=source)
+                    self.assertEqual(list(lexer.tokenize()), expected)
+                    if kind.endswith('file'):
+                        self.assertFalse(source.closed)
+
+
+class TestIncrementalLexer(unittest.TestCase):
+    def assert_edit_matches_full_lex(self, lexer, start, end, new_text):
+        text = lexer.text[:start] + new_text + lexer.text[end:]
+        lexer.edit(start, end, new_text)
+        self.assertEqual(lexer.token_list(), Lexer(source=text).tokenize())
+
+    def test_edits_match_a_full_lex(self):
+        with open("tests/syntax_inputs/correct.gr", encoding='utf-8') as f:
+            text = f.read()
+        lexer = IncrementalLexer(source=text)
+        lexer.block_size = 8
+        lexer.tokenize()
+        position = text.index('β := α + 1')
+        # Change an identifier, then add and remove a line
+        self.assert_edit_matches_full_lex(lexer, position, position + 1, 'γ')
+        self.assert_edit_matches_full_lex(lexer, position, position, 'α := 2;\n  ')
+        self.assert_edit_matches_full_lex(lexer, position, position + len('α := 2;\n  '), '')
+        # Merge two tokens into one
+        position = lexer.text.index(':=')
+        self.assert_edit_matches_full_lex(lexer, position - 1, position, '')
+
+    def test_invalid_edit_keeps_the_text_for_the_next_edit(self):
+        with open("tests/syntax_inputs/correct.gr", encoding='utf-8') as f:
+            text = f.read()
+        lexer = IncrementalLexer(source=text)
+        lexer.block_size = 8
+        lexer.tokenize()
+        position = text.index('β := α + 1')
+        # Type an unexpected character, then more text after it, then delete it
+        with self.assertRaises(SyntaxError):
+            lexer.edit(position, position, '$')
+        self.assertEqual(lexer.text, text[:position] + '$' + text[position:])
+        with self.assertRaises(SyntaxError):
+            lexer.edit(position + 1, position + 1, 'γ')
+        self.assert_edit_matches_full_lex(lexer, position, position + 1, '')
+        self.assertEqual(lexer.text, text[:position] + 'γ' + text[position:])
+        # The edits after that are incremental again
+        self.assert_edit_matches_full_lex(lexer, position, position + 1, '')
+        self.assertEqual(lexer.text, text)
+
+    def test_edits_opening_and_closing_comments(self):
+        with open("tests/syntax_inputs/correct.gr", encoding='utf-8') as f:
+            text = f.read()
+        lexer = IncrementalLexer(source=text)
+        lexer.block_size = 8
+        lexer.tokenize()
+        # Remove the closing brace so that the comment swallows the rest of the file
+        position = lexer.text.index('}')
+        self.assert_edit_matches_full_lex(lexer, position, position + 1, '')
+        # Put it back
+        self.assert_edit_matches_full_lex(lexer, position, position, '}')
+        # Comment out a statement
+        position = lexer.text.index('α := 1;')
+        self.assert_edit_matches_full_lex(lexer, position, position, '{')
+        self.assert_edit_matches_full_lex(lexer, position + len('{α := 1;'), position + len('{α := 1;'), '}')
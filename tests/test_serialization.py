@@ -0,0 +1,59 @@
+import sys
+import os
+# Add the src directory to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+
+import io
+import unittest
+from src.compiler import perform_lexical_analysis, perform_syntax_analysis
+from src.serialization import ASTWriter, dump_ast, load_ast, dump_symbol_table, load_symbol_table
+from src.symboltable import build_symbol_table
+
+
+class TestSerialization(unittest.TestCase):
+    def parse(self, file):
+        _, ast = perform_syntax_analysis(perform_lexical_analysis(file, False), False)
+        return ast
+
+    def test_ast_round_trip(self):
+        for file in ["./tests/syntax_inputs/correct.gr", "./tests/syntax_inputs/correct_large.gr",
+                     "./tests/syntax_inputs/nested_statements.gr"]:
+            with self.subTest(file=file):
+                ast = self.parse(file)
+                buffer = io.BytesIO()
+                dump_ast(ast, buffer)
+                buffer.seek(0)
+                self.assertEqual(load_ast(buffer).to_dict(), ast.to_dict())
+
+    def test_ast_is_written_in_blocks(self):
+        ast = self.parse("./tests/syntax_inputs/correct_large.gr")
+        buffer = io.BytesIO()
+        writer = ASTWriter(buffer)
+        writer.block_size = 7
+        writer.write(ast)
+        writer.close()
+        buffer.seek(0)
+        self.assertEqual(load_ast(buffer).to_dict(), ast.to_dict())
+
+    def test_symbol_table_round_trip(self):
+        symbol_table = build_symbol_table(self.parse("./tests/syntax_inputs/correct_large.gr"))
+        buffer = io.BytesIO()
+        dump_symbol_table(symbol_table, buffer)
+        buffer.seek(0)
+        loaded = load_symbol_table(buffer)
+        self.assertEqual(str(loaded), str(symbol_table))
+        self.assertEqual(loaded.current_scope_level, symbol_table.current_scope_level)
+        self.assertEqual(len(loaded.all_scopes), len(symbol_table.all_scopes))
+        for scope, expected in zip(loaded.all_scopes, symbol_table.all_scopes):
+            self.assertEqual(scope.parent and scope.parent.name, expected.parent and expected.parent.name)
+            self.assertEqual([entity.parameters for entity in scope.entities.values()],
+                             [entity.parameters for entity in expected.entities.values()])
+
+    def test_rejects_other_files(self):
+        buffer = io.BytesIO()
+        dump_symbol_table(build_symbol_table(self.parse("./tests/syntax_inputs/correct.gr")), buffer)
+        for data in [b'not a binary file', buffer.getvalue()]:
+            with self.subTest(data=data[:8]):
+                with self.assertRaises(ValueError):
+                    load_ast(io.BytesIO(data))
+
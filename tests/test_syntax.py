@@ -1,11 +1,15 @@
 # tests/test_parser.py
 import sys
 import os
+import json
+import tempfile
 
 # Add the src directory to the Python path
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
 import unittest
-from src.compiler import perform_syntax_analysis, perform_lexical_analysis
+from src.compiler import DebugDump, perform_syntax_analysis, perform_lexical_analysis
+from src.lexer import IncrementalLexer, RegexLexer, TokenKind, TokenStream, KIND_TYPES, KIND_VALUES
+from src.syntaxAST import ASTNode, IncrementalSyntax, LazyNode, ParallelSyntax, SharedNode, Syntax, StreamingSyntax, TokenRing
 
 class TestSyntax(unittest.TestCase):
     def test_parser_correct(self):
@@ -15,9 +19,10 @@ class TestSyntax(unittest.TestCase):
 
     def test_parser_false(self):
         file = "./tests/syntax_inputs/false.gr"
-        with self.assertRaises(SyntaxError):
+        with self.assertRaises(SyntaxError) as raised, self.assertLogs("Syntax Logger", "ERROR") as logs:
             tokens = perform_lexical_analysis(file, True)
             perform_syntax_analysis(tokens, True)
+        self.assertEqual(logs.output, [f"ERROR:Syntax Logger:{raised.exception}"])
 
     def test_parser_missing_tokens(self):
         file = "./tests/syntax_inputs/missing_tokens.gr"
@@ -35,3 +40,266 @@ class TestSyntax(unittest.TestCase):
         file = "./tests/syntax_inputs/nested_statements.gr"
         tokens = perform_lexical_analysis(file, True)
         perform_syntax_analysis(tokens, True)
+
+    def test_debug_dump_writes_sampled_json_lines(self):
+        file = "./tests/syntax_inputs/correct.gr"
+        tokens = perform_lexical_analysis(file, False)
+        ast = Syntax(tokens).parse()
+        with tempfile.TemporaryDirectory() as directory:
+            base = os.path.join(directory, 'correct')
+            for debug, indexes in [(DebugDump(base), range(len(tokens))), (DebugDump(base, 10, 3), [0, 10, 20])]:
+                for stream in [False, True]:
+                    with self.subTest(sample=debug.sample, stream=stream):
+                        perform_syntax_analysis(perform_lexical_analysis(file, debug, stream=stream), debug, stream)
+                        with open(base + '.tokens.jsonl', encoding='utf-8') as f:
+                            records = [json.loads(line) for line in f]
+                        self.assertEqual([record['index'] for record in records], list(indexes))
+                        self.assertEqual([(record['type'], record['value'], record['line']) for record in records],
+                                         [tuple(tokens[index]) for index in indexes])
+                        with open(base + '.ast.jsonl', encoding='utf-8') as f:
+                            records = [json.loads(line) for line in f]
+                        nodes = list(ast.walk())
+                        self.assertEqual([(record['type'], record['children']) for record in records],
+                                         [(nodes[index].type, len(nodes[index].children))
+                                          for index in range(0, len(nodes), debug.sample)][:debug.limit])
+
+    def test_parser_recovers_from_every_error(self):
+        tokens = perform_lexical_analysis("./tests/syntax_inputs/many_errors.gr", False)
+        for syntax in [Syntax(tokens, recover=True), StreamingSyntax(iter(tokens), recover=True)]:
+            with self.subTest(syntax=type(syntax).__name__):
+                ast = syntax.parse()
+                self.assertEqual([error.split(':')[0] for error in syntax.errors],
+                                 [f"Error at line {line}" for line in [9, 10, 15, 22, 26, 28]])
+                self.assertEqual([node.line for node in ast.walk() if node.type == 'ERROR'], [9, 10, 15, 22, 26, 28])
+                # The statements after the errors are still parsed
+                main = ast.children[1].children[2]
+                self.assertEqual([child.type for child in main.children],
+                                 ['ASSIGNMENT', 'ERROR', 'WHILE_STATEMENT', 'ERROR', 'PRINT_STATEMENT'])
+        with self.assertRaises(SyntaxError) as raised:
+            perform_syntax_analysis(tokens, False, recover=True)
+        self.assertEqual(len(str(raised.exception).splitlines()), 6)
+
+    def test_recovering_parser_matches_parser(self):
+        for file in ["./tests/syntax_inputs/correct.gr", "./tests/syntax_inputs/nested_statements.gr"]:
+            with self.subTest(file=file):
+                tokens = perform_lexical_analysis(file, False)
+                syntax = Syntax(tokens, recover=True)
+                self.assertEqual(syntax.parse().to_dict(), Syntax(tokens).parse().to_dict())
+                self.assertEqual(syntax.errors, [])
+
+    def test_reparse_matches_parser(self):
+        with open("./tests/syntax_inputs/correct_large.gr", encoding='utf-8') as f:
+            text = f.read()
+        lexer = IncrementalLexer(source=text)
+        syntax = IncrementalSyntax(lexer.tokenize())
+        subprograms = syntax.parse().children[1].children[1].children
+        position = lexer.text.index('β := α * 2') + len('β := ')
+        # Change an expression, add a line before it, then remove the line again
+        for start, end, new_text in [(position, position + 1, '(α + 1)'), (position - 5, position - 5, 'δ := 1;\n  '),
+                                     (position - 5, position + 5, '')]:
+            with self.subTest(new_text=new_text):
+                lexer.edit(start, end, new_text)
+                tokens = lexer.token_list()
+                ast = syntax.reparse(tokens)
+                self.assertEqual(ast.to_dict(), Syntax(tokens).parse().to_dict())
+                self.assertGreater(syntax.reused, 0)
+                # The subprograms before the edit are not parsed again
+                self.assertTrue(all(new is old for new, old in zip(ast.children[1].children[1].children, subprograms)))
+
+    def test_lazy_parser_matches_parser(self):
+        for file in ["./tests/syntax_inputs/correct.gr", "./tests/syntax_inputs/correct_large.gr",
+                     "./tests/syntax_inputs/nested_statements.gr"]:
+            tokens = perform_lexical_analysis(file, False)
+            expected = Syntax(tokens).parse().to_dict()
+            for parsed in [tokens, TokenStream.from_tokens(tokens)]:
+                with self.subTest(file=file, tokens=type(parsed).__name__):
+                    ast = Syntax(parsed, lazy=True).parse()
+                    body = ast.children[1].children[2]
+                    self.assertIsInstance(body, LazyNode)
+                    self.assertIsNotNone(body.parse_children)
+                    self.assertEqual(ast.to_dict(), expected)
+                    self.assertIsNone(body.parse_children)
+
+    def test_lazy_parser_finds_body_errors_on_access(self):
+        source = ("πρόγραμμα p συνάρτηση f(x) διαπροσωπεία είσοδος x αρχή_συνάρτησης f := x + τέλος_συνάρτησης "
+                  "αρχή_προγράμματος x := 1 τέλος_προγράμματος")
+        ast = Syntax(RegexLexer(source=source).tokenize(), lazy=True).parse()
+        function = ast.children[1].children[1].children[0]
+        self.assertEqual(function.children[0].value, 'f')
+        body = function.children[2].children[4]
+        # The error is raised on every access, so that the body never looks empty
+        for _ in range(2):
+            with self.assertRaises(SyntaxError):
+                body.children
+
+    def test_parallel_parser_matches_parser(self):
+        for file in ["./tests/syntax_inputs/correct_large.gr", "./tests/syntax_inputs/many_errors.gr",
+                     "./tests/syntax_inputs/false.gr"]:
+            tokens = perform_lexical_analysis(file, False)
+            for recover in [False, True]:
+                with self.subTest(file=file, recover=recover):
+                    results = []
+                    for syntax in [Syntax(tokens, recover=recover), ParallelSyntax(tokens, recover=recover, workers=2)]:
+                        syntax.min_tokens = 0
+                        try:
+                            results.append((syntax.parse().to_dict(), syntax.errors))
+                        except SyntaxError as error:
+                            results.append((str(error), syntax.errors))
+                    self.assertEqual(results[1], results[0])
+
+    def test_parse_workers_need_listed_tokens_and_a_worker(self):
+        file = "./tests/syntax_inputs/correct.gr"
+        with self.assertRaises(ValueError):
+            perform_syntax_analysis(perform_lexical_analysis(file, False, stream=True), False, stream=True, workers=2)
+        for workers in [0, -1]:
+            with self.subTest(workers=workers):
+                with self.assertRaises(ValueError):
+                    perform_syntax_analysis(perform_lexical_analysis(file, False), False, workers=workers)
+
+    def test_shared_nodes_match_parser_but_lines(self):
+        def without_lines(node):
+            return {'type': node.type, 'value': node.value, 'children': [without_lines(child) for child in node.children]}
+
+        tokens = perform_lexical_analysis("./tests/syntax_inputs/correct_large.gr", False)
+        ast = Syntax(tokens, share_nodes=True).parse()
+        self.assertEqual(without_lines(ast), without_lines(Syntax(tokens).parse()))
+        expressions = [node for node in ast.walk() if node.type == 'EXPRESSION']
+        self.assertTrue(all(isinstance(node, SharedNode) for node in expressions))
+        self.assertLess(len({id(node) for node in expressions}), len(expressions))
+        # Another parse shares the same nodes
+        self.assertIs(Syntax(tokens, share_nodes=True).parse().children[0], ast.children[0])
+
+    def test_streaming_parser_matches_parser(self):
+        for file in ["./tests/syntax_inputs/correct.gr", "./tests/syntax_inputs/correct_large.gr",
+                     "./tests/syntax_inputs/nested_statements.gr"]:
+            with self.subTest(file=file):
+                _, expected = perform_syntax_analysis(perform_lexical_analysis(file, False), False)
+                _, ast = perform_syntax_analysis(perform_lexical_analysis(file, False, stream=True), False, True)
+                self.assertEqual(ast.to_dict(), expected.to_dict())
+
+    def test_streaming_parser_false(self):
+        file = "./tests/syntax_inputs/false.gr"
+        with self.assertRaises(SyntaxError):
+            tokens = perform_lexical_analysis(file, False, stream=True)
+            perform_syntax_analysis(tokens, False, True)
+
+    def test_token_ring_keeps_only_the_window(self):
+        ring = TokenRing(iter(range(10)), 2)
+        self.assertEqual(ring[3], 3)
+        self.assertEqual(ring[2], 2)
+        with self.assertRaises(IndexError):
+            ring[1]
+        self.assertIsNone(ring.get(10))
+
+    def test_columnar_parser_matches_parser(self):
+        for file in ["./tests/syntax_inputs/correct.gr", "./tests/syntax_inputs/correct_large.gr",
+                     "./tests/syntax_inputs/nested_statements.gr"]:
+            with self.subTest(file=file):
+                tokens = perform_lexical_analysis(file, False)
+                _, expected = perform_syntax_analysis(tokens, False)
+                stream = perform_lexical_analysis(file, False, columnar=True)
+                self.assertIsInstance(stream, TokenStream)
+                self.assertEqual(list(stream), tokens)
+                _, ast = perform_syntax_analysis(stream, False)
+                self.assertEqual(ast.to_dict(), expected.to_dict())
+
+    def test_token_stream_interns_values(self):
+        stream = perform_lexical_analysis("./tests/syntax_inputs/correct.gr", False, columnar=True)
+        self.assertEqual(len(stream.strings), len(set(stream.strings)))
+        self.assertLess(len(stream.strings), len(stream))
+
+    def test_keywords_and_symbols_have_their_own_kinds(self):
+        stream = perform_lexical_analysis("./tests/syntax_inputs/correct.gr", False, columnar=True)
+        self.assertEqual(stream.kinds[0], TokenKind.PROGRAM)
+        for kind, (token_type, value, _) in zip(stream.kinds, stream):
+            self.assertEqual(KIND_TYPES[kind], token_type)
+            if kind in KIND_VALUES:
+                self.assertEqual(KIND_VALUES[kind], value)
+        syntax = Syntax(list(stream))
+        self.assertEqual(syntax.current_kind, TokenKind.PROGRAM)
+
+    def test_ast_nodes_are_compact(self):
+        tokens = perform_lexical_analysis("./tests/syntax_inputs/correct.gr", False)
+        ast = Syntax(tokens).parse()
+        nodes = list(ast.walk())
+        self.assertIs(nodes[0], ast)
+        self.assertFalse(any(hasattr(node, '__dict__') for node in nodes))
+        leaves = [node for node in nodes if not node.children]
+        self.assertTrue(leaves)
+        self.assertTrue(all(isinstance(node.children, tuple) for node in leaves))
+        node = ASTNode('SEQUENCE')
+        node.add_child(ASTNode('IDENTIFIER', value='x'))
+        self.assertEqual(node.to_dict(), {'type': 'SEQUENCE', 'children': [{'type': 'IDENTIFIER', 'value': 'x'}]})
+
+    def test_parser_handles_deep_nesting(self):
+        depth = 100000
+        condition = 'όχι [' * depth + '(' * depth + 'x' + ')' * depth + ' < f(%y, -1)' + ']' * depth
+        source = f"πρόγραμμα p αρχή_προγράμματος εάν {condition} τότε x := 1 εάν_τέλος τέλος_προγράμματος"
+        node = Syntax(RegexLexer(source=source).tokenize()).parse()
+        for name in ['PROGRAM_BLOCK', 'SEQUENCE', 'IF_STATEMENT', 'CONDITION']:
+            node = next(child for child in node.children if child.type == name)
+        nots = 0
+        while node.children[0].children[0].type == 'NOT_FACTOR':
+            node = node.children[0].children[0].children[0]
+            nots += 1
+        self.assertEqual(nots, depth)
+        comparison = node.children[0].children[0]
+        self.assertEqual([child.type for child in comparison.children],
+                         ['EXPRESSION', 'RELATIONAL_OPERATOR', 'EXPRESSION'])
+
+    def test_parser_handles_deep_statement_nesting(self):
+        depth = 1000
+        opens = 'εάν x < 1 τότε όσο x < 1 επανάλαβε για x := 1 έως 2 επανάλαβε επανάλαβε '
+        closes = ' μέχρι x > 1 για_τέλος όσο_τέλος αλλιώς x := 2 εάν_τέλος'
+        source = f"πρόγραμμα p αρχή_προγράμματος {opens * depth}x := 1{closes * depth} τέλος_προγράμματος"
+        tokens = RegexLexer(source=source).tokenize()
+        ast = Syntax(tokens).parse()
+        statements = ['IF_STATEMENT', 'WHILE_STATEMENT', 'FOR_STATEMENT', 'DO_WHILE_STATEMENT']
+        self.assertEqual([node.type for node in ast.walk() if node.type in statements + ['ASSIGNMENT']],
+                         statements * depth + ['ASSIGNMENT'] * (depth + 1))
+        # The trees are too deep to compare recursively
+        expected = [(node.type, node.value, node.line, len(node.children)) for node in ast.walk()]
+        for syntax in [Syntax(tokens, recover=True), IncrementalSyntax(tokens), Syntax(tokens, lazy=True)]:
+            with self.subTest(syntax=type(syntax).__name__):
+                self.assertEqual([(node.type, node.value, node.line, len(node.children))
+                                  for node in syntax.parse().walk()], expected)
+
+        # An error at the bottom is recovered from without unwinding the statements around it
+        syntax = Syntax(RegexLexer(source=source.replace('x := 1 μέχρι', 'x := μέχρι')).tokenize(), recover=True)
+        ast = syntax.parse()
+        self.assertEqual(len(syntax.errors), 1)
+        self.assertEqual([node.type for node in ast.walk() if node.type in ('ERROR', 'IF_STATEMENT')],
+                         ['IF_STATEMENT'] * depth + ['ERROR'])
+
+    def test_comments_are_kept_as_trivia(self):
+        tokens = perform_lexical_analysis("./tests/syntax_inputs/correct.gr", False)
+        comments = [token for token in tokens if token[0] == 'COMMENT']
+        self.assertTrue(comments)
+        for syntax in [Syntax(tokens), Syntax(TokenStream.from_tokens(tokens)), StreamingSyntax(iter(tokens))]:
+            with self.subTest(syntax=type(syntax).__name__):
+                syntax.parse()
+                self.assertEqual([comment for index in sorted(syntax.trivia) for comment in syntax.trivia[index]],
+                                 comments)
+        syntax = Syntax(tokens)
+        for index, before in syntax.trivia.items():
+            # The comments are attached to the first token after them
+            following = tokens[tokens.index(before[-1]) + 1]
+            self.assertEqual(syntax.tokens[index], following)
+        self.assertNotIn('COMMENT', [token[0] for token in syntax.tokens])
+
+    def test_lexical_analysis_moves_comments_to_trivia(self):
+        file = "./tests/syntax_inputs/correct.gr"
+        expected = Syntax(perform_lexical_analysis(file, False))
+        _, expected_ast = perform_syntax_analysis(perform_lexical_analysis(file, False), False)
+        for columnar in [False, True]:
+            with self.subTest(columnar=columnar):
+                trivia = {}
+                tokens = perform_lexical_analysis(file, False, columnar=columnar, trivia=trivia)
+                self.assertEqual(list(tokens), list(expected.tokens))
+                self.assertEqual(trivia, expected.trivia)
+                syntax = Syntax(tokens, trivia)
+                # The parser takes the tokens as they are, without splitting them again
+                self.assertIs(syntax.tokens, tokens)
+                self.assertIs(syntax.trivia, trivia)
+                _, ast = perform_syntax_analysis(tokens, False, trivia=trivia)
+                self.assertEqual(ast.to_dict(), expected_ast.to_dict())